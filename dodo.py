@@ -1,5 +1,11 @@
 """Run or update the project. This file uses the `doit` Python package. It works
 like a Makefile, but is Python-based
+
+The task graph has one task per period and artifact (Table 1 in all formats, each figure), fed by a single
+preprocessing task that appends the new rows of the raw data to the clean files of the periods they fall into.
+Every task depends on the files it reads and on the source of the modules that produce it, compared by
+content (MD5), so independent periods run concurrently with `doit -n <cores>` and a change to the inputs
+of one period only rebuilds the artifacts of that period. Listing the tasks does not import pandas.
 """
 
 import sys
@@ -9,18 +15,32 @@ sys.path.insert(1, "./src/")
 import config
 from pathlib import Path
 from doit.tools import run_once
+from doit.action import CmdAction
 import platform
 import subprocess
 import os
-
-import load_commodities_data
-import data_preprocessing
+import ast
+from functools import lru_cache
 
 OUTPUT_DIR = config.OUTPUT_DIR
 REPORTS_DIR = config.REPORTS_DIR
 DATA_DIR = config.DATA_DIR
 INPUTFILE = config.INPUTFILE
 LOADBACKPATH_CLEAN = config.LOADBACKPATH_CLEAN
+PERIODS = config.PERIODS
+SRC_DIR = Path("./src")
+
+DOIT_CONFIG = {"check_file_uptodate": "md5"}
+
+#Figures of perform_additional_analysis.py, see get_figure_names there
+FIGURES = [
+    "commodities_by_sector",
+    "data_availability_heatmap",
+    "maximum_contract_number",
+    "max_contract_availability",
+    "60_months_rolling_volatility",
+    "60_months_rolling_sharpe_ratio",
+]
 
 # fmt: off
 ## Helper functions for automatic execution of Jupyter notebooks
@@ -54,102 +74,100 @@ def get_os():
 os_type = get_os()
 
 
+@lru_cache(maxsize=None)
+def get_source_deps(module):
+    """Returns the source files of a module in src/ and of all src/ modules it imports, transitively"""
+    deps, pending = set(), [module]
+    while pending:
+        path = SRC_DIR / f"{pending.pop()}.py"
+        if path in deps or not path.is_file():
+            continue
+        deps.add(path)
+        for node in ast.walk(ast.parse(path.read_text())):
+            if isinstance(node, ast.Import):
+                pending.extend(alias.name.split(".")[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                pending.append(node.module.split(".")[0])
+    return sorted(deps)
+
+
+def period_name(start_date, end_date):
+    return f"{start_date[:4]}_{end_date[:4]}"
+
+
+def clean_file_path(start_date, end_date):
+    """Same name as data_preprocessing.get_clean_file_name"""
+    return LOADBACKPATH_CLEAN / f"clean_{period_name(start_date, end_date)}_{INPUTFILE}"
+
+
+def task_raw_cache():
+    """Task to build the columnar cache of the raw data.
+
+    It runs once: rows appended later extend the cache during incremental preprocessing, and a rewritten
+    raw file is detected (and the cache rebuilt) by load_commodities_data.load_data itself."""
+
+    cache_dir = DATA_DIR / "cache"
+    stem = Path(INPUTFILE).stem
+
+    return {
+        "actions": ["python src/load_commodities_data.py"],
+        "file_dep": get_source_deps("load_commodities_data"),
+        "uptodate": [run_once],
+        "targets": [cache_dir / f"{stem}.parquet", cache_dir / f"{stem}.meta.json"],
+        "clean": True,
+        }
+
+
+def preprocessing_command(changed):
+    """A change to the code re-cuts every period, a change to the raw data only processes the appended rows"""
+    if any(Path(path).suffix == ".py" for path in changed):
+        return "python src/data_preprocessing.py"
+    return "python src/data_preprocessing.py --incremental"
+
+
 def task_data_preprocessing():
-    """Task to preprocess data"""
-
-    #Check if Commodities_data.csv is available to load
-    file_dep = [DATA_DIR/"manual"/INPUTFILE]
-    
-    #Check if Clean and Preprocessed Data is already available
-    processed_files = [f for f in LOADBACKPATH_CLEAN.iterdir() if f.name.startswith("clean") and f.is_file()]
-    target = [DATA_DIR / "manual" / file for file in processed_files]
-
-    #Execute the following task
-    action = ["python src/data_preprocessing.py"]
-    
-    #return stuff
-    return{
-        "actions":action,
-        "file_dep":file_dep,
-        "targets":target,
-        "clean":True
+    """Task to update the clean data of every period.
+
+    The rows appended to the raw data are only added to the clean files of the periods they fall into, the
+    other clean files keep their content, so the downstream tasks of those periods stay up to date."""
+
+    return {
+        "actions": [CmdAction(preprocessing_command)],
+        "file_dep": [DATA_DIR / "manual" / INPUTFILE, *get_source_deps("data_preprocessing")],
+        "task_dep": ["raw_cache"],
+        "targets": [clean_file_path(start_, end_) for start_, end_ in PERIODS],
+        "clean": True,
         }
 
+
 def task_replicate_results():
-    """Task to replicate the results."""
-
-    #Check if Clean Datasets are available to load
-    processed_files = [f for f in LOADBACKPATH_CLEAN.iterdir() if f.name.startswith("clean") and f.is_file()]
-    file_dep = [DATA_DIR / "manual" / file for file in processed_files]
-    
-    #Check if Output Tables are already Populated and Available
-    output_files = [f for f in OUTPUT_DIR.iterdir() if f.name.startswith("Table") and f.is_file()]
-    target = [OUTPUT_DIR/ file for file in output_files]
-
-    #Execute the following task
-    action = ["python src/replicate_results.py"]
-
-    #return stuff
-    return{
-        "actions":action,
-        "file_dep":file_dep,
-        "targets":target,
-        "clean":True
-        }
+    """Task to replicate the results (Table 1 in every format), one subtask per period"""
+
+    for start_, end_ in PERIODS:
+        yield {
+            "name": period_name(start_, end_),
+            "actions": [f"python src/replicate_results.py --period {start_} {end_}"],
+            "file_dep": [clean_file_path(start_, end_), *get_source_deps("replicate_results")],
+            #Table 1 is written as xlsx, LaTeX, CSV and JSON in a single pass (see table_export.py)
+            "targets": [OUTPUT_DIR / f"{prefix}Table1__{period_name(start_, end_)}.{suffix}"
+                        for prefix, suffix in [("", "xlsx"), ("Tex_", "tex"), ("", "csv"), ("", "json")]],
+            "clean": True,
+            }
 
-def task_produce_tables_latex():
-    """Task to replicate the results."""
-
-    #Check if Clean Datasets are available to load
-    processed_files = [f for f in LOADBACKPATH_CLEAN.iterdir() if f.name.startswith("clean") and f.is_file()]
-    file_dep = [DATA_DIR / "manual" / file for file in processed_files]
-    
-    #Check if LaTex Tables are already Available
-    output_files = [f for f in OUTPUT_DIR.iterdir() if f.name.startswith("Tex") and f.is_file()]
-    target = [OUTPUT_DIR/ file for file in output_files]
-
-    #Execute the following task
-    action = ["python src/df_to_latex.py"]
-
-    #return stuff
-    return{
-        "actions":action,
-        "file_dep":file_dep,
-        "targets":target,
-        "clean":True
-        }
 
 def task_additional_analysis():
-    """Task to perform additional analysis."""
-
-    #Check if Commodities_data.csv is available to load
-    file_dep = [DATA_DIR / "manual"/"clean_1970_2008_commodities_data.csv"]
-
-    file_output = [
-        "commodities_by_sector.png",
-        "data_availability_heatmap.png",
-        "maximum_contract_number.png",
-        "max_contract_availability.png",
-        "Aluminium_futures_contracts_time_series.png",
-        "monthly_returns_distribution_contract_2.png",
-        "monthly_returns_stats_contract_2.tex",
-        "60_months_rolling_volatility.png",
-        "60_months_rolling_sharpe_ratio.png",
-        "Aluminium_contracts_1_2_basis.png"
-    ]
-
-    target = [OUTPUT_DIR / file for file in file_output]
-
-    #Execute the following task
-    action = ["python src/perform_additional_analysis.py"]
-
-    #return stuff
-    return{
-        "actions":action,
-        "file_dep":file_dep,
-        "targets":target,
-        "clean":True
-        }
+    """Task to perform additional analysis, one subtask per period and figure"""
+
+    for start_, end_ in PERIODS:
+        for figure in FIGURES:
+            yield {
+                "name": f"{period_name(start_, end_)}_{figure}",
+                "actions": [f"python src/perform_additional_analysis.py --period {start_} {end_} --figure {figure}"],
+                "file_dep": [clean_file_path(start_, end_), *get_source_deps("perform_additional_analysis")],
+                "targets": [OUTPUT_DIR / f"{figure}_{start_}.png"],
+                "clean": True,
+                }
+
 
 def task_latex_to_pdf():
     return {
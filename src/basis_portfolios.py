@@ -0,0 +1,156 @@
+"""
+This module forms cross-sectional portfolios of commodities sorted on their basis, as in Yang (2013).
+
+Each month the commodities are ranked on their basis of `lag` months earlier and split into quantile
+portfolios of equal size, held with equal weights over the month. The high-minus-low portfolio is long the
+highest-basis quantile and short the lowest. The basis and return series are computed once for the whole
+sample (through a `replicate_results.MetricsContext`) and aligned on a Month x Commodity matrix, so every
+sort is a single vectorized ranking over that matrix and parameter sweeps only repeat the ranking.
+"""
+
+import warnings
+warnings.filterwarnings("ignore")
+
+import config
+from pathlib import Path
+import pandas as pd
+import numpy as np
+import logging
+
+import load_commodities_data
+import data_preprocessing
+import replicate_results
+
+DATA_DIR = config.DATA_DIR
+INPUTFILE = config.INPUTFILE
+OUTPUT_DIR = config.OUTPUT_DIR
+PERIODS = config.PERIODS
+
+NUM_QUANTILES = 3
+SORT_LAG = 1
+SPREAD_COLUMN = 'High-Low'
+
+def assign_quantiles(sort_values, num_quantiles = NUM_QUANTILES):
+    """
+    Assigns every cell of a Month x Commodity matrix to a quantile of its month, in one operation.
+
+    Parameters:
+        sort_values (ndarray): Month x Commodity values to sort on, NaN where a commodity is not eligible.
+        num_quantiles (int): Number of quantiles.
+
+    Returns:
+        ndarray: int array of the same shape with quantiles 0 (lowest) to num_quantiles - 1 (highest),
+        -1 for cells that are not eligible or months with fewer eligible commodities than quantiles.
+    """
+
+    valid = np.isfinite(sort_values)
+    num_valid = valid.sum(axis=1, keepdims=True)
+    #Ties keep the commodity order; non-eligible cells are sorted last
+    order = np.argsort(np.where(valid, sort_values, np.inf), axis=1, kind='stable')
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.broadcast_to(np.arange(sort_values.shape[1]), order.shape), axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        quantiles = (ranks * num_quantiles) // np.maximum(num_valid, 1)
+    return np.where(valid & (num_valid >= num_quantiles), quantiles, -1)
+
+class BasisSortEngine:
+    """
+    Forms basis-sorted quantile portfolios for any number of quantiles, lags and universes.
+
+    Parameters:
+        prep_df (DataFrame): Preprocessed DataFrame containing commodity data.
+        first_to_exp_ind (int): Index of the contract considered as 'first to expire'.
+    """
+
+    def __init__(self, prep_df, first_to_exp_ind = 1):
+        context = replicate_results.MetricsContext(prep_df, first_to_exp_ind)
+
+        basis_df = context.basis_timeseries()[['Commodity', 'YearMonth', 'Basis']].copy()
+        basis_df['Commodity'] = basis_df['Commodity'].astype(str)
+
+        #Month-end prices of the second contract, as in compute_commodity_excess_returns, keyed by month code
+        month_end_df = context.month_end()
+        prices_df = (month_end_df[month_end_df['Contract'] == 2]
+                     .pivot_table(index='YearMonth', columns='Commodity', values='ClosePrice', observed=True).rename(columns=str))
+
+        self.commodities = pd.Index(np.sort(prices_df.columns.union(basis_df['Commodity'].unique())), name='Commodity')
+        first_month = int(min(basis_df['YearMonth'].min(), prices_df.index.min()))
+        last_month = int(max(basis_df['YearMonth'].max(), prices_df.index.max()))
+        self.months = pd.RangeIndex(first_month, last_month + 1)
+
+        self.basis = (basis_df.groupby(['YearMonth', 'Commodity'])['Basis'].mean().unstack()
+                      .reindex(index=self.months, columns=self.commodities).to_numpy())
+        #Returns over a month are only measured when the previous month has a price
+        prices = prices_df.reindex(index=self.months, columns=self.commodities).to_numpy()
+        self.returns = np.full_like(prices, np.nan)
+        self.returns[1:] = prices[1:] / prices[:-1] - 1
+
+    def sort(self, num_quantiles = NUM_QUANTILES, lag = SORT_LAG, universe = None):
+        """
+        Computes the monthly returns of the basis-sorted quantile portfolios.
+
+        Parameters:
+            num_quantiles (int): Number of quantile portfolios.
+            lag (int): Months between the basis used for sorting and the holding month (at least 1
+                to avoid look-ahead).
+            universe (list): Optional commodities to sort, default: all.
+
+        Returns:
+            DataFrame: Monthly returns indexed by month (PeriodIndex), with columns Q1 (lowest basis)
+            to Q<num_quantiles> (highest basis) and the High-Low spread.
+        """
+
+        if lag < 1:
+            raise ValueError(f"The sort lag must be at least 1 month to avoid look-ahead, got {lag}")
+        if lag >= len(self.months):
+            raise ValueError(f"The sort lag of {lag} months leaves no month to hold in a sample of {len(self.months)} months")
+        columns = np.arange(len(self.commodities)) if universe is None else self.commodities.get_indexer(universe)
+        if (columns < 0).any():
+            raise KeyError(f"Unknown commodities: {list(np.asarray(universe)[columns < 0])}")
+        returns = self.returns[:, columns]
+        sort_basis = np.full_like(returns, np.nan)
+        sort_basis[lag:] = self.basis[:len(self.months) - lag, columns]
+
+        quantiles = assign_quantiles(np.where(np.isfinite(returns), sort_basis, np.nan), num_quantiles)
+        members = (quantiles[:, :, np.newaxis] == np.arange(num_quantiles)).astype(float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            portfolio_returns = (np.einsum('mc,mcq->mq', np.where(np.isfinite(returns), returns, 0.0), members)
+                                 / members.sum(axis=1))
+
+        portfolio_df = pd.DataFrame(portfolio_returns, columns=[f"Q{q + 1}" for q in range(num_quantiles)],
+                                    index=load_commodities_data.month_code_to_period(self.months))
+        portfolio_df.index.name = 'YearMonth'
+        portfolio_df[SPREAD_COLUMN] = portfolio_df[f"Q{num_quantiles}"] - portfolio_df['Q1']
+        return portfolio_df.dropna(how='all')
+
+def compute_portfolio_metrics(portfolio_df, annualizing_period = 12):
+    """
+    Computes the annualized performance metrics of each portfolio, as `replicate_results.compute_performance_metrics`.
+    """
+
+    metrics_df = replicate_results.compute_performance_metrics(portfolio_df, annualizing_period)
+    metrics_df.index.name = 'Portfolio'
+    return metrics_df
+
+def compute_basis_portfolios(prep_df, num_quantiles = NUM_QUANTILES, lag = SORT_LAG, universe = None):
+    """
+    Forms basis-sorted portfolios in one pass, see `BasisSortEngine.sort`.
+
+    Returns:
+        tuple: (monthly portfolio returns DataFrame, DataFrame of their performance metrics)
+    """
+
+    portfolio_df = BasisSortEngine(prep_df).sort(num_quantiles, lag, universe)
+    return portfolio_df, compute_portfolio_metrics(portfolio_df)
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    for start_, end_ in PERIODS:
+        try:
+            clean_data_df = load_commodities_data.load_data(DATA_DIR, data_preprocessing.get_clean_file_name(start_, end_, INPUTFILE))
+            portfolio_df, metrics_df = compute_basis_portfolios(clean_data_df)
+            output_file = Path(OUTPUT_DIR) / f"Basis_portfolios_{start_[:4]}_{end_[:4]}.csv"
+            metrics_df.to_csv(output_file)
+            logging.info(f"{output_file.name} Stored Successfully!")
+        except Exception as e:
+            logging.error(f"An error occurred while sorting the basis portfolios for {start_} to {end_}: {e}")
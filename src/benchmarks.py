@@ -0,0 +1,185 @@
+"""
+This module benchmarks the pipeline stages on synthetic futures panels of growing size.
+
+Each scenario generates a panel with `synthetic_data.generate_futures_panel` in a temporary data directory
+and times the stages of `load_commodities_data`, `data_preprocessing`, `replicate_results`, `table_export`
+and `perform_additional_analysis` (figures are rendered to the temporary directory) on it. Scenarios vary
+one scaling axis (commodities, contracts, years, missing rate or gap rate) at a time around a base panel.
+Results are saved as JSON; when a baseline file is given, any stage that is slower than the baseline by
+more than the tolerance is reported and the run fails.
+
+Usage:
+    python src/benchmarks.py [--quick] [--output FILE] [--baseline FILE] [--tolerance 0.25]
+"""
+
+import warnings
+warnings.filterwarnings("ignore")
+
+import config
+from pathlib import Path
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+import pandas as pd
+import numpy as np
+import logging
+
+import load_commodities_data
+import data_preprocessing
+import replicate_results
+import perform_additional_analysis
+import synthetic_data
+import table_export
+
+OUTPUT_DIR = config.OUTPUT_DIR
+
+BENCHMARK_FILE = "benchmarks.json"
+BENCHMARK_INPUTFILE = "synthetic_commodities_data.csv"
+BENCHMARK_START = '1970-01-01'
+REPEATS = 3
+TOLERANCE = 0.25
+#Stages faster than this (in seconds) are too noisy to fail a run
+MIN_SECONDS = 0.05
+FIGURE_ROLLING_WINDOW = 60
+
+BASE_PANEL = {'num_commodities': 10, 'num_contracts': 8, 'years': 10, 'missing_rate': 0.01, 'gap_rate': 0.005}
+SCALING_AXES = {'num_commodities': [5, 20, 40],
+                'num_contracts': [4, 12],
+                'years': [5, 20, 40],
+                'missing_rate': [0.0, 0.1],
+                'gap_rate': [0.0, 0.05]}
+QUICK_PANEL = {'num_commodities': 4, 'num_contracts': 4, 'years': 3, 'missing_rate': 0.01, 'gap_rate': 0.0}
+
+def get_scenarios(quick = False):
+    """
+    Returns the benchmark scenarios as a dict of name -> panel parameters.
+    """
+
+    if quick:
+        return {'quick': dict(QUICK_PANEL)}
+    scenarios = {'base': dict(BASE_PANEL)}
+    for axis, values in SCALING_AXES.items():
+        for value in values:
+            scenarios[f"{axis}={value}"] = dict(BASE_PANEL, **{axis: value})
+    return scenarios
+
+def time_stage(func, repeats = REPEATS):
+    """
+    Runs func `repeats` times and returns the best wall time in seconds together with its last result.
+    """
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def benchmark_scenario(panel_params, repeats = REPEATS):
+    """
+    Times every pipeline stage on one synthetic panel.
+
+    Returns:
+        dict: Stage name -> best wall time in seconds.
+    """
+
+    end_date = str((pd.Timestamp(BENCHMARK_START) + pd.DateOffset(years=panel_params['years']) - pd.Timedelta(days=1)).date())
+    with tempfile.TemporaryDirectory() as data_dir:
+        synthetic_data.write_synthetic_data(data_dir, BENCHMARK_INPUTFILE, start_date=BENCHMARK_START, **panel_params)
+
+        stages = {}
+        stages['load_data_csv'], _ = time_stage(lambda: load_commodities_data.load_data(data_dir, BENCHMARK_INPUTFILE, use_cache=False), repeats)
+        #The first cached load builds the sidecar, the timed ones read it
+        load_commodities_data.load_data(data_dir, BENCHMARK_INPUTFILE)
+        stages['load_data_cached'], _ = time_stage(lambda: load_commodities_data.load_data(data_dir, BENCHMARK_INPUTFILE), repeats)
+        stages['clean_process_data'], clean_df = time_stage(
+            lambda: data_preprocessing.clean_process_data(BENCHMARK_START, end_date, data_dir, BENCHMARK_INPUTFILE), repeats)
+        stages['compute_metrics_frame'], metrics_df = time_stage(lambda: replicate_results.compute_metrics_frame(clean_df), repeats)
+        stages['export_table1'], _ = time_stage(
+            lambda: table_export.export_table1(metrics_df, BENCHMARK_START, end_date, Path(data_dir) / "output"), repeats)
+        stages['compute_rolling_statistics'], rolling_stats_df = time_stage(
+            lambda: perform_additional_analysis.compute_rolling_statistics(clean_df), repeats)
+        #Panels shorter than the rolling window have no rolling statistics to draw
+        figures = [name for name in perform_additional_analysis.get_figure_names(FIGURE_ROLLING_WINDOW)
+                   if 'rolling' not in name or panel_params['years'] * 12 > FIGURE_ROLLING_WINDOW]
+        #Forced, as unchanged figures are otherwise skipped after the first run
+        stages['render_figures'], _ = time_stage(
+            lambda: perform_additional_analysis.render_figures(clean_df, Path(data_dir) / "output", BENCHMARK_START,
+                                                               FIGURE_ROLLING_WINDOW, rolling_stats_df=rolling_stats_df,
+                                                               force=True, figures=figures), repeats)
+    return stages
+
+def run_benchmarks(quick = False, repeats = REPEATS):
+    """
+    Runs all scenarios.
+
+    Returns:
+        dict: JSON-serializable results with the environment and one record per scenario and stage.
+    """
+
+    results = []
+    for name, panel_params in get_scenarios(quick).items():
+        logging.info(f"Benchmarking scenario {name}")
+        for stage, seconds in benchmark_scenario(panel_params, repeats).items():
+            results.append({'scenario': name, 'stage': stage, 'seconds': seconds, 'params': panel_params})
+    environment = {'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+                   'platform': platform.platform()}
+    return {'environment': environment, 'results': results}
+
+def compare_to_baseline(results, baseline, tolerance = TOLERANCE, min_seconds = MIN_SECONDS):
+    """
+    Compares benchmark results with a baseline run.
+
+    Parameters:
+        results (dict): Output of `run_benchmarks`.
+        baseline (dict): Output of an earlier `run_benchmarks`.
+        tolerance (float): Allowed relative slowdown, e.g. 0.25 for 25%.
+        min_seconds (float): Stages under this time in the baseline are not checked.
+
+    Returns:
+        list: One dict (scenario, stage, baseline, seconds, slowdown) per stage slower than allowed.
+    """
+
+    baseline_seconds = {(record['scenario'], record['stage']): record['seconds'] for record in baseline['results']}
+    regressions = []
+    for record in results['results']:
+        reference = baseline_seconds.get((record['scenario'], record['stage']))
+        if reference is None or reference < min_seconds:
+            continue
+        slowdown = record['seconds'] / reference - 1
+        if slowdown > tolerance:
+            regressions.append({'scenario': record['scenario'], 'stage': record['stage'], 'baseline': reference,
+                                'seconds': record['seconds'], 'slowdown': slowdown})
+    return regressions
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages on synthetic futures panels.")
+    parser.add_argument('--quick', action='store_true', help="run a single small scenario")
+    parser.add_argument('--repeats', type=int, default=REPEATS, help="timed runs per stage, the best one is kept")
+    parser.add_argument('--output', type=Path, default=Path(OUTPUT_DIR) / BENCHMARK_FILE, help="JSON file for the results")
+    parser.add_argument('--baseline', type=Path, default=None, help="JSON results of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help="allowed relative slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.quick, args.repeats)
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=1)
+    logging.info(f"{args.output.name} Stored Successfully!")
+
+    if args.baseline is None:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare_to_baseline(results, baseline, args.tolerance)
+    for regression in regressions:
+        logging.error(f"{regression['scenario']} / {regression['stage']}: {regression['seconds']:.3f}s vs "
+                      f"{regression['baseline']:.3f}s in the baseline ({regression['slowdown']:+.0%})")
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    sys.exit(main())
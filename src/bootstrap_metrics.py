@@ -0,0 +1,212 @@
+"""
+This module computes bootstrap confidence intervals for the annualized excess return, volatility and Sharpe
+ratio of each commodity, the point estimates of `replicate_results.compute_performance_metrics`.
+
+Monthly returns are autocorrelated, so whole blocks of consecutive months are resampled, either with the
+stationary bootstrap (blocks of geometric length, wrapping around the sample) or the moving-block bootstrap
+(blocks of fixed length). The resample indices of a batch are drawn as one array and all commodities are
+evaluated at once. Batches are sized so that their index and value arrays stay below a memory ceiling, each
+batch has its own seed spawned from the user seed, and batches can be spread over a process pool: for a
+given seed and memory ceiling the output is the same whatever the number of workers.
+"""
+
+import warnings
+warnings.filterwarnings("ignore")
+
+import config
+from pathlib import Path
+import pandas as pd
+import numpy as np
+import logging
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+
+import load_commodities_data
+import data_preprocessing
+import replicate_results
+
+DATA_DIR = config.DATA_DIR
+INPUTFILE = config.INPUTFILE
+OUTPUT_DIR = config.OUTPUT_DIR
+PERIODS = config.PERIODS
+METRICS_WORKERS = config.METRICS_WORKERS
+
+NUM_RESAMPLES = 10_000
+BLOCK_LENGTH = 6
+CONFIDENCE_LEVEL = 0.95
+BOOTSTRAP_SEED = 0
+BOOTSTRAP_METHODS = ['stationary', 'moving_block']
+
+#Upper bound on the memory of one batch of resamples, in bytes
+MAX_BATCH_MEMORY = 256 * 2**20
+#Bytes held per resample, month and commodity in a batch: the int64 indices and the float64 temporaries
+BYTES_PER_CELL = 40
+
+PERFORMANCE_COLUMNS = ['Ann. Excess Returns', 'Ann. Volatility', 'Ann. Sharpe Ratio']
+
+def compact_returns(excess_returns_df):
+    """
+    Moves the observed returns of every commodity to the top of its column.
+
+    Parameters:
+        excess_returns_df (DataFrame): Monthly excess returns, one column per commodity.
+
+    Returns:
+        tuple: (float array of shape (max observations, commodities) padded with NaN,
+        int array with the number of observed returns of each commodity)
+    """
+
+    returns = excess_returns_df.to_numpy(dtype=float)
+    valid = np.isfinite(returns)
+    num_obs = valid.sum(axis=0)
+    #A stable sort on the missing flag keeps the observed returns in time order
+    order = np.argsort(~valid, axis=0, kind='stable')
+    compact = np.take_along_axis(np.where(valid, returns, np.nan), order, axis=0)[:max(int(num_obs.max(initial=0)), 1)]
+    return compact, num_obs
+
+def draw_block_indices(rng, num_resamples, length, num_obs, block_length = BLOCK_LENGTH, method = 'stationary'):
+    """
+    Draws block-bootstrap resample indices for all commodities at once.
+
+    One array of uniform draws is shared by all commodities and scaled to each commodity's own number
+    of observations, so a resample of every commodity uses the same block boundaries.
+
+    Parameters:
+        rng (Generator): NumPy random generator.
+        num_resamples (int): Number of resamples to draw.
+        length (int): Number of months of a resample (the longest series); months at or after a
+            commodity's own number of observations are ignored by `resample_statistics`.
+        num_obs (ndarray): Number of observed returns of each commodity.
+        block_length (int): Fixed (moving block) or expected (stationary) block length in months.
+        method (str): 'stationary' or 'moving_block'.
+
+    Returns:
+        ndarray: int64 array of shape (num_resamples, length, commodities) of row positions.
+    """
+
+    if method not in BOOTSTRAP_METHODS:
+        raise ValueError(f"Unknown bootstrap method {method!r}, expected one of {BOOTSTRAP_METHODS}")
+
+    months = np.arange(length)
+    if method == 'stationary':
+        new_block = rng.random((num_resamples, length)) < 1 / block_length
+        new_block[:, 0] = True
+        block_start = np.maximum.accumulate(np.where(new_block, months, 0), axis=1)
+    else:
+        block_start = np.broadcast_to(months - months % block_length, (num_resamples, length))
+    offset = (months - block_start)[:, :, np.newaxis]
+    start_draws = np.take_along_axis(rng.random((num_resamples, length)), block_start, axis=1)[:, :, np.newaxis]
+
+    num_obs = np.maximum(num_obs, 1)
+    if method == 'stationary':
+        #Blocks wrap around the end of the sample
+        return (np.floor(start_draws * num_obs).astype(np.int64) + offset) % num_obs
+    num_starts = np.maximum(num_obs - block_length + 1, 1)
+    return (np.floor(start_draws * num_starts).astype(np.int64) + offset) % num_obs
+
+def resample_statistics(compact, num_obs, indices, annualizing_period = 12):
+    """
+    Evaluates the annualized mean, volatility and Sharpe ratio of every resample and commodity.
+
+    Parameters:
+        compact (ndarray): Compacted returns, see `compact_returns`.
+        num_obs (ndarray): Number of observed returns of each commodity.
+        indices (ndarray): Resample indices, see `draw_block_indices`.
+        annualizing_period (int): Factor used to annualize the metrics, default is 12 (for monthly data).
+
+    Returns:
+        ndarray: float array of shape (resamples, 3, commodities), in the order of PERFORMANCE_COLUMNS.
+    """
+
+    values = np.take_along_axis(compact, indices.reshape(-1, compact.shape[1]), axis=0).reshape(indices.shape)
+    in_sample = (np.arange(indices.shape[1]).reshape(-1, 1) < num_obs)[np.newaxis]
+    values = np.where(in_sample, values, 0.0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = values.sum(axis=1) / num_obs
+        variance = (np.where(in_sample, values - mean[:, np.newaxis, :], 0.0) ** 2).sum(axis=1) / (num_obs - 1)
+        avg_excess_returns = mean * annualizing_period * 100
+        std_excess_returns = np.sqrt(variance) * np.sqrt(annualizing_period) * 100
+        sharpe_ratio = avg_excess_returns / std_excess_returns
+    return np.stack([avg_excess_returns, std_excess_returns, sharpe_ratio], axis=1)
+
+def _bootstrap_batch(seed_sequence, num_resamples, compact, num_obs, block_length, method, annualizing_period):
+    """
+    Worker of `compute_bootstrap_intervals`: the statistics of one batch of resamples.
+    """
+
+    rng = np.random.default_rng(seed_sequence)
+    indices = draw_block_indices(rng, num_resamples, compact.shape[0], num_obs, block_length, method)
+    return resample_statistics(compact, num_obs, indices, annualizing_period)
+
+def get_batch_sizes(num_resamples, length, num_commodities, max_batch_memory = MAX_BATCH_MEMORY):
+    """
+    Splits num_resamples into batches whose index and value arrays fit in max_batch_memory bytes.
+    """
+
+    batch_size = max(1, int(max_batch_memory // (BYTES_PER_CELL * max(length, 1) * max(num_commodities, 1))))
+    batch_size = min(batch_size, num_resamples)
+    return [batch_size] * (num_resamples // batch_size) + ([num_resamples % batch_size] if num_resamples % batch_size else [])
+
+def compute_bootstrap_intervals(excess_returns_df, num_resamples = NUM_RESAMPLES, block_length = BLOCK_LENGTH,
+                                method = 'stationary', confidence_level = CONFIDENCE_LEVEL, seed = BOOTSTRAP_SEED,
+                                annualizing_period = 12, max_batch_memory = MAX_BATCH_MEMORY, max_workers = METRICS_WORKERS):
+    """
+    Computes percentile block-bootstrap confidence intervals of the annualized performance metrics.
+
+    Parameters:
+        excess_returns_df (DataFrame): Monthly excess returns, one column per commodity
+            (see `replicate_results.compute_commodity_excess_returns`).
+        num_resamples (int): Number of bootstrap resamples, default: 10,000.
+        block_length (int): Fixed (moving block) or expected (stationary) block length in months.
+        method (str): 'stationary' or 'moving_block'.
+        confidence_level (float): Coverage of the two-sided intervals, default: 0.95.
+        seed (int): Seed of the random draws; the output is deterministic for a given seed and max_batch_memory.
+        annualizing_period (int): Factor used to annualize the metrics, default is 12 (for monthly data).
+        max_batch_memory (int): Upper bound on the memory of one batch of resamples, in bytes.
+        max_workers (int): With more than one worker, batches are evaluated on a process pool,
+            default: config.py -> METRICS_WORKERS
+
+    Returns:
+        DataFrame: Indexed by Commodity, with (metric, 'Estimate' / 'Lower' / 'Upper') columns for
+        Ann. Excess Returns, Ann. Volatility and Ann. Sharpe Ratio.
+    """
+
+    compact, num_obs = compact_returns(excess_returns_df)
+    batch_sizes = get_batch_sizes(num_resamples, compact.shape[0], compact.shape[1], max_batch_memory)
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(batch_sizes))
+    batch_args = (seed_sequences, batch_sizes, repeat(compact), repeat(num_obs), repeat(block_length),
+                  repeat(method), repeat(annualizing_period))
+
+    if max_workers is not None and max_workers > 1 and len(batch_sizes) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            batch_stats = list(executor.map(_bootstrap_batch, *batch_args))
+    else:
+        batch_stats = list(map(_bootstrap_batch, *batch_args))
+    resampled_stats = np.concatenate(batch_stats, axis=0)
+
+    alpha = (1 - confidence_level) / 2
+    lower, upper = np.nanquantile(resampled_stats, [alpha, 1 - alpha], axis=0)
+    estimates = replicate_results.compute_performance_metrics(excess_returns_df, annualizing_period)
+
+    intervals = {}
+    for pos, metric in enumerate(PERFORMANCE_COLUMNS):
+        intervals[(metric, 'Estimate')] = estimates[metric].to_numpy()
+        intervals[(metric, 'Lower')] = lower[pos]
+        intervals[(metric, 'Upper')] = upper[pos]
+    intervals_df = pd.DataFrame(intervals, index=excess_returns_df.columns.astype(str))
+    intervals_df.index.name = 'Commodity'
+    return intervals_df
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    for start_, end_ in PERIODS:
+        try:
+            clean_data_df = load_commodities_data.load_data(DATA_DIR, data_preprocessing.get_clean_file_name(start_, end_, INPUTFILE))
+            excess_returns_df = replicate_results.compute_commodity_excess_returns(clean_data_df)
+            intervals_df = compute_bootstrap_intervals(excess_returns_df)
+            output_file = Path(OUTPUT_DIR) / f"Table1_bootstrap_{start_[:4]}_{end_[:4]}.csv"
+            intervals_df.to_csv(output_file)
+            logging.info(f"{output_file.name} Stored Successfully!")
+        except Exception as e:
+            logging.error(f"An error occurred while bootstrapping the metrics for {start_} to {end_}: {e}")
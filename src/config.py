@@ -38,5 +38,23 @@ ENDDATE_OLD = '2008-12-31'
 STARTDATE_NEW = '2009-01-01'
 ENDDATE_NEW = '2024-12-31'
 
+#Number of worker processes for the per-commodity Table 1 metrics (1 runs them serially)
+METRICS_WORKERS = config('METRICS_WORKERS', default=1, cast=int)
+
+#Memory budget in bytes for the raw rows held at once by the out-of-core mode of out_of_core.py
+OUT_OF_CORE_MEMORY = config('OUT_OF_CORE_MEMORY', default=512 * 2**20, cast=int)
+
+#Opt-in stage tracing (see tracing.py): path of the JSON lines trace file, tracing is off when empty
+TRACE_FILE = config('TRACE_FILE', default='')
+#Also record the peak Python heap of every traced stage with tracemalloc (slower)
+TRACE_MEMORY = config('TRACE_MEMORY', default=False, cast=bool)
+
+#Metrics result store (see metrics_store.py): entries unused for this many days, or beyond this total size, are evicted
+METRICS_STORE_MAX_AGE_DAYS = config('METRICS_STORE_MAX_AGE_DAYS', default=90, cast=int)
+METRICS_STORE_MAX_BYTES = config('METRICS_STORE_MAX_BYTES', default=64 * 2**20, cast=int)
+
+#(start, end) pairs of the periods the pipeline is run for
+PERIODS = [(STARTDATE_OLD, ENDDATE_OLD), (STARTDATE_NEW, ENDDATE_NEW)]
+
 if __name__ == "__main__":
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,222 @@
+"""
+This module builds roll-adjusted continuous futures return series from the clean commodities data.
+
+A roll schedule gives, for every commodity and trading day, the contract number held at the close. The
+return of a day is always measured on the contract held at the previous close, so a roll never produces a
+return between two different contracts. Three roll rules are supported:
+
+    1. 'rank': always hold the same contract number.
+    2. 'days_before_month_end': hold `rank` and roll to `roll_rank` for the last `days` trading days
+       of every month, i.e. out of a contract that expires around month-end.
+    3. 'calendar': hold the contract number given for the latest of a list of roll dates.
+
+Daily and monthly returns of every commodity are computed in one pass over the price cube. Roll schedules
+are cached under data/cache next to the clean file they were built from and reused across runs.
+"""
+
+import warnings
+warnings.filterwarnings("ignore")
+
+import config
+from pathlib import Path
+import hashlib
+import json
+import pandas as pd
+import numpy as np
+import logging
+
+import load_commodities_data
+import data_preprocessing
+import price_cube
+
+DATA_DIR = config.DATA_DIR
+INPUTFILE = config.INPUTFILE
+PERIODS = config.PERIODS
+
+ROLL_RULES = ['rank', 'days_before_month_end', 'calendar']
+DEFAULT_ROLL_RULE = {'rule': 'rank', 'rank': 2}
+
+def _days_to_month_end(dates):
+    """
+    Returns the number of trading days left in the month after each date (0 on the last trading day).
+    """
+
+    months = pd.DatetimeIndex(dates).to_period('M')
+    new_month = np.r_[False, months[1:] != months[:-1]]
+    month_ends = np.r_[np.flatnonzero(new_month), len(months)] - 1
+    return month_ends[np.cumsum(new_month)] - np.arange(len(months))
+
+def build_roll_schedule(cube, rule = 'rank', rank = 2, roll_rank = None, days = 5, calendar = None):
+    """
+    Builds the contract number held by every commodity at the close of every trading day.
+
+    Parameters:
+        cube (PriceCube): Daily price cube.
+        rule (str): 'rank', 'days_before_month_end' or 'calendar'.
+        rank (int): Contract number held outside of rolls (and before the first calendar date).
+        roll_rank (int): Contract number held during the last `days` trading days of a month, default: rank + 1.
+        days (int): Number of trading days before month-end at which to roll, for 'days_before_month_end'.
+        calendar (dict): Roll dates mapped to the contract number held from that date on, for 'calendar'.
+
+    Returns:
+        DataFrame: Date x Commodity frame of int8 contract numbers.
+    """
+
+    if rule not in ROLL_RULES:
+        raise ValueError(f"Unknown roll rule {rule!r}, expected one of {ROLL_RULES}")
+    if rule == 'calendar' and not calendar:
+        raise ValueError("The 'calendar' roll rule needs a calendar of roll dates and contract numbers")
+
+    held = np.full(len(cube.dates), rank, dtype='int8')
+    if rule == 'days_before_month_end':
+        held[_days_to_month_end(cube.dates) < days] = rank + 1 if roll_rank is None else roll_rank
+    elif rule == 'calendar':
+        roll_dates = pd.DatetimeIndex(pd.to_datetime(list(calendar.keys())))
+        order = np.argsort(roll_dates.values, kind='stable')
+        roll_ranks = np.asarray(list(calendar.values()), dtype='int8')[order]
+        latest_roll = roll_dates.values[order].searchsorted(cube.dates.values, side='right') - 1
+        held = np.where(latest_roll >= 0, roll_ranks[np.maximum(latest_roll, 0)], held).astype('int8')
+
+    schedule = np.repeat(held.reshape(-1, 1), len(cube.commodities), axis=1)
+    return pd.DataFrame(schedule, index=pd.DatetimeIndex(cube.dates, name='Date'),
+                        columns=pd.Index(cube.commodities, name='Commodity'))
+
+def compute_continuous_returns(cube, schedule):
+    """
+    Computes the roll-adjusted daily and monthly returns of every commodity.
+
+    The return of a day is the change of the price of the contract held at the previous close since its
+    last observed price. Monthly returns compound the daily returns of the month.
+
+    Parameters:
+        cube (PriceCube): Daily price cube.
+        schedule (DataFrame): Roll schedule on the dates and commodities of the cube, see `build_roll_schedule`.
+
+    Returns:
+        tuple: (daily returns as a Date x Commodity DataFrame, monthly returns as a DataFrame indexed
+        by the last trading day of each month)
+    """
+
+    held = schedule.reindex(index=cube.dates, columns=cube.commodities).to_numpy()
+    contract_pos = pd.Index(cube.contracts).get_indexer(held.ravel()).reshape(held.shape)
+
+    #Row of the last observed price of every cell up to each date
+    rows = np.arange(len(cube.dates)).reshape(-1, 1, 1)
+    last_rows = np.maximum.accumulate(np.where(np.isnan(cube.values), -1, rows), axis=0)
+
+    #The contract held at the previous close is priced today and at its last observation before today
+    commodity_idx = np.arange(len(cube.commodities)).reshape(1, -1)
+    prev_pos = np.maximum(contract_pos[:-1], 0)
+    today = cube.values[1:][np.arange(len(cube.dates) - 1).reshape(-1, 1), commodity_idx, prev_pos]
+    prev_rows = last_rows[:-1][np.arange(len(cube.dates) - 1).reshape(-1, 1), commodity_idx, prev_pos]
+    prev_price = np.where(prev_rows >= 0, cube.values[np.maximum(prev_rows, 0), commodity_idx, prev_pos], np.nan)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        daily = np.where(contract_pos[:-1] >= 0, today / prev_price - 1, np.nan)
+    daily = np.vstack([np.full((1, len(cube.commodities)), np.nan), daily])
+    daily_returns_df = pd.DataFrame(daily, index=pd.DatetimeIndex(cube.dates, name='Date'),
+                                    columns=pd.Index(cube.commodities, name='Commodity'))
+
+    #Compounding through log returns; months without any return stay NaN
+    months = cube.dates.to_period('M')
+    month_starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+    observed = np.isfinite(daily)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_growth = np.where(observed, np.log1p(daily), 0.0)
+    if len(month_starts):
+        monthly = np.expm1(np.add.reduceat(log_growth, month_starts, axis=0))
+        monthly[np.add.reduceat(observed, month_starts, axis=0) == 0] = np.nan
+    else:
+        monthly = log_growth[:0]
+    month_ends = np.r_[month_starts[1:], len(months)] - 1
+    monthly_returns_df = pd.DataFrame(monthly, index=pd.DatetimeIndex(cube.dates[month_ends], name='Date'),
+                                      columns=pd.Index(cube.commodities, name='Commodity'))
+    return daily_returns_df, monthly_returns_df
+
+def _roll_rule_key(roll_rule):
+    """
+    Short, stable name of a roll rule, used to name its cached schedule.
+    """
+
+    rule = dict(DEFAULT_ROLL_RULE, **roll_rule)
+    if rule.get('calendar') is not None:
+        rule['calendar'] = {str(pd.Timestamp(date).date()): int(contract) for date, contract in rule['calendar'].items()}
+    return hashlib.sha256(json.dumps(rule, sort_keys=True).encode()).hexdigest()[:12]
+
+def get_roll_schedule_paths(roll_rule, data_dir = DATA_DIR, input_file = INPUTFILE):
+    """
+    Returns the paths of the cached roll schedule of a clean file and of its metadata file.
+    """
+
+    cache_dir = Path(data_dir) / load_commodities_data.CACHE_DIRNAME
+    stem = f"{Path(input_file).stem}.roll_{_roll_rule_key(roll_rule)}"
+    return cache_dir / f"{stem}.parquet", cache_dir / f"{stem}.json"
+
+def load_roll_schedule(start_date, end_date, roll_rule = DEFAULT_ROLL_RULE, data_dir = DATA_DIR, input_file = INPUTFILE):
+    """
+    Returns the roll schedule of a period for a roll rule, see `build_roll_schedule`.
+
+    The schedule is read from data_dir/cache when it was built from the current clean file of the period
+    (same size and modification time); otherwise it is built from the price cube and stored.
+
+    Parameters:
+        start_date (str): First date of the period, format: 'YYYY-MM-DD'.
+        end_date (str): Last date of the period, format: 'YYYY-MM-DD'.
+        roll_rule (dict): Keyword arguments of `build_roll_schedule`.
+        data_dir (str): Directory where the data files are stored.
+        input_file (str): Name of the raw input file, used to name the clean file.
+
+    Returns:
+        DataFrame: Date x Commodity frame of int8 contract numbers.
+    """
+
+    clean_file = data_preprocessing.get_clean_file_name(start_date, end_date, input_file)
+    stat = (Path(data_dir) / "manual" / clean_file).stat()
+    source = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    parquet_path, meta_path = get_roll_schedule_paths(roll_rule, data_dir, clean_file)
+
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        meta = None
+    if meta is not None and meta.get('source') == source and parquet_path.exists():
+        return pd.read_parquet(parquet_path)
+
+    cube = price_cube.PriceCube.from_frame(load_commodities_data.load_data(data_dir, clean_file))
+    schedule = build_roll_schedule(cube, **roll_rule)
+    try:
+        parquet_path.parent.mkdir(parents=True, exist_ok=True)
+        schedule.to_parquet(parquet_path)
+        with open(meta_path, 'w') as f:
+            json.dump({'source': source, 'roll_rule': _roll_rule_key(roll_rule)}, f)
+    except Exception as e:
+        logging.warning(f"Could not store the roll schedule of {clean_file}: {e}")
+    return schedule
+
+def compute_roll_adjusted_returns(prep_df, roll_rule = DEFAULT_ROLL_RULE, schedule = None):
+    """
+    Computes the roll-adjusted daily and monthly returns of every commodity in prep_df.
+
+    Parameters:
+        prep_df (DataFrame): Clean data with Date (index or column), Commodity, Contract and ClosePrice.
+        roll_rule (dict): Keyword arguments of `build_roll_schedule`, used when no schedule is given.
+        schedule (DataFrame): Optional precomputed roll schedule, e.g. from `load_roll_schedule`.
+
+    Returns:
+        tuple: (daily returns DataFrame, monthly returns DataFrame), see `compute_continuous_returns`.
+    """
+
+    cube = price_cube.PriceCube.from_frame(prep_df)
+    if schedule is None:
+        schedule = build_roll_schedule(cube, **roll_rule)
+    return compute_continuous_returns(cube, schedule)
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    for start_, end_ in PERIODS:
+        try:
+            schedule_df = load_roll_schedule(start_, end_, DEFAULT_ROLL_RULE, DATA_DIR, INPUTFILE)
+            logging.info(f"Roll schedule for {start_} to {end_} available ({schedule_df.shape[0]} days)")
+        except Exception as e:
+            logging.error(f"An error occurred while building the roll schedule for {start_} to {end_}: {e}")
@@ -1,41 +1,69 @@
 """
 Preprocessing tasks include verification of variable data types, renaming columns for consistency, 
 sorting data by date and commodity, and filtering based on predefined criteria. The module aims to prepare 
-the raw data into a format suitable for further analysis.
+the raw data into a format suitable for further analysis. Any number of periods can be produced from a
+single load of the raw data with `clean_process_periods`.
 """
 
 import warnings
 warnings.filterwarnings("ignore")
 
+import os
+import argparse
 import pandas as pd
 import config
+import tracing
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 import load_commodities_data
 import logging
-logging.basicConfig(level=logging.INFO, format='%(message)s')
 
 DATA_DIR = config.DATA_DIR
 INPUTFILE = config.INPUTFILE
 STARTDATE = config.STARTDATE_OLD
 ENDDATE = config.ENDDATE_OLD
+PERIODS = config.PERIODS
 
-def clean_process_data(start_date = STARTDATE, end_date = ENDDATE, data_dir = DATA_DIR, input_file = INPUTFILE):
+#Commodities with data inconsistencies on Bloomberg
+COMMODITIES_TO_DROP = ['Barley', 'Coal', 'Propane', 'Broilers', 'Butter']
+
+@tracing.traced
+def clean_process_data(start_date = STARTDATE, end_date = ENDDATE, data_dir = DATA_DIR, input_file = INPUTFILE,
+                       commodities = None, exclude_commodities = COMMODITIES_TO_DROP, contract_range = None):
     """
     Inputs:
         1. start_date, format: 'YYYY-MM-DD', default: config.py -> STARTDATE_OLD
         2. end_date, format: 'YYYY-MM-DD', default: config.py -> ENDDATE_OLD
         3. data_dir, format: str, default: config.py -> DATADIR
         4. input_file, format: str, default: config.py -> FILENAME
+        5. commodities, format: list, default: None (all commodities)
+        6. exclude_commodities, format: list, default: COMMODITIES_TO_DROP
+        7. contract_range, format: (first, last) inclusive, default: None (all contracts)
     Output:
         Clean DataFrame for Close Prices
+
+    The date, commodity and contract filters are pushed down to `load_commodities_data.load_data`,
+    so only the rows that are kept are read and converted.
     """
     try:
-        #loading base data
-        base_data_df = load_commodities_data.load_data(data_dir, input_file)
+        #loading base data, filtered while reading
+        base_data_df = load_commodities_data.load_data(data_dir, input_file, start_date=start_date, end_date=end_date,
+                                                       commodities=commodities, exclude_commodities=exclude_commodities,
+                                                       contract_range=contract_range)
     
     except Exception as e:
         logging.error(f"Failed to load data: {e}")
-    
+
+    final_df = _drop_unused_commodities(_clean_frame(base_data_df))
+
+    #returning the final dataframe for further analysis
+    return final_df
+
+def _clean_frame(base_data_df):
+    """
+    Renames, types and sorts a raw commodities frame and sets the sorted Date as its index.
+    """
+
     #Changing Column name from PX_LAST to ClosePrice
     base_data_df.rename(columns = {'PX_LAST':'ClosePrice'}, inplace = True)
     
@@ -44,34 +72,204 @@ def clean_process_data(start_date = STARTDATE, end_date = ENDDATE, data_dir = DA
     base_data_df['Contract'] = base_data_df['Contract'].astype(int)
     base_data_df['ClosePrice'] = base_data_df['ClosePrice'].astype(float)
 
-    #Creating a column for YearMonth, which makes analysis easier
-    base_data_df['YearMonth'] = base_data_df['Date'].dt.to_period('M')
-    
-    #Filtering out Commodities with data inconsistencies on Bloomberg
-    commodities_to_drop = ['Barley', 'Coal', 'Propane', 'Broilers', 'Butter']
-    base_data_df = base_data_df[~base_data_df['Commodity'].isin(commodities_to_drop)]
+    #Creating a column for YearMonth as int32 month codes (year * 12 + month - 1), which makes analysis easier
+    base_data_df['YearMonth'] = load_commodities_data.to_month_code(base_data_df['Date'])
     
     #Sorting the dataframe and setting Date as index
     base_data_df.sort_values(by=['Date','Commodity'], inplace = True)
     base_data_df.set_index('Date', inplace = True)
+    return base_data_df
 
-    #Filtering Data for Start and End Date (User Defined, otherwise default)
-    final_df = base_data_df[start_date:end_date]
+def _drop_unused_commodities(df):
+    """
+    Drops categories of commodities that are not present in the selected period.
+    """
 
-    #returning the final dataframe for further analysis
-    return final_df
+    if isinstance(df['Commodity'].dtype, pd.CategoricalDtype):
+        df['Commodity'] = df['Commodity'].cat.remove_unused_categories()
+    return df
+
+def slice_period(clean_df, start_date = None, end_date = None):
+    """
+    Cuts a period out of a clean DataFrame by binary search on its sorted Date index.
+
+    Parameters:
+        clean_df (DataFrame): Clean DataFrame sorted by Date, as returned by `clean_process_data`.
+        start_date (str): First date of the period, format: 'YYYY-MM-DD'.
+        end_date (str): Last date of the period (inclusive), format: 'YYYY-MM-DD'.
+
+    Returns:
+        DataFrame: The rows of the period, with unused commodity categories dropped.
+    """
+
+    start, end = load_commodities_data.get_date_bounds(start_date, end_date)
+    dates = clean_df.index.values
+    first = 0 if start is None else dates.searchsorted(start.to_datetime64(), side='left')
+    last = len(dates) if end is None else dates.searchsorted(end.to_datetime64(), side='right')
+    return _drop_unused_commodities(clean_df.iloc[first:last].copy())
+
+@tracing.traced
+def clean_process_periods(periods = PERIODS, data_dir = DATA_DIR, input_file = INPUTFILE,
+                          commodities = None, exclude_commodities = COMMODITIES_TO_DROP, contract_range = None):
+    """
+    Loads and cleans the raw data once and emits one clean DataFrame per period.
+
+    Parameters:
+        periods (list): List of (start_date, end_date) pairs, default: config.py -> PERIODS
+        data_dir, input_file, commodities, exclude_commodities, contract_range: as in `clean_process_data`.
+
+    Returns:
+        dict: A dictionary mapping each (start_date, end_date) pair to its clean DataFrame.
+    """
+
+    periods = list(periods)
+    #Loading the union of all periods only once
+    starts = [start_ for start_, _ in periods]
+    ends = [end_ for _, end_ in periods]
+    load_start = None if None in starts else min(load_commodities_data.get_date_bounds(start_date=s)[0] for s in starts)
+    load_end = None if None in ends else max(load_commodities_data.get_date_bounds(end_date=e)[1] for e in ends)
+
+    clean_df = clean_process_data(load_start, load_end, data_dir, input_file, commodities=commodities,
+                                  exclude_commodities=exclude_commodities, contract_range=contract_range)
+    return {(start_, end_): slice_period(clean_df, start_, end_) for start_, end_ in periods}
+
+def get_clean_file_name(start_date, end_date, input_file = INPUTFILE):
+    """
+    Returns the name of the clean file of a period, e.g. clean_1970_2008_commodities_data.csv
+    """
+
+    return f"clean_{str(start_date)[:4]}_{str(end_date)[:4]}_{input_file}"
+
+@tracing.traced
+def store_clean_data(clean_df, file_path):
+    """
+    Writes a clean DataFrame to a CSV file and logs the outcome.
+    """
+
+    try:
+        clean_df.to_csv(file_path)
+        logging.info(f"{Path(file_path).name} Stored Successfully!")
+    except Exception as e:
+        logging.error(f"An error occurred while Storing the {Path(file_path).name}: {e}")
+
+def store_clean_periods(period_dfs, data_dir = DATA_DIR, input_file = INPUTFILE, max_workers = None):
+    """
+    Writes the clean DataFrame of every period to data_dir/manual, in parallel.
+
+    Parameters:
+        period_dfs (dict): Mapping of (start_date, end_date) to clean DataFrame, as returned by `clean_process_periods`.
+        data_dir (str): Directory where the clean files are stored.
+        input_file (str): Name of the raw input file, used to name the clean files.
+        max_workers (int): Number of worker processes, default: one per period (capped by the CPU count).
+
+    Returns:
+        list: Paths of the files that were written.
+    """
+
+    file_paths = [Path(data_dir) / "manual" / get_clean_file_name(start_, end_, input_file) for start_, end_ in period_dfs]
+    if max_workers is None:
+        max_workers = min(len(file_paths), os.cpu_count() or 1)
+
+    if max_workers <= 1 or len(file_paths) <= 1:
+        for clean_df, file_path in zip(period_dfs.values(), file_paths):
+            store_clean_data(clean_df, file_path)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(store_clean_data, period_dfs.values(), file_paths))
+    return file_paths
+
+def rebuild_clean_periods(periods = PERIODS, data_dir = DATA_DIR, input_file = INPUTFILE,
+                          exclude_commodities = COMMODITIES_TO_DROP, reset_state = True):
+    """
+    Full rebuild of the clean period files from a single load of the raw data.
+
+    Parameters:
+        periods (list): List of (start_date, end_date) pairs, default: config.py -> PERIODS
+        data_dir, input_file, exclude_commodities: as in `clean_process_data`.
+        reset_state (bool): Restart incremental ingestion from the current end of the raw file and record the
+            last date of every clean file. Only for a rebuild of all the periods that are updated incrementally.
+
+    Returns:
+        list: Paths of the files that were written.
+    """
+
+    period_dfs = clean_process_periods(periods, data_dir, input_file, exclude_commodities=exclude_commodities)
+    file_paths = store_clean_periods(period_dfs, data_dir, input_file)
+    if reset_state:
+        load_commodities_data.reset_ingest_state(data_dir, input_file)
+        load_commodities_data.record_last_dates({get_clean_file_name(start_, end_, input_file): clean_df.index.max()
+                                                 for (start_, end_), clean_df in period_dfs.items() if not clean_df.empty},
+                                                data_dir, input_file)
+    return file_paths
+
+def update_clean_periods(periods = PERIODS, data_dir = DATA_DIR, input_file = INPUTFILE, exclude_commodities = COMMODITIES_TO_DROP):
+    """
+    Incremental update of the clean period files from the rows appended to the raw input file.
+
+    Only rows after the per-(Commodity, Contract) high-water mark are read and cleaned
+    (see `load_commodities_data.ingest_new_data`). They are appended to the clean file of every period
+    they fall into, which is left untouched otherwise, so that downstream tasks of the other periods stay
+    up to date. A period is re-cut from the raw data instead if its clean file is missing or the new rows
+    are not all later than its last date (recorded with the ingestion state, so the clean file is not read).
+    All periods are rebuilt if the raw file has no ingestion state or was rewritten rather than appended to.
+
+    Parameters:
+        periods (list): List of (start_date, end_date) pairs, default: config.py -> PERIODS. The high-water
+            marks are shared, so these should be all the periods that are updated incrementally.
+        data_dir, input_file, exclude_commodities: as in `clean_process_data`.
+
+    Returns:
+        list: The (start_date, end_date) pairs whose clean file was written.
+    """
+
+    periods = list(periods)
+    if not load_commodities_data.is_append_only(data_dir, input_file):
+        logging.info(f"{input_file} has no incremental ingestion state or was rewritten, rebuilding every period.")
+        rebuild_clean_periods(periods, data_dir, input_file, exclude_commodities)
+        return periods
+
+    new_rows = load_commodities_data.ingest_new_data(data_dir, input_file)
+    new_rows = load_commodities_data.filter_frame(new_rows, exclude_commodities=exclude_commodities)
+    new_clean_df = _clean_frame(new_rows.copy())
+    last_dates = load_commodities_data.get_last_dates(data_dir, input_file)
+
+    updated_periods, new_last_dates = [], {}
+    for start_, end_ in periods:
+        clean_file = get_clean_file_name(start_, end_, input_file)
+        file_path = Path(data_dir) / "manual" / clean_file
+        period_new_df = slice_period(new_clean_df, start_, end_)
+        last_date = last_dates.get(clean_file) if file_path.exists() else None
+        if last_date is not None and period_new_df.empty:
+            continue
+
+        if last_date is not None and period_new_df.index.min() > last_date:
+            load_commodities_data.append_data(period_new_df, data_dir, clean_file)
+            logging.info(f"{len(period_new_df)} rows appended to {clean_file}")
+            new_last_dates[clean_file] = period_new_df.index.max()
+        else:
+            clean_df = clean_process_data(start_, end_, data_dir, input_file, exclude_commodities=exclude_commodities)
+            store_clean_data(clean_df, file_path)
+            if not clean_df.empty:
+                new_last_dates[clean_file] = clean_df.index.max()
+        updated_periods.append((start_, end_))
+
+    load_commodities_data.record_last_dates(new_last_dates, data_dir, input_file)
+    if not updated_periods:
+        logging.info("No new rows to process, clean data is up to date.")
+    return updated_periods
 
 if __name__ == '__main__':
-    start_dates = [config.STARTDATE_OLD, config.STARTDATE_NEW]
-    end_dates = [config.ENDDATE_OLD, config.ENDDATE_NEW]
-    
-    for start_, end_ in zip(start_dates, end_dates):
-        logging.info(f"\nFor Time Period, {start_} to {end_}:")
-        clean_df = clean_process_data(start_, end_, DATA_DIR, INPUTFILE)
-        file_path = Path(DATA_DIR) / "manual" / f"clean_{start_[:4]}_{end_[:4]}_{INPUTFILE}"
-        try:
-            clean_df.to_csv(file_path)
-            logging.info(f"clean_{start_[:4]}_{end_[:4]}_{INPUTFILE} Stored Successfully!")
-        except Exception as e:
-            logging.error(f"An error occurred while Storing the clean_{start_[:4]}_{end_[:4]}_{INPUTFILE}: {e}") 
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    parser = argparse.ArgumentParser(description="Clean the raw data into one file per period.")
+    parser.add_argument('--incremental', action='store_true', help="only process the rows appended to the raw file")
+    parser.add_argument('--period', nargs=2, metavar=('START', 'END'), help="clean a single period, format: 'YYYY-MM-DD'")
+    args = parser.parse_args()
+    periods = [tuple(args.period)] if args.period else PERIODS
 
+    if args.incremental:
+        logging.info("\nIncremental update of the clean data:")
+        update_clean_periods(periods, DATA_DIR, INPUTFILE)
+    else:
+        logging.info(f"\nCleaning {len(periods)} Time Periods in a single pass:")
+        #A single period leaves the ingestion state as it is, the other periods would miss the rows it records as seen
+        rebuild_clean_periods(periods, DATA_DIR, INPUTFILE, reset_state=not args.period)
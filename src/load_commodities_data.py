@@ -1,43 +1,548 @@
 """
-This module is designed for loading and initial processing of commodity data stored in a local directory. 
+This module is designed for loading and initial processing of commodity data stored in a local directory.
 It includes functionality to load data from a specified CSV file and logs the status of data loading.
+
+Parsing the CSV is the dominant cost of every stage, so `load_data` keeps a typed, columnar (Parquet)
+sidecar of each CSV it reads under `<data_dir>/cache`. The sidecar is rebuilt transparently whenever
+the size, modification time or content hash of the source CSV changes. It is stored in Date order so
+that date, commodity and contract filters passed to `load_data` are pushed down to row-group statistics.
+
+For a feed that appends daily rows, `ingest_new_data` keeps a per-(Commodity, Contract) high-water mark
+and returns only the rows after it, extending the sidecar instead of re-parsing the whole file.
 """
 
 import warnings
 import logging
 warnings.filterwarnings("ignore")
 
+import hashlib
+import os
+import json
+import numpy as np
 import pandas as pd
 import config
+import tracing
 from pathlib import Path
 
 DATA_DIR = config.DATA_DIR
 INPUTFILE = config.INPUTFILE
 
-def load_data(data_dir = DATA_DIR, input_file = INPUTFILE):
+CACHE_DIRNAME = "cache"
+CACHE_SCHEMA_VERSION = 3
+CACHE_ROW_GROUP_SIZE = 100_000
+CSV_CHUNKSIZE = 500_000
+TAIL_DIGEST_BYTES = 1 << 16
+
+#Fixed schema of the columnar cache, applied to whichever of these columns the CSV contains
+CACHE_SCHEMA = {
+    'Commodity': 'category',
+    'Contract': 'int8',
+    'PX_LAST': 'float64',
+    'ClosePrice': 'float64',
+    'YearMonth': 'int32',
+}
+DATE_COLUMNS = ['Date']
+
+def to_month_code(dates):
+    """
+    Converts dates to compact int32 month codes, year * 12 + (month - 1).
+
+    Parameters:
+        dates (Series, DatetimeIndex or PeriodIndex): Dates (or monthly periods) to convert.
+
+    Returns:
+        ndarray: int32 array of month codes.
+    """
+
+    dates = pd.Series(dates)
+    if not isinstance(dates.dtype, pd.PeriodDtype):
+        dates = pd.to_datetime(dates)
+    return (dates.dt.year.to_numpy() * 12 + dates.dt.month.to_numpy() - 1).astype('int32')
+
+def month_code_to_period(codes):
+    """
+    Converts int32 month codes back to a monthly PeriodIndex, e.g. for display.
+    """
+
+    #Monthly period ordinals count months from January 1970
+    ordinals = np.asarray(codes, dtype='int64') - 1970 * 12
+    return pd.PeriodIndex(pd.arrays.PeriodArray(ordinals, dtype=pd.PeriodDtype('M')))
+
+def _file_hash(file_path, chunk_size = 1 << 20):
+    """
+    Computes the SHA-256 digest of a file, reading it in chunks.
+    """
+
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _file_fingerprint(file_path):
+    """
+    Returns the size and modification time of a file. Raises FileNotFoundError if it does not exist.
+    """
+
+    stat = Path(file_path).stat()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def get_cache_paths(data_dir = DATA_DIR, input_file = INPUTFILE):
+    """
+    Returns the paths of the Parquet sidecar and its metadata file for a given input file.
+
+    Parameters:
+        data_dir (str): Directory where the data file is stored.
+        input_file (str): Name of the CSV file the sidecar belongs to.
+
+    Returns:
+        tuple: (Path to the .parquet sidecar, Path to the .json metadata file)
+    """
+
+    cache_dir = Path(data_dir) / CACHE_DIRNAME
+    stem = Path(input_file).stem
+    return cache_dir / f"{stem}.parquet", cache_dir / f"{stem}.meta.json"
+
+def apply_schema(df):
+    """
+    Casts the known columns of a commodities DataFrame to the fixed cache schema.
+
+    Parameters:
+        df (DataFrame): Data frame as read from a commodities CSV.
+
+    Returns:
+        pandas.DataFrame: The same data with Commodity as categorical, Contract as int8,
+        Date as datetime64, prices as float64 and YearMonth as int32 month codes.
+    """
+
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col])
+    #Month labels written as text by older versions (e.g. '1970-01') are converted to month codes
+    if 'YearMonth' in df.columns and not pd.api.types.is_integer_dtype(df['YearMonth']):
+        df['YearMonth'] = to_month_code(pd.PeriodIndex(df['YearMonth'].astype(str), freq='M'))
+    for col, dtype in CACHE_SCHEMA.items():
+        if col in df.columns:
+            df[col] = df[col].astype(dtype)
+    return df
+
+def _read_json(json_path):
+    try:
+        with open(json_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _cache_is_valid(file_path, parquet_path, meta_path):
+    """
+    Checks the sidecar against the source CSV. Size and mtime are compared first; the content hash
+    is only computed when they differ, so an unchanged file is validated without reading it.
+    """
+
+    meta = _read_json(meta_path)
+    if meta is None or meta.get('schema_version') != CACHE_SCHEMA_VERSION or not parquet_path.exists():
+        return False
+
+    fingerprint = _file_fingerprint(file_path)
+    if fingerprint['size'] == meta.get('size') and fingerprint['mtime_ns'] == meta.get('mtime_ns'):
+        return True
+    if fingerprint['size'] != meta.get('size'):
+        return False
+
+    #Same size but touched: fall back to the content hash and refresh the metadata if it still matches
+    if _file_hash(file_path) != meta.get('sha256'):
+        return False
+    meta.update(fingerprint)
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+    return True
+
+def has_valid_cache(data_dir = DATA_DIR, input_file = INPUTFILE):
+    """
+    Returns True if the Parquet sidecar of an input file exists and matches the file, without building it.
+    """
+
+    parquet_path, meta_path = get_cache_paths(data_dir, input_file)
+    return _cache_is_valid(Path(data_dir) / "manual" / input_file, parquet_path, meta_path)
+
+def get_data_fingerprint(data_dir = DATA_DIR, input_file = INPUTFILE):
+    """
+    Returns the SHA-256 digest of the content of an input file. The digest recorded with its Parquet sidecar
+    is reused while the file keeps the same size and modification time, so the file is only read when it changed.
+    """
+
+    file_path = Path(data_dir) / "manual" / input_file
+    _, meta_path = get_cache_paths(data_dir, input_file)
+    meta = _read_json(meta_path)
+    fingerprint = _file_fingerprint(file_path)
+    if meta is not None and meta.get('sha256') and all(meta.get(key) == value for key, value in fingerprint.items()):
+        return meta['sha256']
+    return _file_hash(file_path)
+
+@tracing.traced
+def build_cache(file_path, parquet_path, meta_path):
+    """
+    Parses the source CSV, applies the fixed schema and writes the Parquet sidecar with its metadata.
+
+    Returns:
+        pandas.DataFrame: The typed data frame that was written to the cache.
+    """
+
+    fingerprint = _file_fingerprint(file_path)
+    df = apply_schema(pd.read_csv(file_path))
+    if _write_cache(df, file_path, parquet_path, meta_path, fingerprint):
+        logging.info(f"Columnar cache for {Path(file_path).name} built at {parquet_path}")
+    return df
+
+def _write_cache(df, file_path, parquet_path, meta_path, fingerprint):
+    """
+    Writes a typed frame to the Parquet sidecar in Date order, followed by its metadata.
+    Returns False (and leaves the cache to be rebuilt on the next load) if writing fails.
+    """
+
+    if 'Date' in df.columns:
+        df = df.sort_values('Date', kind='stable', ignore_index=True)
+    try:
+        parquet_path.parent.mkdir(parents=True, exist_ok=True)
+        #Moved in place once complete, so that concurrent loads of the same file never read a partial sidecar
+        tmp_path = parquet_path.with_name(f"{parquet_path.name}.{os.getpid()}.tmp")
+        df.to_parquet(tmp_path, index=False, row_group_size=CACHE_ROW_GROUP_SIZE)
+        os.replace(tmp_path, parquet_path)
+        meta = dict(fingerprint, sha256=_file_hash(file_path), schema_version=CACHE_SCHEMA_VERSION,
+                    source=str(file_path))
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f)
+        return True
+    except Exception as e:
+        logging.warning(f"Could not write the columnar cache for {Path(file_path).name}: {e}")
+        return False
+
+def _read_appended_rows(file_path, offset):
+    """
+    Parses only the rows of a CSV that start at byte `offset`, using the column names of its header.
+    """
+
+    with open(file_path, 'rb') as f:
+        header_line = f.readline()
+        if offset <= len(header_line):
+            return pd.read_csv(file_path)
+        header = header_line.decode().rstrip('\r\n').split(',')
+        f.seek(offset)
+        try:
+            return pd.read_csv(f, header=None, names=header)
+        except pd.errors.EmptyDataError:
+            return pd.DataFrame(columns=header)
+
+def _extend_cache(file_path, parquet_path, meta_path, previous_size, appended_df = None):
+    """
+    Extends the sidecar of a CSV that grew by appending, parsing only the appended bytes.
+
+    Parameters:
+        previous_size (int): Size of the CSV the sidecar was built from, i.e. the offset of the appended rows.
+        appended_df (DataFrame): The appended rows if they were already parsed (and typed).
+
+    Returns:
+        bool: True if the sidecar was extended, False if it did not match `previous_size` and was left as is.
+    """
+
+    meta = _read_json(meta_path)
+    if meta is None or meta.get('size') != previous_size or not parquet_path.exists():
+        return False
+
+    fingerprint = _file_fingerprint(file_path)
+    if appended_df is None:
+        appended_df = apply_schema(_read_appended_rows(file_path, previous_size))
+    df = pd.concat([pd.read_parquet(parquet_path), appended_df], ignore_index=True)
+    return _write_cache(apply_schema(df), file_path, parquet_path, meta_path, fingerprint)
+
+def append_data(new_df, data_dir = DATA_DIR, input_file = INPUTFILE, index = True):
+    """
+    Appends rows to a CSV in data_dir/manual and extends its columnar sidecar without re-parsing the file.
+
+    Parameters:
+        new_df (DataFrame): Rows to append, with the same columns (and index, if `index`) as the file.
+        data_dir (str): Directory where the data file is stored.
+        input_file (str): Name of the file to append to.
+        index (bool): Whether the index of `new_df` is written as the first column, as for the clean files.
+    """
+
+    file_path = Path(data_dir) / "manual" / input_file
+    parquet_path, meta_path = get_cache_paths(data_dir, input_file)
+    cache_is_valid = _cache_is_valid(file_path, parquet_path, meta_path)
+    previous_size = _file_fingerprint(file_path)['size']
+
+    new_df.to_csv(file_path, mode='a', header=False, index=index)
+    if cache_is_valid:
+        _extend_cache(file_path, parquet_path, meta_path, previous_size)
+
+def get_date_bounds(start_date = None, end_date = None):
+    """
+    Converts user supplied date bounds to inclusive timestamps. Like partial string slicing on a
+    DatetimeIndex, an end date such as '2008-12' or '2008' covers the whole month or year.
+    """
+
+    start = pd.Timestamp(start_date) if start_date is not None else None
+    if end_date is None:
+        end = None
+    elif isinstance(end_date, str):
+        end = pd.Period(end_date).end_time
+    else:
+        end = pd.Timestamp(end_date)
+    return start, end
+
+def build_filters(start_date = None, end_date = None, commodities = None, exclude_commodities = None, contract_range = None):
+    """
+    Translates the row filters accepted by `load_data` into Parquet (pyarrow) filter predicates.
+
+    Returns:
+        list: A list of (column, operator, value) tuples, empty if no filter applies.
+    """
+
+    start, end = get_date_bounds(start_date, end_date)
+    filters = []
+    if start is not None:
+        filters.append(('Date', '>=', start))
+    if end is not None:
+        filters.append(('Date', '<=', end))
+    if commodities is not None:
+        filters.append(('Commodity', 'in', list(commodities)))
+    if exclude_commodities:
+        filters.append(('Commodity', 'not in', list(exclude_commodities)))
+    if contract_range is not None:
+        filters.append(('Contract', '>=', int(contract_range[0])))
+        filters.append(('Contract', '<=', int(contract_range[1])))
+    return filters
+
+def filter_frame(df, start_date = None, end_date = None, commodities = None, exclude_commodities = None, contract_range = None):
+    """
+    Applies the same row filters as `build_filters` to an in-memory DataFrame with a Date column.
+    """
+
+    start, end = get_date_bounds(start_date, end_date)
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df['Date'] >= start
+    if end is not None:
+        mask &= df['Date'] <= end
+    if commodities is not None:
+        mask &= df['Commodity'].isin(commodities)
+    if exclude_commodities:
+        mask &= ~df['Commodity'].isin(exclude_commodities)
+    if contract_range is not None:
+        mask &= df['Contract'].between(contract_range[0], contract_range[1])
+    return df[mask] if not mask.all() else df
+
+def _read_csv_filtered(file_path, **filter_kwargs):
+    """
+    Reads a CSV in chunks and keeps only the rows matching the filters, so peak memory is
+    proportional to the rows kept rather than to the file size.
+    """
+
+    chunks = []
+    for chunk in pd.read_csv(file_path, chunksize=CSV_CHUNKSIZE, parse_dates=['Date']):
+        chunks.append(filter_frame(chunk, **filter_kwargs))
+    return apply_schema(pd.concat(chunks, ignore_index=True))
+
+@tracing.traced
+def load_data(data_dir = DATA_DIR, input_file = INPUTFILE, use_cache = True, start_date = None, end_date = None,
+              commodities = None, exclude_commodities = None, contract_range = None):
     """
     Load commodity data from a specified file within a specified directory.
-    
+
     Parameters:
         data_dir (str): Directory where the data file is stored.
         input_file (str): Name of the file to load.
-        
+        use_cache (bool): Read from (and maintain) the typed Parquet sidecar instead of parsing the CSV.
+        start_date (str): Optional first date to keep, format: 'YYYY-MM-DD'.
+        end_date (str): Optional last date to keep (inclusive), format: 'YYYY-MM-DD'.
+        commodities (list): Optional list of commodities to keep.
+        exclude_commodities (list): Optional list of commodities to drop.
+        contract_range (tuple): Optional inclusive (first, last) range of contract numbers to keep.
+
+    Filters are applied while reading: as row-group predicates on the Parquet sidecar, or chunk by
+    chunk when the CSV is parsed directly.
+
     Returns:
         pandas.DataFrame: Data frame containing the loaded commodity data.
     """
-    
+
     file_path = Path(data_dir) / "manual" / input_file
+    filter_kwargs = dict(start_date=start_date, end_date=end_date, commodities=commodities,
+                         exclude_commodities=exclude_commodities, contract_range=contract_range)
+    filters = build_filters(**filter_kwargs)
     try:
-        df = pd.read_csv(file_path)
+        if not use_cache:
+            df = _read_csv_filtered(file_path, **filter_kwargs) if filters else pd.read_csv(file_path)
+        else:
+            parquet_path, meta_path = get_cache_paths(data_dir, input_file)
+            if _cache_is_valid(file_path, parquet_path, meta_path):
+                df = pd.read_parquet(parquet_path, filters=filters or None)
+            else:
+                df = build_cache(file_path, parquet_path, meta_path)
+                if filters:
+                    df = filter_frame(df, **filter_kwargs).reset_index(drop=True)
         logging.info("Commodities Data loaded successfully!")
         return df
     except Exception as e:
         logging.error(f"An error occurred while loading the data: {e}")
         raise e
 
+def get_ingest_state_path(data_dir = DATA_DIR, input_file = INPUTFILE):
+    """
+    Returns the path of the JSON file holding the ingestion high-water marks of an input file.
+    """
+
+    return Path(data_dir) / CACHE_DIRNAME / f"{Path(input_file).stem}.ingest.json"
+
+def _tail_digest(file_path, offset):
+    """
+    Digest of the bytes just before `offset`, used to check that a file only grew by appending.
+    """
+
+    start = max(0, offset - TAIL_DIGEST_BYTES)
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        return hashlib.sha256(f.read(offset - start)).hexdigest()
+
+def compute_watermarks(df):
+    """
+    Computes the high-water mark (last date seen) of every commodity and contract.
+
+    Returns:
+        Series: Last Date indexed by (Commodity, Contract).
+    """
+
+    keys = [df['Commodity'].astype(str).rename('Commodity'), df['Contract'].astype(int).rename('Contract')]
+    return df['Date'].groupby(keys).max()
+
+def _load_ingest_state(state_path):
+    state = _read_json(state_path)
+    if state is None:
+        return None
+    watermarks = pd.DataFrame(state['watermarks'], columns=['Commodity', 'Contract', 'Date'])
+    watermarks['Date'] = pd.to_datetime(watermarks['Date'])
+    state['watermarks'] = watermarks.set_index(['Commodity', 'Contract'])['Date']
+    return state
+
+def _save_ingest_state(state_path, file_path, offset, watermarks, last_dates = None):
+    state = {'offset': offset,
+             'tail_digest': _tail_digest(file_path, offset),
+             'watermarks': [[commodity, int(contract), date.strftime('%Y-%m-%d')]
+                            for (commodity, contract), date in watermarks.items()],
+             'last_dates': last_dates or {}}
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(state_path, 'w') as f:
+        json.dump(state, f)
+
+def is_append_only(data_dir = DATA_DIR, input_file = INPUTFILE):
+    """
+    Returns True if the input file has an ingestion state and only grew by appending since the last ingestion,
+    i.e. `ingest_new_data` will parse just the appended bytes.
+    """
+
+    file_path = Path(data_dir) / "manual" / input_file
+    state = _read_json(get_ingest_state_path(data_dir, input_file))
+    if state is None:
+        return False
+    return _file_fingerprint(file_path)['size'] >= state['offset'] and _tail_digest(file_path, state['offset']) == state['tail_digest']
+
+def get_last_dates(data_dir = DATA_DIR, input_file = INPUTFILE):
+    """
+    Returns the last date of every file derived from an input file (e.g. the clean period files),
+    as recorded with its ingestion state by `record_last_dates`.
+
+    Returns:
+        dict: File name -> last Date (Timestamp).
+    """
+
+    state = _read_json(get_ingest_state_path(data_dir, input_file)) or {}
+    return {file_name: pd.Timestamp(date) for file_name, date in state.get('last_dates', {}).items()}
+
+def record_last_dates(last_dates, data_dir = DATA_DIR, input_file = INPUTFILE):
+    """
+    Records the last date of files derived from an input file with its ingestion state, so that they can be
+    extended later without being read. Does nothing if the input file has no ingestion state.
+
+    Parameters:
+        last_dates (dict): File name -> last Date.
+    """
+
+    state_path = get_ingest_state_path(data_dir, input_file)
+    state = _read_json(state_path)
+    if state is None:
+        return
+    state.setdefault('last_dates', {}).update({file_name: pd.Timestamp(date).strftime('%Y-%m-%d')
+                                               for file_name, date in last_dates.items()})
+    with open(state_path, 'w') as f:
+        json.dump(state, f)
+
+def rows_after_watermarks(df, watermarks):
+    """
+    Keeps the rows dated after the high-water mark of their commodity and contract
+    (all rows of a commodity and contract without a mark).
+    """
+
+    keys = pd.MultiIndex.from_arrays([df['Commodity'].astype(str), df['Contract'].astype(int)])
+    last_seen = watermarks.reindex(keys).to_numpy()
+    mask = pd.isna(last_seen) | (df['Date'].to_numpy() > last_seen)
+    return df[mask].reset_index(drop=True)
+
+def reset_ingest_state(data_dir = DATA_DIR, input_file = INPUTFILE):
+    """
+    Discards the high-water marks of an input file and records those of its current content,
+    e.g. after a full rebuild of the clean data.
+    """
+
+    get_ingest_state_path(data_dir, input_file).unlink(missing_ok=True)
+    ingest_new_data(data_dir, input_file)
+
+@tracing.traced
+def ingest_new_data(data_dir = DATA_DIR, input_file = INPUTFILE):
+    """
+    Incremental ingestion of rows appended to the input file since the last call.
+
+    The byte offset of the last ingestion is stored with a per-(Commodity, Contract) high-water mark.
+    If the file only grew, just the appended bytes are parsed; otherwise the whole file is scanned.
+    Either way, only rows dated after the high-water mark of their commodity and contract are returned.
+    The columnar sidecar is extended with the appended rows instead of being rebuilt. The first call
+    records the high-water marks of the current file and returns no rows.
+
+    Parameters:
+        data_dir (str): Directory where the data file is stored.
+        input_file (str): Name of the file to ingest.
+
+    Returns:
+        pandas.DataFrame: The new rows, in the schema of `load_data`.
+    """
+
+    file_path = Path(data_dir) / "manual" / input_file
+    state_path = get_ingest_state_path(data_dir, input_file)
+    size = _file_fingerprint(file_path)['size']
+    state = _load_ingest_state(state_path)
+
+    if state is None:
+        df = load_data(data_dir, input_file)
+        _save_ingest_state(state_path, file_path, size, compute_watermarks(df))
+        logging.info(f"High-water marks for {input_file} initialised at {df['Date'].max():%Y-%m-%d}")
+        return df.iloc[:0]
+
+    if is_append_only(data_dir, input_file):
+        appended_df = apply_schema(_read_appended_rows(file_path, state['offset']))
+        parquet_path, meta_path = get_cache_paths(data_dir, input_file)
+        _extend_cache(file_path, parquet_path, meta_path, state['offset'], appended_df)
+    else:
+        logging.warning(f"{input_file} was rewritten since the last ingestion, scanning it against the high-water marks")
+        appended_df = load_data(data_dir, input_file)
+
+    new_rows = rows_after_watermarks(appended_df, state['watermarks'])
+    watermarks = pd.concat([state['watermarks'], compute_watermarks(new_rows)]).groupby(level=[0, 1]).max()
+    _save_ingest_state(state_path, file_path, size, watermarks, state.get('last_dates'))
+    logging.info(f"{len(new_rows)} new rows ingested from {input_file}")
+    return new_rows
+
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO, format='%(message)s')
     try:
         df = load_data(DATA_DIR, INPUTFILE)
     except Exception as e:
-        logging.error(f"Failed to load data: {e}")
\ No newline at end of file
+        logging.error(f"Failed to load data: {e}")
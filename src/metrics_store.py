@@ -0,0 +1,187 @@
+"""
+This module keeps a persistent store of the numeric Table 1 metrics, shared by every exporter.
+
+Entries are keyed by the content fingerprint of the clean input file, the period and the metric parameters
+(e.g. `annualizing_period`, `first_to_exp_ind`), and hold the raw metrics frame of
+`replicate_results.compute_metrics_frame` (not a formatted table). The store is a single SQLite file in
+data/cache with one row per entry, the frame serialized as Parquet, so concurrent processes can read and
+write it safely. Entries unused for longer than METRICS_STORE_MAX_AGE_DAYS, or beyond a total size of
+METRICS_STORE_MAX_BYTES, are evicted (config.py).
+
+Usage:
+    python src/metrics_store.py list
+    python src/metrics_store.py invalidate [--period START END]
+    python src/metrics_store.py evict [--max-age-days N] [--max-bytes N]
+"""
+
+import config
+from pathlib import Path
+from contextlib import closing
+import argparse
+import hashlib
+import io
+import json
+import sqlite3
+import sys
+import time
+import pandas as pd
+import logging
+
+import load_commodities_data
+
+DATA_DIR = config.DATA_DIR
+METRICS_STORE_MAX_AGE_DAYS = config.METRICS_STORE_MAX_AGE_DAYS
+METRICS_STORE_MAX_BYTES = config.METRICS_STORE_MAX_BYTES
+
+STORE_FILE = "metrics_store.sqlite"
+#Bump when the metrics computation changes, so that entries of earlier versions are no longer used
+STORE_VERSION = 1
+#Seconds a process waits for another one holding the write lock
+LOCK_TIMEOUT = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metrics (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    params TEXT NOT NULL,
+    frame BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+)
+"""
+
+def get_store_path(data_dir = DATA_DIR):
+    """
+    Returns the path of the metrics store of a data directory.
+    """
+
+    return Path(data_dir) / load_commodities_data.CACHE_DIRNAME / STORE_FILE
+
+def make_key(fingerprint, start_date, end_date, params):
+    """
+    Returns the key of an entry: a digest of the input fingerprint, the period, the metric parameters and STORE_VERSION.
+    """
+
+    payload = json.dumps([STORE_VERSION, fingerprint, str(start_date), str(end_date), params], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class MetricsStore:
+    """
+    Persistent store of numeric metrics frames, see the module docstring.
+
+    Parameters:
+        store_path (Path): SQLite file of the store, default: data/cache/metrics_store.sqlite
+    """
+
+    def __init__(self, store_path = None):
+        self.store_path = Path(store_path) if store_path is not None else get_store_path()
+
+    def _connect(self):
+        self.store_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.store_path, timeout=LOCK_TIMEOUT)
+        conn.execute(SCHEMA)
+        return conn
+
+    def get(self, fingerprint, start_date, end_date, params):
+        """
+        Returns the stored metrics frame of an entry, or None on a miss.
+        """
+
+        key = make_key(fingerprint, start_date, end_date, params)
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT frame FROM metrics WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE metrics SET last_used = ? WHERE key = ?", (time.time(), key))
+        return pd.read_parquet(io.BytesIO(row[0]))
+
+    def put(self, fingerprint, start_date, end_date, params, metrics_df):
+        """
+        Stores the metrics frame of an entry, replacing any previous one, then evicts old entries.
+        """
+
+        key = make_key(fingerprint, start_date, end_date, params)
+        frame = metrics_df.to_parquet()
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO metrics VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         (key, fingerprint, str(start_date), str(end_date), json.dumps(params, sort_keys=True),
+                          frame, len(frame), now, now))
+        self.evict()
+
+    def entries(self):
+        """
+        Returns one row per entry with its period, parameters, size and timestamps, most recently used first.
+        """
+
+        with closing(self._connect()) as conn:
+            entries_df = pd.read_sql_query("SELECT key, fingerprint, start_date, end_date, params, size, created, last_used "
+                                           "FROM metrics ORDER BY last_used DESC", conn)
+        for column in ['created', 'last_used']:
+            entries_df[column] = pd.to_datetime(entries_df[column], unit='s')
+        return entries_df
+
+    def invalidate(self, start_date = None, end_date = None, fingerprint = None):
+        """
+        Deletes the entries of a period and/or an input fingerprint, or all entries when none is given.
+
+        Returns:
+            int: Number of deleted entries.
+        """
+
+        conditions = {'start_date': start_date, 'end_date': end_date, 'fingerprint': fingerprint}
+        conditions = {column: str(value) for column, value in conditions.items() if value is not None}
+        where = " AND ".join(f"{column} = ?" for column in conditions) or "1"
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(f"DELETE FROM metrics WHERE {where}", tuple(conditions.values())).rowcount
+
+    def evict(self, max_age_days = METRICS_STORE_MAX_AGE_DAYS, max_bytes = METRICS_STORE_MAX_BYTES):
+        """
+        Deletes the entries unused for more than max_age_days, then the least recently used entries
+        until the total size is at most max_bytes.
+
+        Returns:
+            int: Number of deleted entries.
+        """
+
+        with closing(self._connect()) as conn, conn:
+            deleted = 0
+            if max_age_days is not None:
+                deleted += conn.execute("DELETE FROM metrics WHERE last_used < ?",
+                                        (time.time() - max_age_days * 86400,)).rowcount
+            if max_bytes is not None:
+                total = 0
+                for key, size in conn.execute("SELECT key, size FROM metrics ORDER BY last_used DESC").fetchall():
+                    total += size
+                    if total > max_bytes:
+                        deleted += conn.execute("DELETE FROM metrics WHERE key = ?", (key,)).rowcount
+        return deleted
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Inspect and maintain the metrics result store.")
+    parser.add_argument('--store', type=Path, default=None, help="SQLite file of the store")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="list the stored entries")
+    invalidate_parser = commands.add_parser('invalidate', help="delete the entries of a period, or all entries")
+    invalidate_parser.add_argument('--period', nargs=2, metavar=('START', 'END'), help="period, format: 'YYYY-MM-DD'")
+    evict_parser = commands.add_parser('evict', help="delete old entries and the least recently used beyond a size")
+    evict_parser.add_argument('--max-age-days', type=float, default=METRICS_STORE_MAX_AGE_DAYS)
+    evict_parser.add_argument('--max-bytes', type=int, default=METRICS_STORE_MAX_BYTES)
+    args = parser.parse_args(argv)
+
+    store = MetricsStore(args.store)
+    if args.command == 'list':
+        logging.info(store.entries().to_string(index=False))
+    elif args.command == 'invalidate':
+        start_date, end_date = args.period or (None, None)
+        logging.info(f"{store.invalidate(start_date, end_date)} entries invalidated")
+    else:
+        logging.info(f"{store.evict(args.max_age_days, args.max_bytes)} entries evicted")
+    return 0
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    sys.exit(main())
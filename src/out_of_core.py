@@ -0,0 +1,290 @@
+"""
+This module computes the Table 1 metrics of a futures universe that does not fit in memory.
+
+The raw file is streamed in partitions, either in row batches across all commodities ('date') or one
+commodity at a time ('commodity'). Each partition is cleaned as in `data_preprocessing.clean_process_data`
+and reduced to what the metrics need: the month-end observation of every commodity, contract and month,
+the number of observations per commodity and month, and whether a commodity has two contracts on some date.
+These reductions are merged across partitions, and the metrics of `replicate_results` are run on the
+month-end data, which gives the same Table 1 as the in-memory pipeline.
+
+The number of raw rows held at once follows from a memory budget (config.py -> OUT_OF_CORE_MEMORY), so peak
+memory does not grow with the size of the raw file. Partitions are read from the Parquet sidecar of the raw
+file when it is valid, and from the CSV in chunks otherwise; the sidecar is never built here.
+"""
+
+import warnings
+warnings.filterwarnings("ignore")
+
+import config
+from pathlib import Path
+import tempfile
+import pandas as pd
+import numpy as np
+import logging
+
+import load_commodities_data
+import data_preprocessing
+import replicate_results
+import table_export
+
+DATA_DIR = config.DATA_DIR
+INPUTFILE = config.INPUTFILE
+OUTPUT_DIR = config.OUTPUT_DIR
+PERIODS = config.PERIODS
+OUT_OF_CORE_MEMORY = config.OUT_OF_CORE_MEMORY
+COMMODITIES_TO_DROP = data_preprocessing.COMMODITIES_TO_DROP
+
+PARTITION_MODES = ['date', 'commodity']
+#Rough peak bytes per raw row while a batch is parsed, cleaned and reduced
+BYTES_PER_RAW_ROW = 400
+RAW_COLUMNS = ['Commodity', 'Contract', 'Date', 'PX_LAST']
+
+def get_batch_rows(max_memory = OUT_OF_CORE_MEMORY):
+    """
+    Returns the number of raw rows per batch that fits in the memory budget.
+    """
+
+    return max(1, int(max_memory // BYTES_PER_RAW_ROW))
+
+def iter_raw_batches(data_dir = DATA_DIR, input_file = INPUTFILE, batch_rows = None, commodities = None):
+    """
+    Streams the raw file in batches of at most batch_rows rows.
+
+    Parameters:
+        data_dir (str): Directory where the data file is stored.
+        input_file (str): Name of the raw file.
+        batch_rows (int): Maximum number of rows per batch, default: from OUT_OF_CORE_MEMORY.
+        commodities (list): Optional commodities to read, pushed down to the Parquet sidecar. The CSV is parsed
+            in full and filtered chunk by chunk, see `spill_commodity_partitions` to read many commodities.
+
+    Yields:
+        DataFrame: Raw rows in the schema of `load_commodities_data.load_data`.
+    """
+
+    batch_rows = batch_rows or get_batch_rows()
+    if load_commodities_data.has_valid_cache(data_dir, input_file):
+        import pyarrow.dataset as ds
+        parquet_path, _ = load_commodities_data.get_cache_paths(data_dir, input_file)
+        dataset = ds.dataset(parquet_path, format='parquet')
+        row_filter = ds.field('Commodity').isin(list(commodities)) if commodities is not None else None
+        for batch in dataset.to_batches(filter=row_filter, batch_size=batch_rows):
+            if batch.num_rows:
+                yield batch.to_pandas()
+    else:
+        file_path = Path(data_dir) / "manual" / input_file
+        for chunk in pd.read_csv(file_path, chunksize=batch_rows, parse_dates=['Date']):
+            chunk = load_commodities_data.filter_frame(chunk, commodities=commodities)
+            if not chunk.empty:
+                yield load_commodities_data.apply_schema(chunk)
+
+def spill_commodity_partitions(spill_dir, data_dir = DATA_DIR, input_file = INPUTFILE, batch_rows = None,
+                               start_date = None, end_date = None, exclude_commodities = None):
+    """
+    Splits the raw CSV into one CSV per commodity in a single chunked pass, keeping only the rows of the
+    period. Without a valid sidecar, a run partitioned by commodity then parses the raw file once instead
+    of once per commodity.
+
+    Parameters:
+        spill_dir (str): Directory whose `manual` subdirectory receives the partition files.
+        data_dir, input_file, batch_rows: as in `iter_raw_batches`.
+        start_date, end_date, exclude_commodities: Row filters, as in `load_commodities_data.filter_frame`.
+
+    Returns:
+        dict: Commodity -> name of its partition file in spill_dir/manual, sorted by commodity.
+    """
+
+    batch_rows = batch_rows or get_batch_rows()
+    partition_dir = Path(spill_dir) / "manual"
+    partition_dir.mkdir(parents=True, exist_ok=True)
+    file_path = Path(data_dir) / "manual" / input_file
+    partition_files = {}
+    for chunk in pd.read_csv(file_path, chunksize=batch_rows, parse_dates=['Date']):
+        chunk = load_commodities_data.filter_frame(chunk, start_date, end_date, exclude_commodities=exclude_commodities)
+        for commodity, commodity_df in chunk.groupby('Commodity', sort=False):
+            file_name = partition_files.setdefault(str(commodity), f"partition_{len(partition_files)}.csv")
+            partition_path = partition_dir / file_name
+            commodity_df.to_csv(partition_path, mode='a', header=not partition_path.exists(), index=False)
+    return dict(sorted(partition_files.items()))
+
+def list_commodities(data_dir = DATA_DIR, input_file = INPUTFILE, batch_rows = None):
+    """
+    Returns the sorted commodities of the raw file, reading only its Commodity column in batches.
+    """
+
+    batch_rows = batch_rows or get_batch_rows()
+    if load_commodities_data.has_valid_cache(data_dir, input_file):
+        import pyarrow.parquet as pq
+        parquet_path, _ = load_commodities_data.get_cache_paths(data_dir, input_file)
+        batches = (batch.to_pandas()['Commodity'] for batch in
+                   pq.ParquetFile(parquet_path).iter_batches(batch_size=batch_rows, columns=['Commodity']))
+    else:
+        file_path = Path(data_dir) / "manual" / input_file
+        batches = (chunk['Commodity'] for chunk in pd.read_csv(file_path, chunksize=batch_rows, usecols=['Commodity']))
+    commodities = set()
+    for batch in batches:
+        commodities.update(batch.astype(str).unique())
+    return sorted(commodities)
+
+def reduce_partition(clean_df):
+    """
+    Reduces a clean partition to the inputs of the Table 1 metrics.
+
+    Parameters:
+        clean_df (DataFrame): Clean rows (Date as index or column), as produced by `data_preprocessing`.
+
+    Returns:
+        tuple: (month-end observations, see `replicate_results.get_month_end_observations`;
+        Series of observation counts indexed by (Commodity, YearMonth);
+        DataFrame of the lowest and highest contract per (Commodity, Date))
+    """
+
+    df = replicate_results.select_columns(clean_df, ['Date', 'Commodity', 'Contract', 'YearMonth', 'ClosePrice'])
+    df['Commodity'] = df['Commodity'].astype(str)
+    month_end_df = replicate_results.get_month_end_observations(df)
+    obs_counts = df.groupby(['Commodity', 'YearMonth']).size()
+    contract_range = df.groupby(['Commodity', 'Date'])['Contract'].agg(['min', 'max'])
+    return month_end_df, obs_counts, contract_range
+
+class PartitionReducer:
+    """
+    Merges the reductions of any number of partitions, see `reduce_partition`.
+
+    The month-end observations and observation counts of new partitions are kept aside and merged into the
+    running state only once they outnumber it, so every row takes part in a logarithmic number of merges
+    and the total work grows linearly with the number of partitions. Only commodities not yet known to
+    have two contracts on the same date keep their per-date contract range, so the merged state is bounded
+    by the month-end data rather than by the raw rows.
+    """
+
+    def __init__(self):
+        self.month_end_df = None
+        self.obs_counts = None
+        self.contract_range = None
+        self.expiry_commodities = set()
+        self._pending_month_ends = []
+        self._pending_counts = []
+        self._pending_rows = 0
+
+    def add(self, clean_df):
+        month_end_df, obs_counts, contract_range = reduce_partition(clean_df)
+
+        self._pending_month_ends.append(month_end_df)
+        self._pending_counts.append(obs_counts)
+        self._pending_rows += len(month_end_df)
+        if self.month_end_df is None or self._pending_rows > len(self.month_end_df):
+            self._merge()
+
+        contract_range = contract_range[~contract_range.index.get_level_values('Commodity').isin(self.expiry_commodities)]
+        if self.contract_range is not None:
+            contract_range = pd.concat([self.contract_range, contract_range]).groupby(level=[0, 1]).agg({'min': 'min', 'max': 'max'})
+        multi_cntrct = contract_range['max'] > contract_range['min']
+        self.expiry_commodities.update(contract_range.index.get_level_values('Commodity')[multi_cntrct])
+        self.contract_range = contract_range[~contract_range.index.get_level_values('Commodity').isin(self.expiry_commodities)]
+
+    def _merge(self):
+        """
+        Merges the pending partitions into the running month-end observations and observation counts.
+        """
+
+        if not self._pending_month_ends:
+            return
+        month_end_dfs = ([] if self.month_end_df is None else [self.month_end_df]) + self._pending_month_ends
+        counts = ([] if self.obs_counts is None else [self.obs_counts]) + self._pending_counts
+        #Earlier partitions come first, so ties on the latest Date resolve as on the concatenated clean data
+        self.month_end_df = replicate_results.get_month_end_observations(pd.concat(month_end_dfs, ignore_index=True))
+        self.obs_counts = pd.concat(counts).groupby(level=['Commodity', 'YearMonth']).sum()
+        self._pending_month_ends, self._pending_counts, self._pending_rows = [], [], 0
+
+    def num_observations(self):
+        """
+        Average number of observations per month of each commodity, as `replicate_results.compute_num_observations`.
+        """
+
+        self._merge()
+        counts = self.obs_counts.groupby(level='Commodity')
+        num_obs = counts.sum() / counts.size()
+        num_obs.name = 'N'
+        return num_obs
+
+    def month_end_frame(self):
+        """
+        Month-end observations of all partitions, with Commodity as a categorical as in the clean data.
+        """
+
+        self._merge()
+        month_end_df = self.month_end_df.copy()
+        month_end_df['Commodity'] = month_end_df['Commodity'].astype('category')
+        month_end_df['YearMonth'] = month_end_df['YearMonth'].astype('int32')
+        return month_end_df
+
+def compute_metrics_out_of_core(start_date, end_date, data_dir = DATA_DIR, input_file = INPUTFILE, partition_by = 'date',
+                                max_memory = OUT_OF_CORE_MEMORY, exclude_commodities = COMMODITIES_TO_DROP):
+    """
+    Computes the numeric Table 1 metrics of a period by streaming the raw file.
+
+    Parameters:
+        start_date (str): First date of the period, format: 'YYYY-MM-DD'.
+        end_date (str): Last date of the period, format: 'YYYY-MM-DD'.
+        data_dir (str): Directory where the data file is stored.
+        input_file (str): Name of the raw file.
+        partition_by (str): 'date' streams row batches across all commodities in one pass over the file;
+            'commodity' streams one commodity at a time (without a valid sidecar, the CSV is first split by
+            commodity under data_dir/cache in one pass, see `spill_commodity_partitions`).
+        max_memory (int): Memory budget in bytes for the raw rows held at once, default: config.py -> OUT_OF_CORE_MEMORY
+        exclude_commodities (list): Commodities to drop, as in `data_preprocessing.clean_process_data`.
+
+    Returns:
+        DataFrame: Same as `replicate_results.compute_metrics_frame` on the clean data of the period.
+    """
+
+    if partition_by not in PARTITION_MODES:
+        raise ValueError(f"Unknown partition mode {partition_by!r}, expected one of {PARTITION_MODES}")
+
+    batch_rows = get_batch_rows(max_memory)
+
+    reducer = PartitionReducer()
+    num_batches = 0
+    spill_root = Path(data_dir) / load_commodities_data.CACHE_DIRNAME
+    spill_root.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=spill_root) as spill_dir:
+        if partition_by == 'date':
+            partitions = [(data_dir, input_file, None)]
+        elif load_commodities_data.has_valid_cache(data_dir, input_file):
+            partitions = [(data_dir, input_file, [commodity]) for commodity in list_commodities(data_dir, input_file, batch_rows)
+                          if commodity not in exclude_commodities]
+        else:
+            partition_files = spill_commodity_partitions(spill_dir, data_dir, input_file, batch_rows, start_date, end_date,
+                                                         exclude_commodities)
+            partitions = [(spill_dir, file_name, None) for file_name in partition_files.values()]
+
+        for partition_dir, partition_file, commodities in partitions:
+            for raw_df in iter_raw_batches(partition_dir, partition_file, batch_rows, commodities):
+                raw_df = load_commodities_data.filter_frame(raw_df, start_date, end_date, exclude_commodities=exclude_commodities)
+                if raw_df.empty:
+                    continue
+                reducer.add(data_preprocessing._clean_frame(raw_df[[col for col in RAW_COLUMNS if col in raw_df.columns]].copy()))
+                num_batches += 1
+
+    month_end_df = reducer.month_end_frame()
+    logging.info(f"{num_batches} partitions of up to {batch_rows} rows reduced to {len(month_end_df)} month-end rows")
+    context = replicate_results.MetricsContext(month_end_df, expiry_commodities=sorted(reducer.expiry_commodities))
+    return replicate_results.compute_metrics_frame(month_end_df, context, num_observations=reducer.num_observations())
+
+def combine_metrics_out_of_core(start_date, end_date, data_dir = DATA_DIR, input_file = INPUTFILE, partition_by = 'date',
+                                max_memory = OUT_OF_CORE_MEMORY):
+    """
+    Out-of-core counterpart of `replicate_results.combine_metrics`, returning the formatted Table 1.
+    """
+
+    metrics_df = compute_metrics_out_of_core(start_date, end_date, data_dir, input_file, partition_by, max_memory)
+    return replicate_results.format_metrics_table(metrics_df)
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    for start_, end_ in PERIODS:
+        try:
+            metrics_df = compute_metrics_out_of_core(start_, end_, DATA_DIR, INPUTFILE)
+            table_export.export_table1(metrics_df, start_, end_, OUTPUT_DIR, formats=['xlsx'])
+        except Exception as e:
+            logging.error(f"An error occurred while computing Table 1 out of core for {start_} to {end_}: {e}")
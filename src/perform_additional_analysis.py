@@ -3,22 +3,37 @@ This module contains functions for visualizing commodity data in various forms i
 sector distribution, data availability, contract numbers, and time series analysis. It is
 designed to assist in the analysis and presentation of commodities data by generating
 informative plots.
+
+The rolling mean, volatility and Sharpe ratio of every commodity and contract are computed in one
+pass over a month-end return matrix (`compute_rolling_statistics`) and cached next to the clean file
+they come from (`load_rolling_statistics`), so that the plots and any later query read the same frame.
+
+Figures are drawn with the object-oriented Figure API on the Agg backend, without pyplot's global state.
+`render_figures` computes the inputs of the selected figures only (the rolling statistics once for both
+rolling figures), renders the figures of a period on a process pool and skips those whose inputs have not
+changed since their last render. A single period or
+figure can be rendered with `--period START END` and `--figure NAME`, as the doit tasks do.
 """
 
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-
-import seaborn as sns
-from scipy.stats import skew, kurtosis
-from matplotlib.colors import ListedColormap
 
 import warnings
 warnings.filterwarnings("ignore")
 import config
+import tracing
 from pathlib import Path
 
+import os
+import json
+import argparse
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
 import data_preprocessing as dp
+import load_commodities_data
+import price_cube
+import table_export
 
 DATA_DIR = config.DATA_DIR
 INPUTFILE = config.INPUTFILE
@@ -26,191 +41,464 @@ OUTPUT_DIR = config.OUTPUT_DIR
 STARTDATE = config.STARTDATE_OLD
 ENDDATE = config.ENDDATE_OLD
 LOADBACKPATH_CLEAN = config.LOADBACKPATH_CLEAN
+PERIODS = config.PERIODS
+
+ROLLING_WINDOWS = [36, 60, 120]
+ROLLING_LEVELS = ['Window', 'Date', 'Commodity', 'Contract']
 
 #clean_data_file_path_1970 = Path(DATA_DIR) / "manual"/"clean_1970_2008_commodities_data.csv"
 #df = pd.read_csv(clean_data_file_path_1970)
 
-def plot_commodities_by_sector(df, OUTPUT_DIR, start_date = STARTDATE):
-    '''
-    This function plots the number of commodities in each sector and stores the plot as a .png file in the output directory.
-    '''
-    commodity_sector_mapping = {
-        'Cocoa': 'Agriculture', 'Corn': 'Agriculture', 'Cotton': 'Agriculture', 'Live cattle': 'Livestock',
-        'Oats': 'Agriculture', 'Orange juice': 'Agriculture', 'Soybean meal': 'Agriculture', 'Soybeans': 'Agriculture',
-        'Wheat': 'Agriculture', 'Feeder cattle': 'Livestock', 'Coffee': 'Agriculture', 'Gold': 'Metals',
-        'Silver': 'Metals', 'Canola': 'Agriculture', 'Crude Oil': 'Energy', 'Heating Oil': 'Energy',
-        'Lean hogs': 'Livestock', 'Palladium': 'Metals', 'Platinum': 'Metals', 'Lumber': 'Agriculture',
-        'Unleaded gas': 'Energy', 'Copper': 'Metals', 'Rough rice': 'Agriculture', 'Natural gas': 'Energy',
-        'Aluminium': 'Metals', 'Gasoline': 'Energy',
-    }
-
-    # Map the commodities to sectors
-    df['Sector'] = df['Commodity'].map(commodity_sector_mapping)
-
-    # Create the plot
-    plt.figure(figsize=(10, 5))
-    df.groupby('Sector')['Commodity'].nunique().plot(kind='bar', title='Number of Commodities in Each Sector')
-    plt.ylabel('Number of Commodities')
-    plt.xlabel('Sector')
-
-    # Save the plot
-    file_path = Path(OUTPUT_DIR) / f"commodities_by_sector_{start_date}.png"
-    plt.savefig(file_path)
-    plt.close()
-    
-def plot_data_availability(df, OUTPUT_DIR, start_date = STARTDATE):
-    '''
-    This function creates a heatmap showing the availability of data for each commodity across different contracts
-    and saves the plot as a .png file in the output directory.
-    '''
-    # Create the pivot table
-    pivot_df = df.pivot_table(index='Commodity', columns='Contract', values='ClosePrice', aggfunc='count')
+COMMODITY_SECTOR_MAPPING = table_export.COMMODITY_SECTOR_MAPPING
 
-    # Convert the counts to a binary format (1 for available, 0 for not available)
-    availability_df = pivot_df.notnull().astype(int)
-    cmap = ListedColormap(['#FFCCCB', '#ADD8E6'])  # Light red for unavailable, light blue for available
+#Bump to re-render every figure after a change to how figures are drawn
+FIGURE_VERSION = 1
 
-    # Create the heatmap
-    plt.figure(figsize=(12, 8))
-    sns.heatmap(availability_df, cmap=cmap, cbar=False, linewidths=.5, annot=False)
+def _new_figure(**kwargs):
+    """
+    Creates a figure drawn by the Agg backend, outside of pyplot's global state.
+    """
 
-    # Move the x-axis labels to the top
-    ax = plt.gca()
-    ax.tick_params(top=True, bottom=False, labeltop=True, labelbottom=False)
+    #matplotlib is only imported once a figure is drawn, to keep the import of this module fast
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
 
-    plt.title('Data Availability Heatmap')
-    plt.xlabel('Contract Number')
-    plt.ylabel('Commodity')
+    fig = Figure(**kwargs)
+    FigureCanvasAgg(fig)
+    return fig
 
-    # Save the plot
-    file_path = Path(OUTPUT_DIR) / f"data_availability_heatmap_{start_date}.png"
-    plt.savefig(file_path)
-    plt.close()
-    
-def plot_max_contract_number(df, OUTPUT_DIR, start_date = STARTDATE):
-    '''
-    This function plots the maximum contract number available for each commodity and stores the plot as a .png file in the output directory.
-    '''
-    # Group by 'Commodity' and find the maximum 'Contract' number
-    max_contract_df = df.groupby('Commodity')['Contract'].max()
+def get_sector_counts(df):
+    """
+    Returns the number of commodities of each sector.
+    """
 
-    # Create the bar plot
-    plt.figure(figsize=(10, 5))
-    max_contract_df.plot(kind='bar', title='Maximum Contract # for each Commodity')
-    plt.ylabel('Maximum Contract #')
-    
-    # Save the plot
-    file_path = Path(OUTPUT_DIR) / f"maximum_contract_number_{start_date}.png"
-    plt.savefig(file_path)
-    plt.close()
-    
-def plot_max_contract_availability(df, OUTPUT_DIR, start_date = STARTDATE):
-    '''
-    This function creates a grid of plots showing the maximum contract availability at month-end for each commodity
-    and stores the figure as a .png file in the output directory.
-    '''
+    commodities = pd.Series(df['Commodity'].astype(str).unique(), name='Commodity')
+    sector_counts = commodities.groupby(commodities.map(COMMODITY_SECTOR_MAPPING).rename('Sector')).nunique()
+    return sector_counts
+
+def get_availability(df):
+    """
+    Returns a Commodity x Contract frame, 1 where the commodity has data for the contract and 0 otherwise.
+    """
+
+    counts = df.groupby(['Commodity', 'Contract'], observed=True).size().unstack('Contract')
+    return counts.notnull().astype(int)
+
+def get_max_contract(df):
+    """
+    Returns the highest contract number of each commodity.
+    """
 
-    if 'Date' in df.columns and not isinstance(df.index, pd.DatetimeIndex):
-        df['Date'] = pd.to_datetime(df['Date'])  # Convert 'Date' column to datetime
-        df.set_index('Date', inplace=True)  # Set 'Date' column as the index
+    return df.groupby('Commodity', observed=True)['Contract'].max()
 
-    # Group by 'Commodity', resample to month-end, and find the maximum contract number
-    sample_df_grouped = df.groupby('Commodity').resample('M').max()
-    sample_df_grouped = sample_df_grouped.drop(columns='Commodity').reset_index()
+def get_month_end_max_contract(df):
+    """
+    Returns the highest contract number of each commodity at every month end.
+
+    Returns:
+        DataFrame: Commodity, Date (month end) and Contract, NaN for months without data inside a commodity's sample.
+    """
+
+    dates = pd.DatetimeIndex(df['Date'] if 'Date' in df.columns else df.index, name='Date')
+    contracts_df = pd.DataFrame({'Commodity': df['Commodity'].astype(str).to_numpy(), 'Contract': df['Contract'].to_numpy()},
+                                index=dates)
+    return contracts_df.groupby('Commodity')['Contract'].resample('M').max().reset_index()
+
+def _draw_commodities_by_sector(sector_counts, file_path):
+    fig = _new_figure(figsize=(10, 5))
+    ax = fig.subplots()
+    sector_counts.plot(kind='bar', ax=ax, title='Number of Commodities in Each Sector')
+    ax.set_ylabel('Number of Commodities')
+    ax.set_xlabel('Sector')
+    fig.savefig(file_path)
 
-    commodities = df['Commodity'].unique()
-    num_commodities = df['Commodity'].nunique()
+def _draw_data_availability(availability_df, file_path):
+    import seaborn as sns
+    from matplotlib.colors import ListedColormap
+
+    fig = _new_figure(figsize=(12, 8))
+    ax = fig.subplots()
+    cmap = ListedColormap(['#FFCCCB', '#ADD8E6'])  # Light red for unavailable, light blue for available
+    sns.heatmap(availability_df, cmap=cmap, cbar=False, linewidths=.5, annot=False, ax=ax)
+
+    # Move the x-axis labels to the top
+    ax.tick_params(top=True, bottom=False, labeltop=True, labelbottom=False)
+    ax.set_title('Data Availability Heatmap')
+    ax.set_xlabel('Contract Number')
+    ax.set_ylabel('Commodity')
+    fig.savefig(file_path)
+
+def _draw_max_contract_number(max_contract, file_path):
+    fig = _new_figure(figsize=(10, 5))
+    ax = fig.subplots()
+    max_contract.plot(kind='bar', ax=ax, title='Maximum Contract # for each Commodity')
+    ax.set_ylabel('Maximum Contract #')
+    fig.savefig(file_path)
+
+def _draw_max_contract_availability(month_end_max_df, file_path):
+    commodities = month_end_max_df['Commodity'].unique()
 
     # Determine the number of rows and columns for the subplots
     cols = 3
-    rows = -(-num_commodities // cols)  # Ceiling division to ensure enough rows
+    rows = max(1, -(-len(commodities) // cols))  # Ceiling division to ensure enough rows
 
-    # Create a grid of subplots
-    fig, axs = plt.subplots(rows, cols, figsize=(15, 3 * rows), sharex=True, sharey=True)
+    fig = _new_figure(figsize=(15, 3 * rows))
+    axs = fig.subplots(rows, cols, sharex=True, sharey=True, squeeze=False).flatten()
     fig.suptitle('Maximum Contract Availability at Month-End for Each Commodity', fontsize=16, y=1.02)
-    axs = axs.flatten()
-
-    # Plot the data for each commodity
-    for idx, commodity in enumerate(commodities):
-        if idx >= len(axs):
-            break
-        ax = axs[idx]
-        data = sample_df_grouped[sample_df_grouped['Commodity'] == commodity]
+
+    for ax, (commodity, data) in zip(axs, month_end_max_df.groupby('Commodity', sort=False)):
         ax.plot(data['Date'], data['Contract'], linestyle='-')
         ax.set_title(commodity)
         ax.tick_params(axis='x', rotation=45)  # Rotating x-ticks for clarity
         ax.grid(True)
 
     # Hide any unused subplots
-    for ax in axs[idx + 1:]:
+    for ax in axs[len(commodities):]:
         ax.set_visible(False)
 
-    plt.tight_layout()
-
-    # Save the figure
-    file_path = Path(OUTPUT_DIR) / f"max_contract_availability_{start_date}.png"
+    fig.tight_layout()
     fig.savefig(file_path)
-    plt.close()
 
-def plot_rolling_volatility(df, OUTPUT_DIR, rolling_window=60, contract_num=2, start_date=STARTDATE):
+@tracing.traced
+def plot_commodities_by_sector(df, OUTPUT_DIR, start_date = STARTDATE, sector_counts = None):
     '''
-    This function creates a plot showing the 5-year rolling volatility (annualized) and stores the plot as a .png file in the output directory.
+    This function plots the number of commodities in each sector and stores the plot as a .png file in the output directory.
     '''
-    # Calculate the 5-year rolling volatility (annualized)
-    returns_df = df[df['Contract'] == contract_num].resample('M').last()
-    returns_df['Monthly returns'] = returns_df['ClosePrice'].pct_change()
-    returns_df = returns_df.dropna()
+    if sector_counts is None:
+        sector_counts = get_sector_counts(df)
+    _draw_commodities_by_sector(sector_counts, Path(OUTPUT_DIR) / f"commodities_by_sector_{start_date}.png")
     
-    returns_df['Rolling Volatility'] = returns_df['Monthly returns'].rolling(window=rolling_window).std() * np.sqrt(12)
-
-    # Create the plot
-    plt.figure(figsize=(12, 6))
-    returns_df['Rolling Volatility'].plot(title=f'{rolling_window} Months Rolling Volatility')
-    plt.xlabel('Date')
-    plt.ylabel('Rolling Volatility')
-
-    # Save the plot
-    file_path = Path(OUTPUT_DIR) / f"{rolling_window}_months_rolling_volatility_{start_date}.png"
-    plt.savefig(file_path)
-    plt.close()
+@tracing.traced
+def plot_data_availability(df, OUTPUT_DIR, start_date = STARTDATE, availability_df = None):
+    '''
+    This function creates a heatmap showing the availability of data for each commodity across different contracts
+    and saves the plot as a .png file in the output directory.
+    '''
+    if availability_df is None:
+        availability_df = get_availability(df)
+    _draw_data_availability(availability_df, Path(OUTPUT_DIR) / f"data_availability_heatmap_{start_date}.png")
     
-def plot_rolling_sharpe_ratio(df, OUTPUT_DIR, rolling_window=60, contract_num =2, start_date = STARTDATE):
+@tracing.traced
+def plot_max_contract_number(df, OUTPUT_DIR, start_date = STARTDATE, max_contract = None):
     '''
-    This function creates a plot showing the rolling Sharpe ratio and stores the plot as a .png file in the output directory.
+    This function plots the maximum contract number available for each commodity and stores the plot as a .png file in the output directory.
     '''
-    # Calculate the rolling mean returns (annualized) and the rolling Sharpe ratio
-    returns_df = df[df['Contract'] == contract_num].resample('M').last()
-    returns_df['Monthly returns'] = returns_df['ClosePrice'].pct_change()
-    returns_df = returns_df.dropna()
+    if max_contract is None:
+        max_contract = get_max_contract(df)
+    _draw_max_contract_number(max_contract, Path(OUTPUT_DIR) / f"maximum_contract_number_{start_date}.png")
     
-    returns_df['Rolling Volatility'] = returns_df['Monthly returns'].rolling(window=rolling_window).std() * np.sqrt(12)
-    returns_df['Rolling Mean Returns'] = returns_df['Monthly returns'].rolling(window=rolling_window).mean() * 12
-    returns_df['Rolling Sharpe Ratio'] = returns_df['Rolling Mean Returns'] / returns_df['Rolling Volatility']
-
-    # Create the plot
-    plt.figure(figsize=(12, 6))
-    returns_df['Rolling Sharpe Ratio'].plot(title=f'{rolling_window} Months Rolling Sharpe Ratio')
-    plt.xlabel('Date')
-    plt.ylabel('Rolling Sharpe Ratio')
+@tracing.traced
+def plot_max_contract_availability(df, OUTPUT_DIR, start_date = STARTDATE, month_end_max_df = None):
+    '''
+    This function creates a grid of plots showing the maximum contract availability at month-end for each commodity
+    and stores the figure as a .png file in the output directory.
+    '''
+    if month_end_max_df is None:
+        month_end_max_df = get_month_end_max_contract(df)
+    _draw_max_contract_availability(month_end_max_df, Path(OUTPUT_DIR) / f"max_contract_availability_{start_date}.png")
+
+@tracing.traced
+def compute_month_end_returns(df):
+    """
+    Computes the monthly returns of every commodity and contract from a month-end price matrix.
+
+    Parameters:
+        df (DataFrame): Clean data with Date (index or column), Commodity, Contract and ClosePrice.
+
+    Returns:
+        DataFrame: Returns indexed by month-end Date, with (Commodity, Contract) columns.
+    """
+
+    cube = price_cube.PriceCube.from_frame(df)
+    months, _ = cube.month_end_positions()
+    month_end = cube.month_end()
+    columns = pd.MultiIndex.from_product([cube.commodities, cube.contracts], names=['Commodity', 'Contract'])
+    prices_df = pd.DataFrame(month_end.values.reshape(len(months), -1), columns=columns,
+                             index=pd.DatetimeIndex(months.to_timestamp(how='end').normalize(), name='Date'))
+
+    #A month without a price inside a series carries the last price forward (a zero return), as
+    #resample('M').last().pct_change() does for a single series
+    prices_df = prices_df.ffill().where(prices_df.bfill().notna())
+    returns_df = prices_df.pct_change(fill_method=None)
+    return returns_df.dropna(axis=1, how='all')
+
+@tracing.traced
+def compute_rolling_statistics(df, windows = ROLLING_WINDOWS, annualizing_period = 12):
+    """
+    Computes the rolling mean return, volatility and Sharpe ratio (annualized) of every commodity and contract.
+
+    Each statistic is computed once per window on the whole month-end return matrix; a value is only
+    reported once the window is filled with returns of that series.
+
+    Parameters:
+        df (DataFrame): Clean data with Date (index or column), Commodity, Contract and ClosePrice.
+        windows (list): Rolling window lengths in months, default: 36, 60 and 120.
+        annualizing_period (int): Factor used to annualize the metrics, default is 12 (for monthly data).
+
+    Returns:
+        DataFrame: Long-format statistics indexed by (Window, Date, Commodity, Contract).
+    """
+
+    returns_df = compute_month_end_returns(df)
+    num_dates, num_series = returns_df.shape
+    index = pd.MultiIndex.from_arrays([np.repeat(returns_df.index.values, num_series),
+                                       np.tile(returns_df.columns.get_level_values('Commodity'), num_dates),
+                                       np.tile(returns_df.columns.get_level_values('Contract'), num_dates)],
+                                      names=ROLLING_LEVELS[1:])
+
+    window_stats = {}
+    for window in windows:
+        rolling = returns_df.rolling(window=window, min_periods=window)
+        rolling_volatility = rolling.std().to_numpy() * np.sqrt(annualizing_period)
+        rolling_mean = rolling.mean().to_numpy() * annualizing_period
+        stats_df = pd.DataFrame({'Rolling Mean Returns': rolling_mean.ravel(),
+                                 'Rolling Volatility': rolling_volatility.ravel(),
+                                 'Rolling Sharpe Ratio': (rolling_mean / rolling_volatility).ravel()}, index=index)
+        window_stats[window] = stats_df[stats_df['Rolling Mean Returns'].notna()]
+    return pd.concat(window_stats, names=['Window'])
+
+def get_rolling_stats_paths(data_dir = DATA_DIR, input_file = INPUTFILE):
+    """
+    Returns the paths of the cached rolling statistics of a clean file and of their metadata file.
+    """
+
+    cache_dir = Path(data_dir) / load_commodities_data.CACHE_DIRNAME
+    stem = Path(input_file).stem
+    return cache_dir / f"{stem}.rolling.parquet", cache_dir / f"{stem}.rolling.json"
+
+@tracing.traced
+def load_rolling_statistics(start_date = STARTDATE, end_date = ENDDATE, data_dir = DATA_DIR, input_file = INPUTFILE,
+                            windows = ROLLING_WINDOWS):
+    """
+    Returns the rolling statistics of a period, see `compute_rolling_statistics`.
+
+    They are read from data_dir/cache when they were computed from the current clean file of the period
+    (same size and modification time) for all requested windows; otherwise they are computed and stored.
+
+    Parameters:
+        start_date (str): First date of the period, format: 'YYYY-MM-DD'.
+        end_date (str): Last date of the period, format: 'YYYY-MM-DD'.
+        data_dir (str): Directory where the data files are stored.
+        input_file (str): Name of the raw input file, used to name the clean file.
+        windows (list): Rolling window lengths in months.
+
+    Returns:
+        DataFrame: Long-format statistics indexed by (Window, Date, Commodity, Contract).
+    """
+
+    clean_file = dp.get_clean_file_name(start_date, end_date, input_file)
+    stat = (Path(data_dir) / "manual" / clean_file).stat()
+    source = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    parquet_path, meta_path = get_rolling_stats_paths(data_dir, clean_file)
+
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        meta = None
+    if meta is not None and meta.get('source') == source and set(windows) <= set(meta.get('windows', [])) and parquet_path.exists():
+        stats_df = pd.read_parquet(parquet_path)
+        return stats_df[stats_df.index.get_level_values('Window').isin(windows)]
+
+    stats_df = compute_rolling_statistics(load_commodities_data.load_data(data_dir, clean_file), windows)
+    try:
+        parquet_path.parent.mkdir(parents=True, exist_ok=True)
+        #Written under a temporary name and moved in place, as figures of one period may be rendered concurrently
+        tmp_path = parquet_path.with_name(f"{parquet_path.name}.{os.getpid()}.tmp")
+        stats_df.to_parquet(tmp_path)
+        os.replace(tmp_path, parquet_path)
+        with open(meta_path, 'w') as f:
+            json.dump({'source': source, 'windows': [int(window) for window in windows]}, f)
+    except Exception as e:
+        logging.warning(f"Could not store the rolling statistics of {clean_file}: {e}")
+    return stats_df
+
+def _get_rolling_statistic(df, rolling_stats_df, statistic, rolling_window, contract_num):
+    """
+    Selects one rolling statistic of one contract as a Date x Commodity frame, computing it if it is not in rolling_stats_df.
+    """
+
+    if rolling_stats_df is None or rolling_window not in rolling_stats_df.index.get_level_values('Window'):
+        rolling_stats_df = compute_rolling_statistics(df, windows=[rolling_window])
+    stats_df = rolling_stats_df.xs((rolling_window, contract_num), level=['Window', 'Contract'])
+    return stats_df[statistic].unstack('Commodity')
+
+def _draw_rolling_statistic(statistic_df, title, ylabel, file_path):
+    fig = _new_figure(figsize=(12, 6))
+    ax = fig.subplots()
+    statistic_df.plot(ax=ax, title=title, linewidth=0.8)
+    ax.set_xlabel('Date')
+    ax.set_ylabel(ylabel)
+    ax.legend(loc='center left', bbox_to_anchor=(1, 0.5), fontsize='small', ncol=2)
+    fig.tight_layout()
+    fig.savefig(file_path)
 
-    # Save the plot
-    file_path = Path(OUTPUT_DIR) / f"{rolling_window}_months_rolling_sharpe_ratio_{start_date}.png"
-    plt.savefig(file_path)
-    plt.close()
+@tracing.traced
+def plot_rolling_volatility(df, OUTPUT_DIR, rolling_window=60, contract_num=2, start_date=STARTDATE, rolling_stats_df=None):
+    '''
+    This function creates a plot showing the 5-year rolling volatility (annualized) of each commodity and stores the plot as a .png file in the output directory.
+    Pass the output of `load_rolling_statistics` as rolling_stats_df to avoid recomputing it.
+    '''
+    rolling_volatility = _get_rolling_statistic(df, rolling_stats_df, 'Rolling Volatility', rolling_window, contract_num)
+    _draw_rolling_statistic(rolling_volatility, f'{rolling_window} Months Rolling Volatility', 'Rolling Volatility',
+                            Path(OUTPUT_DIR) / f"{rolling_window}_months_rolling_volatility_{start_date}.png")
+    
+@tracing.traced
+def plot_rolling_sharpe_ratio(df, OUTPUT_DIR, rolling_window=60, contract_num =2, start_date = STARTDATE, rolling_stats_df=None):
+    '''
+    This function creates a plot showing the rolling Sharpe ratio of each commodity and stores the plot as a .png file in the output directory.
+    Pass the output of `load_rolling_statistics` as rolling_stats_df to avoid recomputing it.
+    '''
+    rolling_sharpe_ratio = _get_rolling_statistic(df, rolling_stats_df, 'Rolling Sharpe Ratio', rolling_window, contract_num)
+    _draw_rolling_statistic(rolling_sharpe_ratio, f'{rolling_window} Months Rolling Sharpe Ratio', 'Rolling Sharpe Ratio',
+                            Path(OUTPUT_DIR) / f"{rolling_window}_months_rolling_sharpe_ratio_{start_date}.png")
+
+def fingerprint_inputs(*inputs):
+    """
+    Returns a hex digest of the inputs of a figure (DataFrames, Series and plain values such as titles).
+    """
+
+    digest = hashlib.sha256(repr(FIGURE_VERSION).encode())
+    for obj in inputs:
+        if isinstance(obj, (pd.DataFrame, pd.Series)):
+            digest.update(pd.util.hash_pandas_object(obj).to_numpy().tobytes())
+            digest.update(repr(list(obj.columns) if isinstance(obj, pd.DataFrame) else obj.name).encode())
+        else:
+            digest.update(repr(obj).encode())
+    return digest.hexdigest()
+
+def get_figure_names(rolling_window = 60):
+    """
+    Returns the names of the figures of a period, their file names without the _<start_date>.png suffix.
+    """
+
+    return ['commodities_by_sector', 'data_availability_heatmap', 'maximum_contract_number', 'max_contract_availability',
+            f"{rolling_window}_months_rolling_volatility", f"{rolling_window}_months_rolling_sharpe_ratio"]
+
+def get_figure_specs(df, output_dir = OUTPUT_DIR, start_date = STARTDATE, rolling_window = 60, contract_num = 2,
+                     rolling_stats_df = None, figures = None):
+    """
+    Lists the figures of a period with the inputs they are drawn from. Only the inputs of the selected
+    figures are computed, each of them once.
+
+    Parameters:
+        figures (list): Names of the figures to list (see `get_figure_names`), default: all.
+
+    Returns:
+        list: (draw function, tuple of inputs, output path) per figure.
+    """
+
+    names = get_figure_names(rolling_window)
+    if figures is not None:
+        unknown = set(figures) - set(names)
+        if unknown:
+            raise ValueError(f"Unknown figures {sorted(unknown)}, expected some of {names}")
+        names = [name for name in names if name in figures]
+
+    if rolling_stats_df is None and any('rolling' in name for name in names):
+        rolling_stats_df = compute_rolling_statistics(df, windows=[rolling_window])
+
+    def rolling_inputs(statistic):
+        return (_get_rolling_statistic(df, rolling_stats_df, statistic, rolling_window, contract_num),
+                f'{rolling_window} Months {statistic}', statistic)
+
+    builders = dict(zip(get_figure_names(rolling_window), [
+        lambda: (_draw_commodities_by_sector, (get_sector_counts(df),)),
+        lambda: (_draw_data_availability, (get_availability(df),)),
+        lambda: (_draw_max_contract_number, (get_max_contract(df),)),
+        lambda: (_draw_max_contract_availability, (get_month_end_max_contract(df),)),
+        lambda: (_draw_rolling_statistic, rolling_inputs('Rolling Volatility')),
+        lambda: (_draw_rolling_statistic, rolling_inputs('Rolling Sharpe Ratio')),
+    ]))
+    return [(*builders[name](), Path(output_dir) / f"{name}_{start_date}.png") for name in names]
+
+def _render_figure(draw_func, inputs, file_path):
+    try:
+        draw_func(*inputs, file_path)
+        return True
+    except Exception as e:
+        logging.error(f"An error occurred while rendering {Path(file_path).name}: {e}")
+        return False
+
+def _get_fingerprint_path(file_path):
+    #One small file per figure, so that figures rendered by concurrent processes do not overwrite each other's record
+    return Path(file_path).parent / ".fingerprints" / f"{Path(file_path).name}.sha256"
+
+def _read_fingerprint(file_path):
+    try:
+        return _get_fingerprint_path(file_path).read_text().strip()
+    except OSError:
+        return None
+
+@tracing.traced
+def render_figures(df, output_dir = OUTPUT_DIR, start_date = STARTDATE, rolling_window = 60, contract_num = 2,
+                   rolling_stats_df = None, max_workers = None, force = False, figures = None):
+    """
+    Renders the figures of a period headless, on a process pool.
+
+    A figure is skipped when its file exists and the fingerprint of its inputs matches the one recorded
+    at its last render (in output_dir/.fingerprints).
+
+    Parameters:
+        df (DataFrame): Clean data of the period.
+        output_dir (str): Directory where the figures are stored.
+        start_date (str): First date of the period, used to name the figures.
+        rolling_window (int): Window of the rolling volatility and Sharpe ratio figures, in months.
+        contract_num (int): Contract of the rolling volatility and Sharpe ratio figures.
+        rolling_stats_df (DataFrame): Output of `load_rolling_statistics`, computed from df if not given.
+        max_workers (int): Number of worker processes, default: one per figure to render (capped by the CPU count).
+        force (bool): Render every figure, even when its inputs did not change.
+        figures (list): Names of the figures to render (see `get_figure_names`), default: all.
+
+    Returns:
+        list: Paths of the figures that were rendered.
+    """
+
+    pending, fingerprints = [], []
+    for draw_func, inputs, file_path in get_figure_specs(df, output_dir, start_date, rolling_window, contract_num,
+                                                         rolling_stats_df, figures):
+        fingerprint = fingerprint_inputs(draw_func.__name__, *inputs)
+        if not force and file_path.is_file() and _read_fingerprint(file_path) == fingerprint:
+            continue
+        pending.append((draw_func, inputs, file_path))
+        fingerprints.append(fingerprint)
+    if not pending:
+        logging.info(f"Figures of {start_date} are up to date")
+        return []
+
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    if max_workers is None:
+        max_workers = min(len(pending), os.cpu_count() or 1)
+    if max_workers <= 1 or len(pending) <= 1:
+        rendered = [_render_figure(*spec) for spec in pending]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            rendered = list(executor.map(_render_figure, *zip(*pending)))
+
+    rendered_paths = []
+    for (_, _, file_path), fingerprint, success in zip(pending, fingerprints, rendered):
+        if success:
+            fingerprint_path = _get_fingerprint_path(file_path)
+            fingerprint_path.parent.mkdir(parents=True, exist_ok=True)
+            fingerprint_path.write_text(fingerprint)
+            rendered_paths.append(file_path)
+    logging.info(f"{len(rendered_paths)} figures of {start_date} Stored Successfully!")
+    return rendered_paths
 
 
 if __name__ == '__main__':
-    start_dates = [config.STARTDATE_OLD, config.STARTDATE_NEW]
-    end_dates = [config.ENDDATE_OLD, config.ENDDATE_NEW]
-
-    for start_date, end_date in zip(start_dates, end_dates):
-
-        clean_data_file_path = Path(DATA_DIR) / "manual" / f"clean_{start_date[:4]}_{end_date[:4]}_{INPUTFILE}"
-        df = pd.read_csv(clean_data_file_path)
-
-        plot_commodities_by_sector(df, OUTPUT_DIR, start_date)
-        plot_data_availability(df, OUTPUT_DIR, start_date)
-        plot_max_contract_number(df, OUTPUT_DIR, start_date)
-        plot_max_contract_availability(df, OUTPUT_DIR, start_date)
-        plot_rolling_volatility(df, OUTPUT_DIR, rolling_window=60, contract_num=2, start_date=start_date)
-        plot_rolling_sharpe_ratio(df, OUTPUT_DIR, rolling_window=60, contract_num=2, start_date=start_date)
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    parser = argparse.ArgumentParser(description="Render the figures of the additional analysis.")
+    parser.add_argument('--period', nargs=2, metavar=('START', 'END'), help="render a single period, format: 'YYYY-MM-DD'")
+    parser.add_argument('--figure', action='append', help="render only this figure (repeatable), see get_figure_names")
+    args = parser.parse_args()
+
+    for start_date, end_date in ([tuple(args.period)] if args.period else PERIODS):
+
+        df = load_commodities_data.load_data(DATA_DIR, dp.get_clean_file_name(start_date, end_date, INPUTFILE))
+        figures = args.figure or get_figure_names(60)
+        rolling_stats_df = None
+        if any('rolling' in name for name in figures):
+            rolling_stats_df = load_rolling_statistics(start_date, end_date, DATA_DIR, INPUTFILE)
+        render_figures(df, OUTPUT_DIR, start_date, rolling_window=60, contract_num=2, rolling_stats_df=rolling_stats_df,
+                       figures=figures)
@@ -0,0 +1,222 @@
+"""
+This module provides a dense Date x Commodity x Contract price cube built from the clean commodities data.
+Each cell holds the close price of one contract of one commodity on one trading day, with NaN for missing
+observations. The cube is persisted as a `.npy` file plus a JSON file with its axis labels, and is opened
+memory-mapped so that several processes can share one copy of the data through the OS page cache.
+"""
+
+import warnings
+warnings.filterwarnings("ignore")
+
+import json
+import logging
+import numpy as np
+import pandas as pd
+import config
+from pathlib import Path
+
+import load_commodities_data
+import data_preprocessing
+
+DATA_DIR = config.DATA_DIR
+INPUTFILE = config.INPUTFILE
+PERIODS = config.PERIODS
+
+CUBE_DIRNAME = "cube"
+NUM_CONTRACTS = 12
+
+class PriceCube:
+    """
+    Dense price array indexed by (trading day, commodity, contract).
+
+    Attributes:
+        values (ndarray): Float array of shape (len(dates), len(commodities), len(contracts)).
+        dates (DatetimeIndex): Sorted trading days (axis 0).
+        commodities (Index): Commodity names (axis 1).
+        contracts (Index): Contract numbers (axis 2).
+    """
+
+    def __init__(self, values, dates, commodities, contracts):
+        self.values = values
+        self.dates = pd.DatetimeIndex(dates)
+        self.commodities = pd.Index(commodities)
+        self.contracts = pd.Index(contracts)
+
+    def __repr__(self):
+        return (f"PriceCube({len(self.dates)} dates x {len(self.commodities)} commodities x "
+                f"{len(self.contracts)} contracts)")
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @classmethod
+    def from_frame(cls, clean_df, contracts = None):
+        """
+        Builds a price cube from a clean long-format DataFrame.
+
+        Parameters:
+            clean_df (DataFrame): Clean data with Date (index or column), Commodity, Contract and ClosePrice.
+            contracts (list): Contract numbers of the contract axis, default: 1 to max(12, highest contract).
+
+        Returns:
+            PriceCube: The dense cube, NaN where no price was observed.
+        """
+
+        df = clean_df.reset_index() if 'Date' not in clean_df.columns else clean_df
+        date_values = pd.to_datetime(df['Date']).values
+        dates = np.unique(date_values)
+        commodity_codes, commodities = pd.factorize(df['Commodity'], sort=True)
+        if contracts is None:
+            contracts = np.arange(1, max(NUM_CONTRACTS, int(df['Contract'].max())) + 1)
+        contracts = np.asarray(contracts)
+
+        date_codes = dates.searchsorted(date_values)
+        contract_codes = pd.Index(contracts).get_indexer(df['Contract'].to_numpy())
+        in_axis = contract_codes >= 0
+
+        values = np.full((len(dates), len(commodities), len(contracts)), np.nan)
+        values[date_codes[in_axis], commodity_codes[in_axis], contract_codes[in_axis]] = \
+            df['ClosePrice'].to_numpy(dtype=float)[in_axis]
+        return cls(values, dates, commodities.astype(str), contracts)
+
+    def save(self, path):
+        """
+        Stores the cube as <path>.npy and its axis labels as <path>.axes.json.
+        """
+
+        path = Path(path).with_suffix('')
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(path.with_suffix('.npy'), np.ascontiguousarray(self.values))
+        axes = {'dates': self.dates.strftime('%Y-%m-%d').tolist(),
+                'commodities': self.commodities.tolist(),
+                'contracts': [int(c) for c in self.contracts]}
+        with open(path.with_suffix('.axes.json'), 'w') as f:
+            json.dump(axes, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode = 'r'):
+        """
+        Opens a stored cube. With the default mmap_mode='r' the values are memory-mapped read-only
+        and only the pages that are accessed are read from disk.
+        """
+
+        path = Path(path).with_suffix('')
+        with open(path.with_suffix('.axes.json')) as f:
+            axes = json.load(f)
+        values = np.load(path.with_suffix('.npy'), mmap_mode=mmap_mode)
+        return cls(values, pd.to_datetime(axes['dates']), axes['commodities'], axes['contracts'])
+
+    def sel(self, start_date = None, end_date = None, commodities = None, contracts = None):
+        """
+        Selects a sub-cube. The date range is cut by binary search and is a view on the stored values.
+
+        Parameters:
+            start_date (str): First date to keep, format: 'YYYY-MM-DD'.
+            end_date (str): Last date to keep (inclusive), format: 'YYYY-MM-DD'.
+            commodities (str or list): Commodity name(s) to keep.
+            contracts (int or list): Contract number(s) to keep.
+
+        Returns:
+            PriceCube: The selected cube.
+        """
+
+        start, end = load_commodities_data.get_date_bounds(start_date, end_date)
+        first = 0 if start is None else self.dates.searchsorted(start, side='left')
+        last = len(self.dates) if end is None else self.dates.searchsorted(end, side='right')
+        values = self.values[first:last]
+        commodity_labels, contract_labels = self.commodities, self.contracts
+
+        if commodities is not None:
+            commodity_pos = self.commodities.get_indexer(np.atleast_1d(commodities))
+            if (commodity_pos < 0).any():
+                raise KeyError(f"Unknown commodities: {list(np.atleast_1d(commodities)[commodity_pos < 0])}")
+            values = values[:, commodity_pos, :]
+            commodity_labels = self.commodities[commodity_pos]
+        if contracts is not None:
+            contract_pos = self.contracts.get_indexer(np.atleast_1d(contracts))
+            if (contract_pos < 0).any():
+                raise KeyError(f"Unknown contracts: {list(np.atleast_1d(contracts)[contract_pos < 0])}")
+            values = values[:, :, contract_pos]
+            contract_labels = self.contracts[contract_pos]
+        return PriceCube(values, self.dates[first:last], commodity_labels, contract_labels)
+
+    def series(self, commodity, contract):
+        """
+        Returns the daily close prices of one contract of one commodity as a Series (NaN dropped).
+        """
+
+        cube = self.sel(commodities=commodity, contracts=contract)
+        return pd.Series(cube.values[:, 0, 0], index=self.dates, name=commodity).dropna()
+
+    def month_end_positions(self):
+        """
+        Computes, for every month and cell, the row of the last trading day with an observed price.
+
+        Returns:
+            tuple: (month labels as a PeriodIndex, int array of shape (months, commodities, contracts)
+            holding row positions into `dates`, -1 where the month has no observation)
+        """
+
+        months = self.dates.to_period('M')
+        month_starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+        rows = np.arange(len(self.dates)).reshape(-1, 1, 1)
+        valid_rows = np.where(np.isnan(self.values), -1, rows)
+        last_rows = np.maximum.reduceat(valid_rows, month_starts, axis=0) if len(month_starts) else valid_rows[:0]
+        return months[month_starts], last_rows
+
+    def month_end(self):
+        """
+        Month-end view of the cube: the last observed price of every cell in every month.
+
+        Returns:
+            PriceCube: A cube whose date axis holds the last trading day of each month.
+        """
+
+        months, last_rows = self.month_end_positions()
+        commodity_idx = np.arange(len(self.commodities)).reshape(1, -1, 1)
+        contract_idx = np.arange(len(self.contracts)).reshape(1, 1, -1)
+        values = np.where(last_rows >= 0, self.values[np.maximum(last_rows, 0), commodity_idx, contract_idx], np.nan)
+        month_last_dates = pd.Series(self.dates).groupby(self.dates.to_period('M')).max()
+        return PriceCube(values, month_last_dates.loc[months].values, self.commodities, self.contracts)
+
+    def to_frame(self):
+        """
+        Converts the cube back to the long format (Date, Commodity, Contract, ClosePrice) without missing cells.
+        """
+
+        date_pos, commodity_pos, contract_pos = np.nonzero(~np.isnan(self.values))
+        return pd.DataFrame({'Date': self.dates[date_pos],
+                             'Commodity': self.commodities[commodity_pos],
+                             'Contract': self.contracts[contract_pos],
+                             'ClosePrice': self.values[date_pos, commodity_pos, contract_pos]})
+
+def get_cube_path(start_date, end_date, data_dir = DATA_DIR, input_file = INPUTFILE):
+    """
+    Returns the path (without suffix) where the price cube of a period is stored.
+    """
+
+    clean_file = data_preprocessing.get_clean_file_name(start_date, end_date, input_file)
+    return Path(data_dir) / CUBE_DIRNAME / Path(clean_file).stem
+
+def build_price_cube(start_date, end_date, data_dir = DATA_DIR, input_file = INPUTFILE):
+    """
+    Builds the price cube of a period from its clean file and stores it under data_dir/cube.
+
+    Returns:
+        PriceCube: The stored cube, re-opened memory-mapped.
+    """
+
+    clean_df = load_commodities_data.load_data(data_dir, data_preprocessing.get_clean_file_name(start_date, end_date, input_file))
+    cube_path = get_cube_path(start_date, end_date, data_dir, input_file)
+    PriceCube.from_frame(clean_df).save(cube_path)
+    logging.info(f"Price cube {cube_path.name} Stored Successfully!")
+    return PriceCube.load(cube_path)
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    for start_, end_ in PERIODS:
+        try:
+            build_price_cube(start_, end_, DATA_DIR, INPUTFILE)
+        except Exception as e:
+            logging.error(f"An error occurred while building the price cube for {start_} to {end_}: {e}")
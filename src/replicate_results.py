@@ -9,17 +9,75 @@ import warnings
 warnings.filterwarnings("ignore")
 
 import config
+import tracing
 from pathlib import Path
+import argparse
+import time
 import pandas as pd
 import numpy as np
+import load_commodities_data
+import data_preprocessing as dp
+import continuous_futures
+import metrics_store
+import table_export
 import logging
-logging.basicConfig(level=logging.INFO, format='%(message)s')
+from contextlib import contextmanager
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
 
 DATA_DIR = config.DATA_DIR
 INPUTFILE = config.INPUTFILE
 OUTPUT_DIR = config.OUTPUT_DIR
+METRICS_WORKERS = config.METRICS_WORKERS
 
+MONTH_END_KEYS = ['Commodity', 'Contract', 'YearMonth']
 
+def select_columns(prep_df, columns):
+    """
+    Returns a narrow DataFrame with only the requested columns, taking Date from the index
+    when it is not a column. The caller's DataFrame is never modified.
+
+    Parameters:
+        prep_df (DataFrame): Preprocessed DataFrame containing commodity data (Date as index or column).
+        columns (list): Columns to select.
+
+    Returns:
+        DataFrame: A new DataFrame with a RangeIndex and the requested columns.
+    """
+
+    columns = list(columns)
+    if 'Date' in columns and 'Date' not in prep_df.columns:
+        other_columns = [col for col in columns if col != 'Date']
+        return prep_df[other_columns].reset_index()[columns]
+    return prep_df[columns].reset_index(drop=True)
+
+@tracing.traced
+def get_month_end_observations(prep_df, keys = MONTH_END_KEYS, columns = ['ClosePrice']):
+    """
+    Selects the last observation (latest Date) of every (commodity, contract, month).
+
+    The selection is fully vectorized: a stable descending sort on Date followed by drop_duplicates
+    on the keys, so its cost grows with the number of rows rather than with the number of groups.
+    Ties on the latest Date resolve to the first such row, as with groupby(...).apply(idxmax).
+
+    Parameters:
+        prep_df (DataFrame): Preprocessed DataFrame containing commodity data (Date as index or column).
+        keys (list): Columns identifying a group, default: Commodity, Contract and YearMonth.
+        columns (list): Value columns to return alongside Date and the keys.
+
+    Returns:
+        DataFrame: One row per group with Date, the keys and the value columns, sorted by the keys.
+    """
+
+    projection = ['Date'] + list(keys) + [col for col in columns if col not in keys]
+    month_end_df = (select_columns(prep_df, projection)
+                    .sort_values('Date', ascending=False, kind='stable')
+                    .drop_duplicates(subset=keys, keep='first')
+                    .sort_values(list(keys), kind='stable')
+                    .reset_index(drop=True))
+    return month_end_df
+
+@tracing.traced
 def compute_num_observations(prep_df):
     """
     Calculates the number of observations per commodity.
@@ -31,33 +89,55 @@ def compute_num_observations(prep_df):
         Series: A Series containing the average number of observations per month for each commodity.
     """
         
-    df = prep_df
-    df.reset_index(inplace=True)
-    total_cmdty_obs = df.groupby(['Commodity'])['Date'].count()
-    total_cmdty_mths = df.groupby(['Commodity'])['YearMonth'].nunique()
+    df = select_columns(prep_df, ['Commodity', 'Date', 'YearMonth'])
+    total_cmdty_obs = df.groupby(['Commodity'], observed=True)['Date'].count()
+    total_cmdty_mths = df.groupby(['Commodity'], observed=True)['YearMonth'].nunique()
     obs_df = pd.merge(total_cmdty_obs, total_cmdty_mths, how='left', left_on='Commodity', right_on='Commodity')
     obs_df.rename(columns={'Date':'Total_Observations', 'YearMonth':'NumMths'}, inplace=True)
     obs_df['N'] = obs_df['Total_Observations'] / obs_df['NumMths']
     return obs_df['N']
 
-def compute_commodity_excess_returns(prep_df):
+@tracing.traced
+def compute_commodity_excess_returns(prep_df, context = None, return_dates = None, roll_rule = None, period = None):
     """
     Computes monthly excess returns for the second contract of each commodity.
 
+    The month-end prices are pivoted to a Date x Commodity matrix before taking percentage changes, so
+    returns are aligned on the union of the month-end dates of all commodities in prep_df.
+
     Parameters:
         prep_df (DataFrame): Preprocessed DataFrame containing commodity data.
+        context (MetricsContext): Optional context whose memoized month-end prices are reused.
+        return_dates (DatetimeIndex): Optional month-end dates to align on instead, e.g. those of a
+            larger universe when prep_df holds a single commodity (see `get_return_dates`).
+        roll_rule (dict): Optional roll rule (see `continuous_futures.build_roll_schedule`). When given, the
+            roll-adjusted monthly returns of `continuous_futures` are returned instead, indexed by the
+            last trading day of each month.
+        period (tuple): Optional (start_date, end_date) of the clean file prep_df was read from. With a roll
+            rule, the roll schedule of that file is read from (or stored to) the cache of
+            `continuous_futures.load_roll_schedule` instead of being rebuilt.
         
     Returns:
         DataFrame: A DataFrame containing monthly excess returns for the second contract of each commodity.
     """
 
-    cmdty_cntrct_2_df = prep_df[prep_df['Contract']==2]
-    cmdty_cntrct_2_df.reset_index(inplace = True)
-    max_date_px_last_cntrct_2 = cmdty_cntrct_2_df.groupby(['Commodity', 'YearMonth']).apply(
-                                lambda x: x.loc[x['Date'].idxmax(), ['Date', 'ClosePrice']]).reset_index()
-    max_date_px_last_cntrct_2.sort_values(by=['Commodity','YearMonth'], inplace =True)
+    if roll_rule is not None:
+        schedule = continuous_futures.load_roll_schedule(*period, roll_rule) if period is not None else None
+        _, monthly_returns_df = continuous_futures.compute_roll_adjusted_returns(prep_df, roll_rule, schedule)
+        #The first month only has returns from its first trading day on
+        return monthly_returns_df.iloc[1:]
+
+    if context is not None:
+        month_end_df = context.month_end()
+        max_date_px_last_cntrct_2 = month_end_df[month_end_df['Contract']==2].reset_index(drop=True)
+    else:
+        cmdty_df = select_columns(prep_df, ['Date'] + MONTH_END_KEYS + ['ClosePrice'])
+        cmdty_cntrct_2_df = cmdty_df[cmdty_df['Contract']==2]
+        max_date_px_last_cntrct_2 = get_month_end_observations(cmdty_cntrct_2_df)
     max_date_px_last_cntrct_2.set_index('Date', inplace=True)
     max_date_px_last_cntrct_2_pivot = max_date_px_last_cntrct_2.pivot_table(index = 'Date', columns = 'Commodity', values = 'ClosePrice')
+    if return_dates is not None:
+        max_date_px_last_cntrct_2_pivot = max_date_px_last_cntrct_2_pivot.reindex(return_dates)
     cmdty_cntrct_2_rets_df = max_date_px_last_cntrct_2_pivot.pct_change()
     return cmdty_cntrct_2_rets_df
 
@@ -81,80 +161,102 @@ def compute_performance_metrics(excess_returns_df, annualizing_period = 12):
                                         "Ann. Sharpe Ratio": sharpe_ratio})
     return performance_metrics
 
-def get_first_last_to_expire_contract(prep_df, first_to_exp_ind = 1, last_to_expire = False):
+@tracing.traced
+def get_expiry_legs(prep_df, first_to_exp_ind = 1, month_end_df = None, commodities = None):
     """
-    Retrieves close prices for the first and last to expire contracts for each commodity.
+    Retrieves month-end close prices of the first and last to expire contracts for each commodity in one pass.
+
+    Only commodities with at least two distinct contracts on some date are considered. All joins are
+    keyed on the typed Commodity, Date and Contract columns; no string keys are built.
 
     Parameters:
         prep_df (DataFrame): Preprocessed DataFrame containing commodity data.
-        first_to_expire_index (int): Index of the contract considered as 'first to expire'.
-        last_to_expire (bool): Flag indicating whether to return last to expire contracts.
-        
+        first_to_exp_ind (int): Index of the contract considered as 'first to expire'.
+        month_end_df (DataFrame): Optional precomputed output of `get_month_end_observations` for prep_df.
+        commodities (list): Optional commodities known to have two contracts on some date, used instead of
+            detecting them, e.g. when prep_df only holds month-end observations.
+
     Returns:
-        DataFrame: A DataFrame containing close prices for the specified contracts.
+        tuple: (first to expire DataFrame with Commodity, YearMonth, Date, Contract and ClosePrice;
+        last to expire DataFrame with Commodity, YearMonth, Max_Date, Max_Contract_Number and ClosePrice)
     """
 
-    cmdty_df = prep_df
-    
+    cmdty_df = select_columns(prep_df, ['Date', 'Commodity', 'Contract', 'YearMonth', 'ClosePrice'])
+
     #Get Commodities which have more than 1 contracts against the same date
-    cmdtry_cntrct_count = cmdty_df.groupby(['Commodity', 'Date'])['Contract'].nunique().reset_index(name='Distinct_Contracts')
-    cmdtry_cntrct_atlst_2 = cmdtry_cntrct_count[cmdtry_cntrct_count['Distinct_Contracts'] >= 2]
-    
-    #Get list of the commodities for the aforementioned criterion
-    list_of_commodities = cmdtry_cntrct_atlst_2['Commodity'].unique()
-    
+    if commodities is not None:
+        list_of_commodities = list(commodities)
+    else:
+        distinct_cntrcts_df = cmdty_df.drop_duplicates(subset=['Commodity', 'Date', 'Contract'])
+        list_of_commodities = distinct_cntrcts_df.loc[distinct_cntrcts_df.duplicated(subset=['Commodity', 'Date']), 'Commodity'].unique()
+
     #Filter the data to only get the subset of interest
     cmdty_entire_df = cmdty_df[cmdty_df['Commodity'].isin(list_of_commodities)]
-    cmdty_entire_df.reset_index(inplace = True)
 
     #Getting Close Prices for 1st to Expire Contract Per Commodity
-    cmdty_cntrct_first_to_expire_df = cmdty_entire_df[cmdty_entire_df['Contract'] == first_to_exp_ind]
-    max_date_price_first_exp = cmdty_cntrct_first_to_expire_df.groupby(['Commodity', 'YearMonth']).apply(
-                                lambda x: x.loc[x['Date'].idxmax(), ['Date', 'Contract', 'ClosePrice']]).reset_index()
-    max_date_price_first_exp['uid'] = max_date_price_first_exp['Commodity'] + max_date_price_first_exp['Date'].astype(str) + max_date_price_first_exp['Contract'].astype(str)
-    max_date_price_first_exp.sort_values(by=['Commodity','YearMonth'], inplace =True)
-
-    #### Last to Expire ####
-    #Getting Close Prices for Last to Expire Contract per Commodity
+    if month_end_df is not None:
+        max_date_price_first_exp = month_end_df[month_end_df['Commodity'].isin(list_of_commodities) &
+                                                (month_end_df['Contract'] == first_to_exp_ind)].reset_index(drop=True)
+    else:
+        cmdty_cntrct_first_to_expire_df = cmdty_entire_df[cmdty_entire_df['Contract'] == first_to_exp_ind]
+        max_date_price_first_exp = get_month_end_observations(cmdty_cntrct_first_to_expire_df)
+    max_date_price_first_exp = max_date_price_first_exp[['Commodity', 'YearMonth', 'Date', 'Contract', 'ClosePrice']]
+
+    #Getting Close Prices for Last to Expire Contract per Commodity, at the latest date and highest contract of each month
     cmdty_cntrct_last_to_expire_df = cmdty_entire_df[cmdty_entire_df['Contract'] > first_to_exp_ind]
-    max_date_cntrct_last_exp_df = cmdty_cntrct_last_to_expire_df.groupby(['Commodity', 'YearMonth']).agg(Max_Date=('Date', 'max'),
+    max_date_cntrct_last_exp_df = cmdty_cntrct_last_to_expire_df.groupby(['Commodity', 'YearMonth'], observed=True).agg(Max_Date=('Date', 'max'),
                                                                                          Max_Contract_Number=('Contract', 'max')).reset_index()
-    
-    cmdty_entire_df_temp = cmdty_entire_df
-    cmdty_entire_df_temp['uid'] = cmdty_entire_df_temp['Commodity'] + cmdty_entire_df_temp['Date'].astype(str) + cmdty_entire_df_temp['Contract'].astype(str)
-    max_date_cntrct_last_exp_df['uid'] = max_date_cntrct_last_exp_df['Commodity'] + max_date_cntrct_last_exp_df['Max_Date'].astype(str) + max_date_cntrct_last_exp_df['Max_Contract_Number'].astype(str)
-    max_date_cntrct_last_exp_price_df = pd.merge(max_date_cntrct_last_exp_df, cmdty_entire_df_temp[['uid','ClosePrice']], how = 'left', left_on = 'uid', right_on='uid')
+    max_date_cntrct_last_exp_price_df = pd.merge(max_date_cntrct_last_exp_df,
+                                                 cmdty_entire_df[['Commodity', 'Date', 'Contract', 'ClosePrice']],
+                                                 how = 'left', left_on = ['Commodity', 'Max_Date', 'Max_Contract_Number'],
+                                                 right_on = ['Commodity', 'Date', 'Contract'])
+    max_date_cntrct_last_exp_price_df.drop(columns = ['Date', 'Contract'], inplace = True)
 
-    max_date_price_first_exp.drop(columns = ['uid'],inplace = True)
-    max_date_price_first_exp.reset_index()
-    
-    max_date_cntrct_last_exp_price_df.drop(columns = ['uid'], inplace=True)
-    max_date_cntrct_last_exp_price_df.reset_index()
+    return max_date_price_first_exp, max_date_cntrct_last_exp_price_df
+
+def get_first_last_to_expire_contract(prep_df, first_to_exp_ind = 1, last_to_expire = False):
+    """
+    Retrieves close prices for the first and last to expire contracts for each commodity.
+
+    Parameters:
+        prep_df (DataFrame): Preprocessed DataFrame containing commodity data.
+        first_to_expire_index (int): Index of the contract considered as 'first to expire'.
+        last_to_expire (bool): Flag indicating whether to return last to expire contracts.
+        
+    Returns:
+        DataFrame: A DataFrame containing close prices for the specified contracts.
+    """
+
+    max_date_price_first_exp, max_date_cntrct_last_exp_price_df = get_expiry_legs(prep_df, first_to_exp_ind)
 
     if last_to_expire == False:
         return max_date_price_first_exp
     else:
         return max_date_cntrct_last_exp_price_df
 
-def compute_basis_timeseries(prep_df):
+@tracing.traced
+def compute_basis_timeseries(prep_df, first_to_exp_ind = 1, context = None):
     """
     Computes the basis time series for commodities.
 
     Parameters:
         prep_df (DataFrame): Preprocessed DataFrame containing commodity data.
+        first_to_exp_ind (int): Index of the contract considered as 'first to expire'.
+        context (MetricsContext): Optional context whose memoized expiry legs are reused.
         
     Returns:
         DataFrame: A DataFrame containing the basis time series for each commodity.
     """
 
-    prep_df = prep_df
-    first_to_expire = get_first_last_to_expire_contract(prep_df, 1, False)
-    first_to_expire['uid'] = first_to_expire['Commodity'] + first_to_expire['Date'].astype(str)
-
-    last_to_expire = get_first_last_to_expire_contract(prep_df, 1, True)
-    last_to_expire['uid'] = last_to_expire['Commodity'] + last_to_expire['Max_Date'].astype(str)
+    if context is not None:
+        first_to_expire, last_to_expire = context.expiry_legs()
+    else:
+        first_to_expire, last_to_expire = get_expiry_legs(prep_df, first_to_exp_ind)
 
-    basis_df_base = pd.merge(first_to_expire, last_to_expire[['uid','Max_Contract_Number','ClosePrice']], how='left', left_on = 'uid', right_on = 'uid')
+    #Matching both legs on the same commodity and month-end date
+    basis_df_base = pd.merge(first_to_expire, last_to_expire[['Commodity', 'Max_Date', 'Max_Contract_Number', 'ClosePrice']],
+                             how='left', left_on = ['Commodity', 'Date'], right_on = ['Commodity', 'Max_Date'])
+    basis_df_base.drop(columns = ['Max_Date'], inplace = True)
     basis_df_base.rename(columns={'ClosePrice_x':'ClosePriceFstExp',
                                   'ClosePrice_y':'ClosePriceLstExp'}, inplace = True)
     basis_df_base['LogClosePriceFstExp'] = np.log(basis_df_base['ClosePriceFstExp'])
@@ -166,42 +268,44 @@ def compute_basis_timeseries(prep_df):
 
     return basis_df_base
 
-def compute_basis_mean(prep_df):
+def compute_basis_mean(prep_df, context = None):
     """
     Computes the mean basis for each commodity.
 
     Parameters:
         prep_df (DataFrame): Preprocessed DataFrame containing commodity data.
+        context (MetricsContext): Optional context whose memoized basis time series is reused.
         
     Returns:
         Series: A Series containing the mean basis for each commodity.
     """
 
-    prep_df = prep_df
-    timeseries_basis = compute_basis_timeseries(prep_df)
-    mean_basis = timeseries_basis.groupby(['Commodity'])['Basis'].mean()
+    timeseries_basis = context.basis_timeseries() if context is not None else compute_basis_timeseries(prep_df)
+    mean_basis = timeseries_basis.groupby(['Commodity'], observed=True)['Basis'].mean()
     return mean_basis
 
-def compute_freq_backwardation(prep_df):
+def compute_freq_backwardation(prep_df, context = None):
     """
     Computes the frequency of backwardation for each commodity.
 
     Parameters:
         prep_df (DataFrame): Preprocessed DataFrame containing commodity data.
+        context (MetricsContext): Optional context whose memoized basis time series is reused.
         
     Returns:
         DataFrame: A DataFrame containing the frequency of backwardation for each commodity.
     """
 
-    prep_df=prep_df
-    timeseries_basis = compute_basis_timeseries(prep_df)
-    timeseries_basis['in_backwardation'] = timeseries_basis['Basis'].apply(lambda x: 1 if x > 0 else 0)
+    timeseries_basis = context.basis_timeseries() if context is not None else compute_basis_timeseries(prep_df)
+    #Working on a narrow copy, so that a shared basis time series is left untouched
+    timeseries_basis = timeseries_basis[['Commodity', 'Basis']].copy()
+    timeseries_basis['in_backwardation'] = (timeseries_basis['Basis'] > 0).astype(int)
     
-    total_basis_count = timeseries_basis.groupby('Commodity')['in_backwardation'].size().to_frame()
+    total_basis_count = timeseries_basis.groupby('Commodity', observed=True)['in_backwardation'].size().to_frame()
     total_basis_count.reset_index(inplace=True)
     total_basis_count.rename(columns = {'in_backwardation':'TotalBasisCount'}, inplace=True)
 
-    poistive_basis = timeseries_basis.groupby('Commodity')['in_backwardation'].sum().reset_index()
+    poistive_basis = timeseries_basis.groupby('Commodity', observed=True)['in_backwardation'].sum().reset_index()
     poistive_basis.rename(columns = {'in_backwardation':'PositiveBasisCount'}, inplace=True)
     
     backwardation_calc_df = pd.merge(total_basis_count, poistive_basis, how='left', left_on='Commodity',right_on='Commodity')
@@ -210,76 +314,236 @@ def compute_freq_backwardation(prep_df):
 
     return backwardation_calc_df
 
-def combine_metrics(prep_df):
+class MetricsContext:
+    """
+    Shared computation context for the Table 1 metrics of one DataFrame.
+
+    Each intermediate (month-end prices, first/last-to-expire legs, basis time series) is computed
+    once on first use and memoized for the rest of the run. The wall time of every stage computed
+    through the context is recorded in `timings` (seconds, keyed by stage name); the time of a stage
+    includes the intermediates it computed first.
+
+    Parameters:
+        prep_df (DataFrame): Preprocessed DataFrame containing commodity data.
+        first_to_exp_ind (int): Index of the contract considered as 'first to expire'.
+        return_dates (DatetimeIndex): Optional month-end dates the excess returns are aligned on.
+        expiry_commodities (list): Optional commodities with two contracts on some date, see `get_expiry_legs`.
+    """
+
+    def __init__(self, prep_df, first_to_exp_ind = 1, return_dates = None, expiry_commodities = None):
+        self.prep_df = prep_df
+        self.first_to_exp_ind = first_to_exp_ind
+        self.return_dates = return_dates
+        self.expiry_commodities = expiry_commodities
+        self.timings = {}
+        self._results = {}
+
+    def _memoize(self, name, compute):
+        if name not in self._results:
+            with self.timed(name):
+                self._results[name] = compute()
+        return self._results[name]
+
+    @contextmanager
+    def timed(self, name):
+        """
+        Records the wall time of the enclosed block under `name` in `timings`.
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def month_end(self):
+        return self._memoize('month_end', lambda: get_month_end_observations(self.prep_df))
+
+    def expiry_legs(self):
+        return self._memoize('expiry_legs', lambda: get_expiry_legs(self.prep_df, self.first_to_exp_ind, self.month_end(),
+                                                                     self.expiry_commodities))
+
+    def basis_timeseries(self):
+        return self._memoize('basis_timeseries', lambda: compute_basis_timeseries(self.prep_df, self.first_to_exp_ind, context=self))
+
+    def excess_returns(self):
+        return self._memoize('excess_returns', lambda: compute_commodity_excess_returns(self.prep_df, context=self, return_dates=self.return_dates))
+
+@tracing.traced
+def compute_metrics_frame(prep_df, context = None, num_observations = None, annualizing_period = 12, first_to_exp_ind = 1):
+    """
+    Computes the numeric Table 1 metrics for each commodity.
+
+    Parameters:
+        prep_df (DataFrame): Preprocessed DataFrame containing commodity data.
+        context (MetricsContext): Optional computation context; pass one to inspect its per-stage `timings`.
+        num_observations (Series): Optional precomputed output of `compute_num_observations`.
+        annualizing_period (int): Factor used to annualize the return metrics, default is 12 (for monthly data).
+        first_to_exp_ind (int): Index of the contract considered as 'first to expire', unless a context is given.
+
+    Returns:
+        DataFrame: A DataFrame indexed by Commodity with N, Ann. Excess Returns, Ann. Volatility,
+        Ann. Sharpe Ratio, Basis and Freq. of Backwardation.
+    """
+
+    if context is None:
+        context = MetricsContext(prep_df, first_to_exp_ind)
+    with context.timed('num_observations'):
+        N = compute_num_observations(prep_df) if num_observations is None else num_observations
+    returns_df = context.excess_returns()
+    with context.timed('performance_metrics'):
+        performance_metrics = compute_performance_metrics(returns_df, annualizing_period)
+    with context.timed('basis_mean'):
+        avg_basis = compute_basis_mean(prep_df, context=context)
+    with context.timed('freq_backwardation'):
+        back_freq = compute_freq_backwardation(prep_df, context=context)
+    metrics_df = pd.concat([N,performance_metrics,avg_basis,back_freq], axis = 1)
+    metrics_df.drop(columns=['TotalBasisCount','PositiveBasisCount'], inplace = True)
+    metrics_df.index.name = 'Commodity'
+    return metrics_df
+
+def get_return_dates(prep_df):
+    """
+    Returns the sorted union of the month-end dates of the second contract across all commodities,
+    i.e. the rows of the return matrix of `compute_commodity_excess_returns`.
+
+    The month-end rows are selected as in the serial path (the latest row of a month, even if its price
+    is NaN); as in its pivot_table, dates at which every month-end price is NaN are not rows.
+    """
+
+    cmdty_df = select_columns(prep_df, ['Date'] + MONTH_END_KEYS + ['ClosePrice'])
+    month_end_df = get_month_end_observations(cmdty_df[cmdty_df['Contract'] == 2])
+    month_end_dates = month_end_df.loc[month_end_df['ClosePrice'].notna(), 'Date']
+    return pd.DatetimeIndex(month_end_dates.unique(), name='Date').sort_values()
+
+def _compute_partition_metrics(partition_df, return_dates, annualizing_period = 12, first_to_exp_ind = 1):
+    """
+    Worker of `compute_metrics_parallel`: the metrics of one commodity partition.
+    """
+
+    context = MetricsContext(partition_df, first_to_exp_ind, return_dates=return_dates)
+    return compute_metrics_frame(partition_df, context, annualizing_period=annualizing_period)
+
+@tracing.traced
+def compute_metrics_parallel(prep_df, max_workers = None, annualizing_period = 12, first_to_exp_ind = 1):
+    """
+    Computes the numeric Table 1 metrics on a process pool, one partition per commodity.
+
+    Every metric is computed per commodity, except that the monthly returns are aligned on the month-end
+    dates of all commodities (see `compute_commodity_excess_returns`). Those dates are computed once and
+    handed to every worker, so the result is identical to `compute_metrics_frame`.
+
+    Parameters:
+        prep_df (DataFrame): Preprocessed DataFrame containing commodity data.
+        max_workers (int): Number of worker processes, default: the number of CPUs.
+        annualizing_period, first_to_exp_ind: as in `compute_metrics_frame`.
+
+    Returns:
+        DataFrame: Same as `compute_metrics_frame`.
+    """
+
+    return_dates = get_return_dates(prep_df)
+    cmdty_df = select_columns(prep_df, ['Date', 'Commodity', 'Contract', 'YearMonth', 'ClosePrice'])
+    partitions = [partition_df for _, partition_df in cmdty_df.groupby('Commodity', observed=True, sort=True)]
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        partition_metrics = list(executor.map(_compute_partition_metrics, partitions, repeat(return_dates),
+                                              repeat(annualizing_period), repeat(first_to_exp_ind)))
+    return pd.concat(partition_metrics)
+
+@tracing.traced
+def format_metrics_table(metrics_df):
+    """
+    Labels the numeric metrics with sector and symbol and formats them as Table 1.
+
+    Parameters:
+        metrics_df (DataFrame): Output of `compute_metrics_frame` or `compute_metrics_parallel`.
+
+    Returns:
+        Styler: The styled Table 1, indexed by Sector and Commodity. To write files, pass the numeric
+        `table_export.build_table1` to `table_export.export_table` instead.
+    """
+
+    return table_export.style_table(table_export.build_table1(metrics_df))
+
+@tracing.traced
+def combine_metrics(prep_df, context = None, max_workers = METRICS_WORKERS):
     """
     Combines computed metrics into a single DataFrame.
 
     Parameters:
         prep_df (DataFrame): Preprocessed DataFrame containing commodity data.
+        context (MetricsContext): Optional computation context; pass one to inspect its per-stage `timings`.
+        max_workers (int): With more than one worker, the metrics are computed per commodity on a
+            process pool (see `compute_metrics_parallel`), default: config.py -> METRICS_WORKERS
         
     Returns:
         DataFrame: A DataFrame containing combined metrics for each commodity.
     """
 
-    prep_df = prep_df
-    N = compute_num_observations(prep_df)
-    returns_df = compute_commodity_excess_returns(prep_df)
-    performance_metrics = compute_performance_metrics(returns_df)
-    avg_basis = compute_basis_mean(prep_df)
-    back_freq = compute_freq_backwardation(prep_df)
-    metrics_df = pd.concat([N,performance_metrics,avg_basis,back_freq], axis = 1)
-    metrics_df.drop(columns=['TotalBasisCount','PositiveBasisCount'], inplace = True)
-    metrics_df.reset_index(inplace = True)
-
-    commodity_sector_mapping = {'Cocoa': 'Agriculture','Corn': 'Agriculture','Cotton': 'Agriculture',
-                                'Live cattle': 'Livestock','Oats': 'Agriculture','Orange juice': 'Agriculture',
-                                'Soybean meal': 'Agriculture','Soybeans': 'Agriculture','Wheat': 'Agriculture',
-                                'Feeder cattle': 'Livestock','Coffee': 'Agriculture','Gold': 'Metals','Silver': 'Metals',
-                                'Canola': 'Agriculture','Crude Oil': 'Energy','Heating Oil': 'Energy','Lean hogs': 'Livestock',
-                                'Palladium': 'Metals','Platinum': 'Metals','Lumber': 'Agriculture','Unleaded gas': 'Energy',
-                                'Copper': 'Metals','Rough rice': 'Agriculture','Natural gas': 'Energy','Aluminium': 'Metals','Gasoline': 'Energy'}
-    commodity_symbol_mapping = {'Canola': 'WC','Cocoa': 'CC','Coffee': 'KC','Corn': 'C-',
-                                'Cotton': 'CT','Lumber': 'LB','Oats': 'O-','Orange juice': 'JO','Rough rice': 'RR','Soybean meal': 'SM',
-                                'Soybeans': 'S-','Wheat': 'W-','Crude Oil': 'CL','Gasoline': 'RB','Heating Oil': 'HO','Natural gas': 'NG',
-                                'Unleaded gas': 'HU','Feeder cattle': 'FC','Lean hogs': 'LH','Live cattle': 'LC',
-                                'Aluminium': 'AL','Copper': 'HG','Gold': 'GC','Palladium': 'PA','Platinum': 'PL','Silver': 'SI'}
-    
-    metrics_df['Sector'] = metrics_df['Commodity'].map(commodity_sector_mapping)
-    metrics_df['Symbol'] = metrics_df['Commodity'].map(commodity_symbol_mapping)
-    metrics_df_final = metrics_df[['Sector','Commodity','Symbol','N','Basis','Freq. of Backwardation','Ann. Excess Returns','Ann. Volatility','Ann. Sharpe Ratio']]
-    metrics_df_final.set_index(['Sector','Commodity'], inplace = True)
-    metrics_df_final.sort_index(inplace=True)
-
-    metrics_df_final = metrics_df_final.rename(columns={'Freq. of Backwardation': 'Freq. of bw.', 'Ann. Excess Returns': 'Excess returns', 
-                                                   'Ann. Volatility': 'Volatility', 'Ann. Sharpe Ratio': 'Sharpe ratio'})
-    metrics_df_final['N'] = metrics_df_final['N'].astype(int)
-
-    metrics_df_final = metrics_df_final.style.format({
-        'Basis': "{:.2f}",
-        'Freq. of bw.': "{:.2f}",
-        'Excess returns': "{:.2f}",
-        'Volatility': "{:.2f}",
-        'Sharpe ratio': "{:.2f}"
-    })
-    
-    return metrics_df_final
+    if max_workers is not None and max_workers > 1:
+        metrics_df = compute_metrics_parallel(prep_df, max_workers)
+    else:
+        metrics_df = compute_metrics_frame(prep_df, context)
+    return format_metrics_table(metrics_df)
+
+@tracing.traced
+def load_metrics(start_date, end_date, data_dir = DATA_DIR, input_file = INPUTFILE, annualizing_period = 12,
+                 first_to_exp_ind = 1, max_workers = METRICS_WORKERS, store = None):
+    """
+    Returns the numeric Table 1 metrics of a period from the metrics store, computing and storing them on a miss.
+
+    Entries are keyed by the content of the clean file of the period, the period and the metric parameters
+    (see `metrics_store`), so repeated runs and every reader of the same table (the Table 1 export of
+    every format, notebooks) share a single computation.
+
+    Parameters:
+        start_date (str): First date of the period, format: 'YYYY-MM-DD'.
+        end_date (str): Last date of the period, format: 'YYYY-MM-DD'.
+        data_dir (str): Directory where the data files are stored.
+        input_file (str): Name of the raw input file, used to name the clean file.
+        annualizing_period, first_to_exp_ind: as in `compute_metrics_frame`.
+        max_workers (int): As in `combine_metrics`, for a miss.
+        store (MetricsStore): Store to use, default: the store of data_dir.
+
+    Returns:
+        DataFrame: Same as `compute_metrics_frame`.
+    """
+
+    clean_file = dp.get_clean_file_name(start_date, end_date, input_file)
+    store = store or metrics_store.MetricsStore(metrics_store.get_store_path(data_dir))
+    fingerprint = load_commodities_data.get_data_fingerprint(data_dir, clean_file)
+    params = {'annualizing_period': annualizing_period, 'first_to_exp_ind': first_to_exp_ind}
+
+    metrics_df = store.get(fingerprint, start_date, end_date, params)
+    if metrics_df is not None:
+        logging.info(f"Metrics of {clean_file} read from the metrics store")
+        return metrics_df
+
+    prep_df = load_commodities_data.load_data(data_dir, clean_file)
+    if max_workers is not None and max_workers > 1:
+        metrics_df = compute_metrics_parallel(prep_df, max_workers, annualizing_period, first_to_exp_ind)
+    else:
+        metrics_df = compute_metrics_frame(prep_df, annualizing_period=annualizing_period, first_to_exp_ind=first_to_exp_ind)
+    store.put(fingerprint, start_date, end_date, params, metrics_df)
+    return metrics_df
 
 if __name__ == '__main__':
-    start_dates = [config.STARTDATE_OLD[:4], config.STARTDATE_NEW[:4]]
-    end_dates = [config.ENDDATE_OLD[:4], config.ENDDATE_NEW[:4]]
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    parser = argparse.ArgumentParser(description="Compute Table 1 for every period.")
+    parser.add_argument('--period', nargs=2, metavar=('START', 'END'), help="run a single period, format: 'YYYY-MM-DD'")
+    args = parser.parse_args()
+    periods = [tuple(args.period)] if args.period else config.PERIODS
     
-    for start_, end_ in zip(start_dates, end_dates):
-        clean_data_file_path = Path(DATA_DIR) / "manual"/f"clean_{start_}_{end_}_{INPUTFILE}"
-        clean_data_df = pd.read_csv(clean_data_file_path)
+    for start_date, end_date in periods:
+        start_, end_ = start_date[:4], end_date[:4]
         
         logging.info(f"\nFor Time Period, {start_} to {end_}:")
         
-        combined_metrics_df = combine_metrics(clean_data_df)
-        output_file = f"Table1__{start_}_{end_}.xlsx"
-        OUTPATH_path = Path(OUTPUT_DIR) / output_file
+        metrics_df = load_metrics(start_date, end_date, DATA_DIR, INPUTFILE)
 
         try:
-            combined_metrics_df.to_excel(OUTPATH_path)
-            logging.info(f"{output_file} Stored Successfully!")
+            #xlsx, LaTeX, CSV and JSON of Table 1 in a single pass over the same metrics
+            table_export.export_table1(metrics_df, start_date, end_date, OUTPUT_DIR)
         except Exception as e:
-            logging.error(f"An error occurred while Storing the {output_file}: {e}") 
\ No newline at end of file
+            logging.error(f"An error occurred while Storing Table 1 for {start_} to {end_}: {e}")
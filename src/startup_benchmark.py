@@ -0,0 +1,118 @@
+"""
+This module guards the cold-start time of the pipeline entry points, which schedulers invoke many times.
+
+Every entry point is imported in a fresh interpreter with `python -X importtime`. The cumulative import
+time of the module is compared with its budget, and its import tree is checked for heavy libraries that it
+must not load at import time: `dodo.py` must not import pandas (so that `doit list` stays fast), and
+`perform_additional_analysis` only imports matplotlib and seaborn once a figure is drawn.
+
+Usage:
+    python src/startup_benchmark.py [--repeats 5] [--scale 1.0]
+"""
+
+import config
+from pathlib import Path
+import argparse
+import re
+import subprocess
+import sys
+import logging
+
+BASE_DIR = Path(config.BASE_DIR)
+
+REPEATS = 5
+#Cumulative import time budget in seconds, by module imported from src/ (dodo from the project root)
+STARTUP_BUDGETS = {
+    'dodo': 0.25,
+    'config': 0.1,
+    'tracing': 0.1,
+    'load_commodities_data': 1.5,
+    'data_preprocessing': 1.5,
+    'replicate_results': 1.5,
+    'perform_additional_analysis': 1.5,
+}
+#Top-level packages an entry point must not import
+FORBIDDEN_IMPORTS = {
+    'dodo': ['pandas', 'numpy', 'pyarrow', 'matplotlib'],
+    'config': ['pandas', 'numpy'],
+    'tracing': ['pandas', 'numpy'],
+    'perform_additional_analysis': ['matplotlib', 'seaborn', 'scipy'],
+}
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)\s*$")
+
+def parse_importtime(stderr):
+    """
+    Parses the output of `python -X importtime`.
+
+    Returns:
+        dict: Module name -> cumulative import time in seconds, for every module imported.
+    """
+
+    cumulative = {}
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            cumulative[match.group(3)] = int(match.group(2)) / 1e6
+    return cumulative
+
+def measure_import(module, repeats = REPEATS):
+    """
+    Imports a module in `repeats` fresh interpreters.
+
+    Returns:
+        tuple: (best cumulative import time of the module in seconds, set of all modules it imported)
+    """
+
+    src_path = str(BASE_DIR / "src")
+    code = f"import sys; sys.path.insert(0, {src_path!r}); import {module}"
+    timings = []
+    for _ in range(repeats):
+        completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=BASE_DIR,
+                                   capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{completed.stderr.splitlines()[-1] if completed.stderr else ''}")
+        cumulative = parse_importtime(completed.stderr)
+        timings.append(cumulative.get(module, 0.0))
+    return min(timings), set(cumulative)
+
+def check_startup(budgets = STARTUP_BUDGETS, forbidden = FORBIDDEN_IMPORTS, repeats = REPEATS, scale = 1.0):
+    """
+    Measures every entry point and checks it against its budget and forbidden imports.
+
+    Parameters:
+        budgets (dict): Module -> import time budget in seconds.
+        forbidden (dict): Module -> top-level packages it must not import.
+        repeats (int): Fresh interpreters per module, the best time is kept.
+        scale (float): Factor applied to every budget, e.g. for slower machines.
+
+    Returns:
+        tuple: (dict of module -> best import time in seconds, list of violation messages)
+    """
+
+    timings, violations = {}, []
+    for module, budget in budgets.items():
+        timings[module], imported = measure_import(module, repeats)
+        if timings[module] > budget * scale:
+            violations.append(f"{module} imports in {timings[module]:.3f}s, over its budget of {budget * scale:.3f}s")
+        for package in forbidden.get(module, []):
+            if package in imported:
+                violations.append(f"{module} imports {package} at import time")
+    return timings, violations
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Check the cold-start import time of the pipeline entry points.")
+    parser.add_argument('--repeats', type=int, default=REPEATS, help="fresh interpreters per module, the best time is kept")
+    parser.add_argument('--scale', type=float, default=1.0, help="factor applied to every budget")
+    args = parser.parse_args(argv)
+
+    timings, violations = check_startup(repeats=args.repeats, scale=args.scale)
+    for module, seconds in timings.items():
+        logging.info(f"{module:<30} {seconds * 1000:8.1f} ms")
+    for violation in violations:
+        logging.error(violation)
+    return 1 if violations else 0
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    sys.exit(main())
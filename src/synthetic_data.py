@@ -0,0 +1,99 @@
+"""
+This module generates deterministic synthetic futures panels with the schema of `commodities_data.csv`
+(Commodity, Contract, Date, PX_LAST), for benchmarks and tests that need data of a chosen size.
+
+Every commodity has a spot price following a geometric random walk and a term structure whose log slope
+per contract follows a mean-reverting process, so that commodities switch between backwardation and contango.
+Panels are parameterized by the number of commodities, contracts per commodity, years, the rate of single
+missing observations and the rate of whole months missing for a commodity (gaps).
+"""
+
+import warnings
+warnings.filterwarnings("ignore")
+
+import config
+from pathlib import Path
+import pandas as pd
+import numpy as np
+import logging
+
+DATA_DIR = config.DATA_DIR
+
+RAW_COLUMNS = ['Commodity', 'Contract', 'Date', 'PX_LAST']
+DAILY_VOLATILITY = 0.015
+SLOPE_MEAN_REVERSION = 0.02
+SLOPE_VOLATILITY = 0.001
+
+def generate_futures_panel(num_commodities = 10, num_contracts = 12, years = 10, missing_rate = 0.0, gap_rate = 0.0,
+                           start_date = '1970-01-01', seed = 0):
+    """
+    Generates a synthetic long-format futures panel.
+
+    Parameters:
+        num_commodities (int): Number of commodities.
+        num_contracts (int): Number of contracts per commodity.
+        years (int): Number of years of business days from start_date.
+        missing_rate (float): Probability that a single (commodity, contract, date) observation is missing.
+        gap_rate (float): Probability that a commodity has no observation at all in a given month.
+        start_date (str): First date of the panel, format: 'YYYY-MM-DD'.
+        seed (int): Seed of the random draws; the same parameters and seed give the same panel.
+
+    Returns:
+        DataFrame: Panel with Commodity, Contract, Date and PX_LAST, sorted by Commodity, Contract and Date.
+    """
+
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start_date, pd.Timestamp(start_date) + pd.DateOffset(years=years) - pd.Timedelta(days=1))
+    num_dates = len(dates)
+    commodities = [f"Commodity {i + 1:03d}" for i in range(num_commodities)]
+
+    #Spot log prices and term-structure slopes, Date x Commodity
+    log_spot = np.log(rng.uniform(10, 1000, num_commodities)) + np.cumsum(
+        rng.normal(0, DAILY_VOLATILITY, (num_dates, num_commodities)), axis=0)
+    slope_shocks = rng.normal(0, SLOPE_VOLATILITY, (num_dates, num_commodities))
+    slopes = np.empty((num_dates, num_commodities))
+    slopes[0] = rng.normal(0, 0.01, num_commodities)
+    for t in range(1, num_dates):
+        slopes[t] = (1 - SLOPE_MEAN_REVERSION) * slopes[t - 1] + slope_shocks[t]
+
+    #Contract k trades at the spot times exp(-(k - 1) * slope), so a positive slope is backwardation
+    contracts = np.arange(1, num_contracts + 1)
+    log_prices = log_spot[:, :, np.newaxis] - slopes[:, :, np.newaxis] * (contracts - 1)
+    prices = np.round(np.exp(log_prices), 4)
+
+    observed = rng.random(prices.shape) >= missing_rate
+    months = dates.to_period('M')
+    month_codes, month_labels = pd.factorize(months)
+    month_gaps = rng.random((len(month_labels), num_commodities)) < gap_rate
+    observed &= ~month_gaps[month_codes][:, :, np.newaxis]
+
+    date_pos, commodity_pos, contract_pos = np.nonzero(observed)
+    panel_df = pd.DataFrame({'Commodity': np.asarray(commodities)[commodity_pos],
+                             'Contract': contracts[contract_pos],
+                             'Date': dates[date_pos],
+                             'PX_LAST': prices[date_pos, commodity_pos, contract_pos]})
+    return panel_df.sort_values(['Commodity', 'Contract', 'Date'], kind='stable', ignore_index=True)[RAW_COLUMNS]
+
+def write_synthetic_data(data_dir = DATA_DIR, input_file = 'synthetic_commodities_data.csv', **panel_params):
+    """
+    Generates a synthetic panel and writes it as a raw input file to data_dir/manual.
+
+    Parameters:
+        data_dir (str): Directory where the data file is stored.
+        input_file (str): Name of the file to write.
+        **panel_params: Parameters of `generate_futures_panel`.
+
+    Returns:
+        Path: Path of the written file.
+    """
+
+    file_path = Path(data_dir) / "manual" / input_file
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    panel_df = generate_futures_panel(**panel_params)
+    panel_df.to_csv(file_path, index=False, date_format='%Y-%m-%d')
+    logging.info(f"{input_file} with {len(panel_df)} synthetic rows Stored Successfully!")
+    return file_path
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    write_synthetic_data(DATA_DIR)
@@ -0,0 +1,240 @@
+"""
+This module exports Table 1 (or any metrics table) to xlsx, LaTeX, CSV and JSON in a single call.
+
+The numeric table is built once (`build_table1`), and every writer formats the same in-memory frame from
+one declaration of the formatting rules (COLUMN_PRECISION). No pandas Styler is involved. The xlsx file is
+streamed by openpyxl's write-only workbook (constant memory) with number formats on numeric cells, and the
+LaTeX table is assembled directly from the formatted strings. `style_table` still gives a Styler with the
+same rules for interactive use.
+"""
+
+import config
+from pathlib import Path
+import re
+import numpy as np
+import pandas as pd
+import logging
+
+import tracing
+
+OUTPUT_DIR = config.OUTPUT_DIR
+
+COMMODITY_SECTOR_MAPPING = {'Cocoa': 'Agriculture','Corn': 'Agriculture','Cotton': 'Agriculture',
+                            'Live cattle': 'Livestock','Oats': 'Agriculture','Orange juice': 'Agriculture',
+                            'Soybean meal': 'Agriculture','Soybeans': 'Agriculture','Wheat': 'Agriculture',
+                            'Feeder cattle': 'Livestock','Coffee': 'Agriculture','Gold': 'Metals','Silver': 'Metals',
+                            'Canola': 'Agriculture','Crude Oil': 'Energy','Heating Oil': 'Energy','Lean hogs': 'Livestock',
+                            'Palladium': 'Metals','Platinum': 'Metals','Lumber': 'Agriculture','Unleaded gas': 'Energy',
+                            'Copper': 'Metals','Rough rice': 'Agriculture','Natural gas': 'Energy','Aluminium': 'Metals','Gasoline': 'Energy'}
+COMMODITY_SYMBOL_MAPPING = {'Canola': 'WC','Cocoa': 'CC','Coffee': 'KC','Corn': 'C-',
+                            'Cotton': 'CT','Lumber': 'LB','Oats': 'O-','Orange juice': 'JO','Rough rice': 'RR','Soybean meal': 'SM',
+                            'Soybeans': 'S-','Wheat': 'W-','Crude Oil': 'CL','Gasoline': 'RB','Heating Oil': 'HO','Natural gas': 'NG',
+                            'Unleaded gas': 'HU','Feeder cattle': 'FC','Lean hogs': 'LH','Live cattle': 'LC',
+                            'Aluminium': 'AL','Copper': 'HG','Gold': 'GC','Palladium': 'PA','Platinum': 'PL','Silver': 'SI'}
+
+TABLE1_COLUMNS = ['Sector','Commodity','Symbol','N','Basis','Freq. of Backwardation','Ann. Excess Returns','Ann. Volatility','Ann. Sharpe Ratio']
+TABLE1_RENAMES = {'Freq. of Backwardation': 'Freq. of bw.', 'Ann. Excess Returns': 'Excess returns',
+                  'Ann. Volatility': 'Volatility', 'Ann. Sharpe Ratio': 'Sharpe ratio'}
+
+#Formatting rules of every export format: number of decimals by column, other columns are written as they are
+COLUMN_PRECISION = {'Basis': 2, 'Freq. of bw.': 2, 'Excess returns': 2, 'Volatility': 2, 'Sharpe ratio': 2}
+
+FORMATS = ['xlsx', 'tex', 'csv', 'json']
+LATEX_SPECIAL_CHARS = re.compile(r"([&%$#_{}])")
+
+def build_table1(metrics_df):
+    """
+    Labels the numeric metrics with sector and symbol and arranges them as Table 1.
+
+    Parameters:
+        metrics_df (DataFrame): Output of `replicate_results.compute_metrics_frame` or `load_metrics`.
+
+    Returns:
+        DataFrame: Numeric Table 1, indexed by Sector and Commodity.
+    """
+
+    metrics_df = metrics_df.reset_index()
+    metrics_df['Commodity'] = metrics_df['Commodity'].astype(str)
+    metrics_df['Sector'] = metrics_df['Commodity'].map(COMMODITY_SECTOR_MAPPING)
+    metrics_df['Symbol'] = metrics_df['Commodity'].map(COMMODITY_SYMBOL_MAPPING)
+
+    table_df = metrics_df[TABLE1_COLUMNS].set_index(['Sector', 'Commodity']).sort_index()
+    table_df = table_df.rename(columns=TABLE1_RENAMES)
+    table_df['N'] = table_df['N'].astype(int)
+    return table_df
+
+def style_table(table_df, precision = COLUMN_PRECISION):
+    """
+    Returns a Styler of the table formatted with the export rules, e.g. for notebooks.
+    """
+
+    return table_df.style.format({column: f"{{:.{decimals}f}}" for column, decimals in precision.items()
+                                  if column in table_df.columns})
+
+def format_cells(table_df, precision = COLUMN_PRECISION):
+    """
+    Returns the cells of the table as strings, with the decimals of `precision` for its columns.
+    """
+
+    cells_df = pd.DataFrame(index=table_df.index)
+    for column in table_df.columns:
+        if column in precision:
+            cells_df[column] = table_df[column].map(f"{{:.{precision[column]}f}}".format)
+        else:
+            cells_df[column] = table_df[column].astype(str)
+    return cells_df
+
+def _repeated_labels(index):
+    """
+    Flags, for every index level but the innermost, the labels that repeat the previous row together with
+    all outer labels, i.e. the cells that Styler leaves blank (LaTeX) or merges (Excel).
+
+    Returns:
+        list: One boolean array per outer level.
+    """
+
+    index_df = index.to_frame(index=False).astype(str)
+    repeated = np.ones(len(index_df), dtype=bool)
+    flags = []
+    for level in range(index.nlevels - 1):
+        column = index_df.iloc[:, level]
+        repeated = repeated & column.eq(column.shift()).to_numpy()
+        flags.append(repeated)
+    return flags
+
+def _escape_latex(values):
+    return [LATEX_SPECIAL_CHARS.sub(r"\\\1", value) for value in values]
+
+def write_latex(table_df, file_path, precision = COLUMN_PRECISION):
+    """
+    Writes the table as a LaTeX tabular, laid out as `Styler.to_latex`: index levels first, repeated outer
+    index labels left blank, text columns left-aligned and numeric columns right-aligned.
+    """
+
+    num_levels = table_df.index.nlevels
+    index_df = table_df.index.to_frame(index=False).astype(str)
+    #An index label is left blank when it and all outer labels repeat those of the previous row
+    for level, repeated in enumerate(_repeated_labels(table_df.index)):
+        index_df.iloc[repeated, level] = ''
+    cells_df = format_cells(table_df, precision).reset_index(drop=True)
+
+    alignment = 'l' * num_levels + ''.join('r' if pd.api.types.is_numeric_dtype(dtype) else 'l' for dtype in table_df.dtypes)
+    index_names = [name if name is not None else '' for name in table_df.index.names]
+    lines = [f"\\begin{{tabular}}{{{alignment}}}",
+             " & ".join([''] * num_levels + _escape_latex(map(str, table_df.columns))) + " \\\\",
+             " & ".join(_escape_latex(index_names) + [''] * len(table_df.columns)) + " \\\\"]
+    columns = [_escape_latex(index_df[column]) for column in index_df.columns] + [_escape_latex(cells_df[column]) for column in cells_df.columns]
+    lines.extend(" & ".join(row) + " \\\\" for row in zip(*columns))
+    lines.append("\\end{tabular}")
+    with open(file_path, 'w') as f:
+        f.write("\n".join(lines) + "\n")
+
+def write_xlsx(table_df, file_path, precision = COLUMN_PRECISION):
+    """
+    Streams the table to an xlsx sheet with openpyxl's write-only workbook. Numbers stay numeric; the
+    decimals of `precision` are applied as Excel number formats. As with `Styler.to_excel`, repeated labels
+    of the outer index levels (e.g. Sector) are written once, in a merged cell spanning their rows.
+    """
+
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment
+    from openpyxl.worksheet.cell_range import CellRange
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Sheet1')
+    flat_df = table_df.reset_index()
+    flat_df = flat_df.astype(object).where(flat_df.notna(), None)
+    number_formats = [('0.' + '0' * precision[column]) if precision.get(column) else None for column in flat_df.columns]
+
+    #Rows and columns of the sheet are 1-based, below the header row
+    merged_starts = set()
+    for level, repeated in enumerate(_repeated_labels(table_df.index)):
+        starts = np.flatnonzero(~repeated)
+        ends = np.r_[starts[1:], len(repeated)] - 1
+        for start, end in zip(starts, ends):
+            if end > start:
+                sheet.merged_cells.add(CellRange(min_col=level + 1, min_row=start + 2, max_col=level + 1, max_row=end + 2))
+                merged_starts.add((start, level))
+        flat_df.iloc[repeated, level] = None
+
+    sheet.append([str(column) for column in flat_df.columns])
+    for row_idx, row in enumerate(flat_df.itertuples(index=False, name=None)):
+        cells = []
+        for col_idx, (value, number_format) in enumerate(zip(row, number_formats)):
+            if (row_idx, col_idx) in merged_starts:
+                cell = WriteOnlyCell(sheet, value=value)
+                cell.alignment = Alignment(vertical='top')
+                cells.append(cell)
+            elif number_format is None or value is None:
+                cells.append(value)
+            else:
+                cell = WriteOnlyCell(sheet, value=value)
+                cell.number_format = number_format
+                cells.append(cell)
+        sheet.append(cells)
+    workbook.save(file_path)
+
+def write_csv(table_df, file_path, precision = COLUMN_PRECISION):
+    """
+    Writes the table as CSV, numbers rounded to the decimals of `precision`.
+    """
+
+    table_df.round(precision).to_csv(file_path)
+
+def write_json(table_df, file_path, precision = COLUMN_PRECISION):
+    """
+    Writes the table as a JSON list of records (one per row, index levels included), numbers rounded to
+    the decimals of `precision`.
+    """
+
+    table_df.round(precision).reset_index().to_json(file_path, orient='records', indent=1)
+
+WRITERS = {'xlsx': write_xlsx, 'tex': write_latex, 'csv': write_csv, 'json': write_json}
+
+@tracing.traced
+def export_table(table_df, paths, precision = COLUMN_PRECISION):
+    """
+    Writes one table to several formats from the same in-memory frame.
+
+    Parameters:
+        table_df (DataFrame): Numeric table, e.g. the output of `build_table1`.
+        paths (dict): Format ('xlsx', 'tex', 'csv' or 'json') -> output path.
+        precision (dict): Number of decimals by column, applied to every format.
+
+    Returns:
+        dict: Format -> Path of the written file.
+    """
+
+    unknown = set(paths) - set(WRITERS)
+    if unknown:
+        raise ValueError(f"Unknown formats {sorted(unknown)}, expected some of {FORMATS}")
+
+    written = {}
+    for file_format, file_path in paths.items():
+        file_path = Path(file_path)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        WRITERS[file_format](table_df, file_path, precision)
+        logging.info(f"{file_path.name} Stored Successfully!")
+        written[file_format] = file_path
+    return written
+
+def get_table1_paths(start_date, end_date, output_dir = OUTPUT_DIR, formats = FORMATS):
+    """
+    Returns the output paths of Table 1 of a period, e.g. Table1__1970_2008.xlsx and Tex_Table1__1970_2008.tex
+    """
+
+    period = f"{str(start_date)[:4]}_{str(end_date)[:4]}"
+    file_names = {'xlsx': f"Table1__{period}.xlsx", 'tex': f"Tex_Table1__{period}.tex",
+                  'csv': f"Table1__{period}.csv", 'json': f"Table1__{period}.json"}
+    return {file_format: Path(output_dir) / file_names[file_format] for file_format in formats}
+
+def export_table1(metrics_df, start_date, end_date, output_dir = OUTPUT_DIR, formats = FORMATS):
+    """
+    Builds Table 1 of a period from its numeric metrics and writes it to every format in one call.
+
+    Returns:
+        dict: Format -> Path of the written file.
+    """
+
+    return export_table(build_table1(metrics_df), get_table1_paths(start_date, end_date, output_dir, formats))
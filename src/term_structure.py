@@ -0,0 +1,201 @@
+"""
+This module computes the full futures term structure of every commodity at each month-end from the dense
+price cube: the basis between every pair of contracts and a curve fit summarising the curve by its level,
+slope and curvature.
+
+As in `replicate_results.compute_basis_timeseries`, the basis between contracts i < j is the log price
+difference divided by the difference in contract numbers, Basis(i, j) = (log F_i - log F_j) / (j - i),
+so a positive basis means backwardation. The data holds generic contract numbers rather than expiry dates,
+so the slope is measured per contract step. All pairs are computed as array operations over a
+Month x Commodity x Contract matrix and stored as compact Parquet files under data/term_structure.
+"""
+
+import warnings
+warnings.filterwarnings("ignore")
+
+import config
+from pathlib import Path
+import pandas as pd
+import numpy as np
+import logging
+
+import data_preprocessing
+import price_cube
+
+DATA_DIR = config.DATA_DIR
+INPUTFILE = config.INPUTFILE
+PERIODS = config.PERIODS
+
+TERM_STRUCTURE_DIRNAME = "term_structure"
+CURVE_COLUMNS = ['NumContracts', 'Level', 'Slope', 'Curvature']
+
+def month_end_curves(cube):
+    """
+    Selects the futures curve of every commodity on its last trading day of each month.
+
+    A commodity's month-end is the last day of the month on which any of its contracts has a price,
+    and all contracts are read on that same day.
+
+    Parameters:
+        cube (PriceCube): Daily price cube.
+
+    Returns:
+        tuple: (Date of each month-end row as a Month x Commodity datetime64 array, NaT if none,
+        Month x Commodity x Contract array of close prices)
+    """
+
+    months = cube.dates.to_period('M')
+    month_starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+    rows = np.arange(len(cube.dates)).reshape(-1, 1)
+    valid_rows = np.where(np.isnan(cube.values).all(axis=2), -1, rows)
+    last_rows = np.maximum.reduceat(valid_rows, month_starts, axis=0) if len(month_starts) else valid_rows[:0]
+
+    commodity_idx = np.arange(len(cube.commodities)).reshape(1, -1)
+    curves = np.where((last_rows >= 0)[:, :, np.newaxis], cube.values[np.maximum(last_rows, 0), commodity_idx, :], np.nan)
+    dates = np.where(last_rows >= 0, cube.dates.values[np.maximum(last_rows, 0)], np.datetime64('NaT'))
+    return dates, curves
+
+def get_contract_pairs(contracts):
+    """
+    Returns every pair (i, j) of contracts with i before j, as two arrays of positions on the contract axis.
+    """
+
+    return np.triu_indices(len(contracts), k=1)
+
+def compute_pair_basis(curves, contracts):
+    """
+    Computes the basis between every pair of contracts.
+
+    Parameters:
+        curves (ndarray): Month x Commodity x Contract close prices, see `month_end_curves`.
+        contracts (Index): Contract numbers of the contract axis.
+
+    Returns:
+        ndarray: Month x Commodity x Pair basis, in the order of `get_contract_pairs`; NaN where a leg is missing.
+    """
+
+    near, far = get_contract_pairs(contracts)
+    contract_numbers = np.asarray(contracts, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_prices = np.log(curves)
+        return (log_prices[:, :, near] - log_prices[:, :, far]) / (contract_numbers[far] - contract_numbers[near])
+
+def fit_curves(curves, contracts):
+    """
+    Summarises each curve by least-squares fits of its log prices on the contract number.
+
+    Level is the mean log price of the observed contracts, Slope is minus the slope of the linear fit
+    (the average basis per contract step, positive in backwardation) and Curvature is the quadratic
+    coefficient of a second-order fit. Slope needs two contracts, Curvature three.
+
+    Parameters:
+        curves (ndarray): Month x Commodity x Contract close prices, see `month_end_curves`.
+        contracts (Index): Contract numbers of the contract axis.
+
+    Returns:
+        dict: Month x Commodity arrays keyed by the names in CURVE_COLUMNS.
+    """
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_prices = np.log(curves)
+    observed = np.isfinite(log_prices)
+    y = np.where(observed, log_prices, 0.0)
+    #Centering the contract numbers keeps the normal equations well conditioned
+    x = np.asarray(contracts, dtype=float)
+    x = np.where(observed, x - x.mean(), 0.0)
+
+    n = observed.sum(axis=2)
+    moments = [np.sum(x ** k, axis=2) for k in range(5)]
+    moments[0] = n.astype(float)
+    xy = [np.sum(x ** k * y, axis=2) for k in range(3)]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        level = xy[0] / n
+        linear_slope = (n * xy[1] - moments[1] * xy[0]) / (n * moments[2] - moments[1] ** 2)
+
+        #Normal equations of y = a + b x + c x^2, solved only where three contracts are observed
+        normal_matrix = np.stack([np.stack(moments[k:k + 3], axis=-1) for k in range(3)], axis=-2)
+        has_curvature = n >= 3
+        normal_matrix[~has_curvature] = np.eye(3)
+        rhs = np.where(has_curvature[..., np.newaxis], np.stack(xy, axis=-1), 0.0)
+        coefficients = np.linalg.solve(normal_matrix, rhs[..., np.newaxis])[..., 0]
+
+    return {'NumContracts': n,
+            'Level': np.where(n >= 1, level, np.nan),
+            'Slope': np.where(n >= 2, -linear_slope, np.nan),
+            'Curvature': np.where(has_curvature, coefficients[..., 2], np.nan)}
+
+def compute_term_structure(cube):
+    """
+    Computes the pair basis and the curve summaries of every commodity and month-end.
+
+    Parameters:
+        cube (PriceCube): Daily price cube, e.g. from `price_cube.PriceCube.load`.
+
+    Returns:
+        tuple: (pair basis DataFrame with Date, Commodity, NearContract, FarContract and Basis;
+        curve DataFrame with Date, Commodity, NumContracts, Level, Slope and Curvature),
+        both without missing values.
+    """
+
+    dates, curves = month_end_curves(cube)
+    pair_basis = compute_pair_basis(curves, cube.contracts)
+    near, far = get_contract_pairs(cube.contracts)
+    commodities = pd.Categorical(cube.commodities)
+
+    month_pos, commodity_pos, pair_pos = np.nonzero(np.isfinite(pair_basis))
+    pair_basis_df = pd.DataFrame({'Date': dates[month_pos, commodity_pos],
+                                  'Commodity': commodities[commodity_pos],
+                                  'NearContract': np.asarray(cube.contracts)[near][pair_pos].astype('int8'),
+                                  'FarContract': np.asarray(cube.contracts)[far][pair_pos].astype('int8'),
+                                  'Basis': pair_basis[month_pos, commodity_pos, pair_pos]})
+
+    curve_fit = fit_curves(curves, cube.contracts)
+    month_pos, commodity_pos = np.nonzero(curve_fit['NumContracts'] > 0)
+    curve_df = pd.DataFrame({'Date': dates[month_pos, commodity_pos],
+                             'Commodity': commodities[commodity_pos]})
+    for col in CURVE_COLUMNS:
+        curve_df[col] = curve_fit[col][month_pos, commodity_pos]
+    curve_df['NumContracts'] = curve_df['NumContracts'].astype('int8')
+
+    return pair_basis_df, curve_df
+
+def get_term_structure_paths(start_date, end_date, data_dir = DATA_DIR, input_file = INPUTFILE):
+    """
+    Returns the paths of the pair basis and curve Parquet files of a period.
+    """
+
+    stem = Path(data_preprocessing.get_clean_file_name(start_date, end_date, input_file)).stem
+    term_structure_dir = Path(data_dir) / TERM_STRUCTURE_DIRNAME
+    return term_structure_dir / f"{stem}.pair_basis.parquet", term_structure_dir / f"{stem}.curves.parquet"
+
+def build_term_structure(start_date, end_date, data_dir = DATA_DIR, input_file = INPUTFILE):
+    """
+    Computes the term structure of a period from its price cube and stores it under data_dir/term_structure.
+    The price cube is built first if it is not stored yet.
+
+    Returns:
+        tuple: The pair basis and curve DataFrames, see `compute_term_structure`.
+    """
+
+    cube_path = price_cube.get_cube_path(start_date, end_date, data_dir, input_file)
+    if cube_path.with_suffix('.npy').exists():
+        cube = price_cube.PriceCube.load(cube_path)
+    else:
+        cube = price_cube.build_price_cube(start_date, end_date, data_dir, input_file)
+
+    pair_basis_df, curve_df = compute_term_structure(cube)
+    pair_basis_path, curve_path = get_term_structure_paths(start_date, end_date, data_dir, input_file)
+    pair_basis_path.parent.mkdir(parents=True, exist_ok=True)
+    pair_basis_df.to_parquet(pair_basis_path, index=False)
+    curve_df.to_parquet(curve_path, index=False)
+    logging.info(f"Term structure {pair_basis_path.name} and {curve_path.name} Stored Successfully!")
+    return pair_basis_df, curve_df
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    for start_, end_ in PERIODS:
+        try:
+            build_term_structure(start_, end_, DATA_DIR, INPUTFILE)
+        except Exception as e:
+            logging.error(f"An error occurred while building the term structure for {start_} to {end_}: {e}")
@@ -0,0 +1,115 @@
+"""
+This module tests the basis-sorted portfolios of the basis_portfolios module. It checks the vectorized
+quantile assignment and the portfolio returns, lag and universe selection of the sort against a per-month
+sort on a small hand-made panel.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+import config
+
+import basis_portfolios
+import load_commodities_data
+
+DATA_DIR = config.DATA_DIR
+INPUTFILE = config.INPUTFILE
+
+start_ = config.STARTDATE_OLD[:4]
+end_ = config.ENDDATE_OLD[:4]
+
+def test_assign_quantiles_matches_per_month_sort():
+    """
+    Tests the one-shot quantile assignment against ranking each month separately.
+    """
+
+    rng = np.random.default_rng(0)
+    sort_values = rng.normal(size=(24, 10))
+    sort_values[rng.random(sort_values.shape) < 0.2] = np.nan
+    sort_values[0, 2:] = np.nan
+
+    quantiles = basis_portfolios.assign_quantiles(sort_values, num_quantiles=3)
+
+    assert (quantiles[0] == -1).all()
+    for month in range(1, sort_values.shape[0]):
+        valid = np.flatnonzero(np.isfinite(sort_values[month]))
+        ranks = pd.Series(sort_values[month, valid]).rank(method='first').to_numpy() - 1
+        np.testing.assert_array_equal(quantiles[month, valid], (ranks * 3 // len(valid)).astype(int))
+        assert (quantiles[month, np.isnan(sort_values[month])] == -1).all()
+
+def make_engine(num_months = 18, num_commodities = 7, seed = 1):
+    """
+    Builds a sort engine on a small hand-made Month x Commodity panel of basis and returns, with gaps.
+    """
+
+    rng = np.random.default_rng(seed)
+    engine = basis_portfolios.BasisSortEngine.__new__(basis_portfolios.BasisSortEngine)
+    engine.commodities = pd.Index([f"C{i}" for i in range(num_commodities)], name='Commodity')
+    engine.months = pd.RangeIndex(2000 * 12, 2000 * 12 + num_months)
+    engine.basis = rng.normal(size=(num_months, num_commodities))
+    engine.returns = rng.normal(scale=0.05, size=(num_months, num_commodities))
+    engine.basis[rng.random(engine.basis.shape) < 0.15] = np.nan
+    engine.returns[rng.random(engine.returns.shape) < 0.15] = np.nan
+    engine.returns[0] = np.nan
+    return engine
+
+def reference_sort(engine, num_quantiles, lag, universe):
+    """
+    Per-month sort with a groupby: each month, the commodities with a return and a basis `lag` months
+    earlier are ranked on that basis and split into equal-count quantiles (the extra members in the lower ones).
+    """
+
+    basis_df = pd.DataFrame(engine.basis, index=engine.months, columns=engine.commodities)[universe].shift(lag)
+    returns_df = pd.DataFrame(engine.returns, index=engine.months, columns=engine.commodities)[universe]
+    long_df = pd.DataFrame({'YearMonth': np.repeat(engine.months, len(universe)),
+                            'Commodity': np.tile(universe, len(engine.months)),
+                            'Basis': basis_df.to_numpy().ravel(), 'Return': returns_df.to_numpy().ravel()}).dropna()
+
+    month_groups = long_df.groupby('YearMonth')
+    long_df['Size'] = month_groups['Basis'].transform('size')
+    long_df['Quantile'] = (month_groups['Basis'].rank(method='first') - 1) * num_quantiles // long_df['Size']
+    long_df = long_df[long_df['Size'] >= num_quantiles]
+
+    portfolio_df = long_df.groupby(['YearMonth', 'Quantile'])['Return'].mean().unstack()
+    portfolio_df.columns = [f"Q{int(q) + 1}" for q in portfolio_df.columns]
+    portfolio_df.index = load_commodities_data.month_code_to_period(portfolio_df.index)
+    return portfolio_df
+
+@pytest.mark.parametrize('num_quantiles, lag, universe', [(3, 1, None), (2, 2, None), (3, 2, ['C0', 'C2', 'C3', 'C5', 'C6'])])
+def test_sort_matches_per_month_reference(num_quantiles, lag, universe):
+    """
+    Tests the portfolio returns, the lag of the sort and the universe selection against a per-month groupby.
+    """
+
+    engine = make_engine()
+    portfolio_df = engine.sort(num_quantiles=num_quantiles, lag=lag, universe=universe)
+    expected_df = reference_sort(engine, num_quantiles, lag, list(engine.commodities) if universe is None else universe)
+
+    quantile_columns = [f"Q{q + 1}" for q in range(num_quantiles)]
+    assert list(portfolio_df.columns) == quantile_columns + ['High-Low']
+    assert list(portfolio_df.index) == list(expected_df.index)
+    np.testing.assert_allclose(portfolio_df[quantile_columns].to_numpy(), expected_df[quantile_columns].to_numpy(), rtol=1e-12)
+    np.testing.assert_allclose(portfolio_df['High-Low'].to_numpy(),
+                               (expected_df[f"Q{num_quantiles}"] - expected_df['Q1']).to_numpy(), rtol=1e-12)
+
+@pytest.mark.parametrize('lag', [0, -1, 18])
+def test_sort_rejects_invalid_lag(lag):
+    """
+    Tests that lags with look-ahead or without any month to hold are rejected.
+    """
+
+    with pytest.raises(ValueError):
+        make_engine().sort(lag=lag)
+
+def test_basis_portfolios_on_clean_data():
+    """
+    Tests that the engine runs on the clean data and that the portfolio metrics are numeric.
+    """
+
+    clean_data_df = load_commodities_data.load_data(DATA_DIR, f"clean_{start_}_{end_}_{INPUTFILE}")
+    portfolio_df, metrics_df = basis_portfolios.compute_basis_portfolios(clean_data_df, num_quantiles=3)
+    assert not portfolio_df.empty
+    assert metrics_df.dtypes.apply(pd.api.types.is_numeric_dtype).all()
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,30 @@
+"""
+This module tests the benchmark suite of the benchmarks module. It runs the quick scenario and checks
+the comparison against a baseline.
+"""
+
+import pytest
+
+import benchmarks
+
+def test_quick_benchmark_and_baseline_comparison():
+    """
+    Tests that the quick scenario times every stage and that only stages slower than the tolerance are reported.
+    """
+
+    results = benchmarks.run_benchmarks(quick=True, repeats=1)
+    stages = {record['stage'] for record in results['results']}
+    assert {'load_data_csv', 'clean_process_data', 'compute_metrics_frame', 'render_figures'} <= stages
+    assert all(record['seconds'] >= 0 for record in results['results'])
+
+    baseline = {'results': [{'scenario': 'quick', 'stage': 'fast', 'seconds': 1.0},
+                            {'scenario': 'quick', 'stage': 'slow', 'seconds': 1.0},
+                            {'scenario': 'quick', 'stage': 'tiny', 'seconds': 0.001}]}
+    current = {'results': [{'scenario': 'quick', 'stage': 'fast', 'seconds': 1.1},
+                           {'scenario': 'quick', 'stage': 'slow', 'seconds': 2.0},
+                           {'scenario': 'quick', 'stage': 'tiny', 'seconds': 0.01}]}
+    regressions = benchmarks.compare_to_baseline(current, baseline, tolerance=0.25)
+    assert [regression['stage'] for regression in regressions] == ['slow']
+
+if __name__ == '__main__':
+    pytest.main()
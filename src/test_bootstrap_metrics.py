@@ -0,0 +1,57 @@
+"""
+This module tests the block-bootstrap confidence intervals of the bootstrap_metrics module. It checks
+that the intervals are deterministic for a given seed whatever the batching across workers, that they
+contain the point estimates, and that the resample indices respect the block structure.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+import config
+
+import bootstrap_metrics
+import replicate_results
+import load_commodities_data
+
+DATA_DIR = config.DATA_DIR
+INPUTFILE = config.INPUTFILE
+
+start_ = config.STARTDATE_OLD[:4]
+end_ = config.ENDDATE_OLD[:4]
+
+def test_bootstrap_intervals_deterministic():
+    """
+    Tests that the same seed gives the same intervals serially and on a process pool,
+    and that the intervals bracket the point estimates.
+    """
+
+    clean_data_df = load_commodities_data.load_data(DATA_DIR, f"clean_{start_}_{end_}_{INPUTFILE}")
+    excess_returns_df = replicate_results.compute_commodity_excess_returns(clean_data_df)
+
+    #A small memory ceiling forces several batches
+    kwargs = dict(num_resamples=400, seed=7, max_batch_memory=2**20)
+    serial_df = bootstrap_metrics.compute_bootstrap_intervals(excess_returns_df, max_workers=1, **kwargs)
+    parallel_df = bootstrap_metrics.compute_bootstrap_intervals(excess_returns_df, max_workers=2, **kwargs)
+    pd.testing.assert_frame_equal(serial_df, parallel_df, check_exact=True)
+
+    for metric in bootstrap_metrics.PERFORMANCE_COLUMNS:
+        assert (serial_df[(metric, 'Lower')] <= serial_df[(metric, 'Upper')]).all()
+    volatility = serial_df['Ann. Volatility']
+    assert ((volatility['Lower'] <= volatility['Estimate']) & (volatility['Estimate'] <= volatility['Upper'])).all()
+
+def test_moving_block_indices():
+    """
+    Tests that moving-block indices advance by one month within each block and stay within each series.
+    """
+
+    rng = np.random.default_rng(0)
+    num_obs = np.array([30, 24])
+    indices = bootstrap_metrics.draw_block_indices(rng, 50, 30, num_obs, block_length=6, method='moving_block')
+
+    assert indices.shape == (50, 30, 2)
+    assert (indices >= 0).all() and (indices < num_obs).all()
+    within_block = np.arange(1, 30) % 6 != 0
+    assert (np.diff(indices, axis=1)[:, within_block, :] == 1).all()
+
+if __name__ == '__main__':
+    pytest.main()
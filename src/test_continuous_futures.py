@@ -0,0 +1,71 @@
+"""
+This module tests the roll-adjusted continuous series of the continuous_futures module. It checks that
+holding a fixed contract reproduces the month-end returns of replicate_results and that around a roll
+the return is measured on the contract held at the previous close.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+import config
+
+import continuous_futures
+import replicate_results
+import price_cube
+import data_preprocessing
+
+DATA_DIR = config.DATA_DIR
+INPUTFILE = config.INPUTFILE
+
+STARTDATE = '2000-01-01'
+ENDDATE = '2004-12-31'
+
+def test_fixed_rank_matches_month_end_returns():
+    """
+    Tests that compounding the daily returns of a fixed contract gives the month-end to month-end returns.
+    """
+
+    clean_df = data_preprocessing.clean_process_data(start_date = STARTDATE, end_date = ENDDATE, data_dir = DATA_DIR, input_file = INPUTFILE)
+    monthly_returns_df = replicate_results.compute_commodity_excess_returns(clean_df, roll_rule={'rule': 'rank', 'rank': 2})
+
+    commodity = str(clean_df['Commodity'].iloc[0])
+    single_df = clean_df[clean_df['Commodity'] == commodity]
+    expected = replicate_results.compute_commodity_excess_returns(single_df).iloc[:, 0].dropna()
+
+    result = monthly_returns_df[commodity]
+    result.index = result.index.to_period('M')
+    expected.index = expected.index.to_period('M')
+    np.testing.assert_allclose(result.loc[expected.index].to_numpy(), expected.to_numpy(), rtol=1e-9)
+
+def test_days_before_month_end_roll():
+    """
+    Tests that the schedule rolls for the last days of each month and that the return of a roll day
+    is measured on the contract held the day before.
+    """
+
+    clean_df = data_preprocessing.clean_process_data(start_date = STARTDATE, end_date = ENDDATE, data_dir = DATA_DIR, input_file = INPUTFILE)
+    cube = price_cube.PriceCube.from_frame(clean_df)
+    schedule = continuous_futures.build_roll_schedule(cube, rule='days_before_month_end', rank=1, days=3)
+
+    months = cube.dates.to_period('M')
+    assert (schedule.groupby(months).apply(lambda month_df: (month_df.iloc[:, 0] == 2).sum()) == 3).all()
+
+    daily_returns_df, _ = continuous_futures.compute_continuous_returns(cube, schedule)
+    roll_day = np.flatnonzero(schedule.iloc[:, 0].to_numpy() == 2)[0]
+    commodity = cube.commodities[np.flatnonzero(~np.isnan(cube.values[roll_day, :, 0]))[0]]
+    front = cube.series(commodity, 1)
+    expected = front.loc[cube.dates[roll_day]] / front.loc[:cube.dates[roll_day - 1]].iloc[-1] - 1
+    assert daily_returns_df[commodity].iloc[roll_day] == pytest.approx(expected)
+
+def test_calendar_roll_requires_calendar():
+    """
+    Tests that the calendar roll rule without a calendar is rejected like an unknown rule.
+    """
+
+    clean_df = data_preprocessing.clean_process_data(start_date = STARTDATE, end_date = ENDDATE, data_dir = DATA_DIR, input_file = INPUTFILE)
+    cube = price_cube.PriceCube.from_frame(clean_df)
+    with pytest.raises(ValueError):
+        continuous_futures.build_roll_schedule(cube, rule='calendar')
+
+if __name__ == '__main__':
+    pytest.main()
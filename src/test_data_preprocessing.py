@@ -20,7 +20,7 @@ def test_preprocess_data_types():
     """
     Tests the types of the columns in the processed data to ensure they match expected types.
     Specifically, it checks that the 'ClosePrice' column is of type float, the 'Contract' column 
-    is of type int, and the DataFrame index is of datetime type.
+    is of type int, the 'YearMonth' column holds int32 month codes, and the DataFrame index is of datetime type.
     """
 
     processed_data = data_preprocessing.clean_process_data(start_date = STARTDATE, end_date = ENDDATE, data_dir = DATA_DIR, input_file = INPUTFILE)
@@ -28,6 +28,8 @@ def test_preprocess_data_types():
     # Test that data types are as expected after preprocessing
     assert processed_data['ClosePrice'].dtype == float
     assert processed_data['Contract'].dtype == int
+    assert processed_data['YearMonth'].dtype == 'int32'
+    assert (processed_data['YearMonth'] == processed_data.index.year * 12 + processed_data.index.month - 1).all()
     assert processed_data.index.dtype == '<M8[ns]'
 
 def test_preprocess_data_sorting():
@@ -52,5 +54,64 @@ def test_preprocess_data_column_names():
     expected_columns = ['Commodity', 'Contract', 'ClosePrice', 'YearMonth']
     assert all(col in processed_data.columns for col in expected_columns)
 
+def test_preprocess_data_filters():
+    """
+    Tests that the date, commodity and contract filters pushed down to the loader are honoured.
+    It checks that only the requested commodities and contracts are returned, within the requested dates,
+    and that the excluded commodities are dropped by default.
+    """
+
+    processed_data = data_preprocessing.clean_process_data(start_date = '2005-01-01', end_date = '2006-12-31', data_dir = DATA_DIR,
+                                                           input_file = INPUTFILE, commodities = ['Gold', 'Corn', 'Barley'],
+                                                           contract_range = (1, 2))
+
+    assert set(processed_data['Commodity'].unique()) <= {'Gold', 'Corn'}
+    assert processed_data['Contract'].between(1, 2).all()
+    assert processed_data.index.min() >= pd.Timestamp('2005-01-01')
+    assert processed_data.index.max() <= pd.Timestamp('2006-12-31')
+
+def test_preprocess_periods_single_pass():
+    """
+    Tests that the periods emitted by the single-pass `clean_process_periods` are identical
+    to calling `clean_process_data` once per period.
+    """
+
+    periods = [('1990-01-01', '1994-12-31'), ('1993-06-01', '1999-12-31')]
+    period_dfs = data_preprocessing.clean_process_periods(periods, data_dir = DATA_DIR, input_file = INPUTFILE)
+
+    assert list(period_dfs.keys()) == periods
+    for (start_date, end_date), period_df in period_dfs.items():
+        expected_df = data_preprocessing.clean_process_data(start_date = start_date, end_date = end_date, data_dir = DATA_DIR, input_file = INPUTFILE)
+        pd.testing.assert_frame_equal(period_df, expected_df)
+
+def test_update_clean_periods(tmp_path):
+    """
+    Tests the incremental update of the clean period files.
+
+    This function checks:
+    - If the first update (without ingestion state) builds every clean file and records their last dates.
+    - If appended rows only extend the clean file of the period they fall into, leaving the others untouched.
+    """
+
+    (tmp_path / "manual").mkdir()
+    raw_df = pd.DataFrame({'Commodity': ['Corn', 'Gold', 'Corn', 'Gold'], 'Contract': [1, 1, 1, 1],
+                           'Date': ['2008-12-30', '2008-12-30', '2009-01-05', '2009-01-05'], 'PX_LAST': [1.0, 2.0, 3.0, 4.0]})
+    raw_df.to_csv(tmp_path / "manual" / "sample.csv", index=False)
+    periods = [('2008-01-01', '2008-12-31'), ('2009-01-01', '2009-12-31')]
+
+    assert data_preprocessing.update_clean_periods(periods, data_dir = tmp_path, input_file = "sample.csv") == periods
+    old_file = tmp_path / "manual" / data_preprocessing.get_clean_file_name(*periods[0], "sample.csv")
+    new_file = tmp_path / "manual" / data_preprocessing.get_clean_file_name(*periods[1], "sample.csv")
+    old_content = old_file.read_bytes()
+
+    appended_df = pd.DataFrame({'Commodity': ['Gold'], 'Contract': [1], 'Date': ['2009-01-06'], 'PX_LAST': [5.0]})
+    appended_df.to_csv(tmp_path / "manual" / "sample.csv", mode='a', header=False, index=False)
+    assert data_preprocessing.update_clean_periods(periods, data_dir = tmp_path, input_file = "sample.csv") == periods[1:]
+    assert old_file.read_bytes() == old_content
+    assert pd.read_csv(new_file)['ClosePrice'].tolist() == [3.0, 4.0, 5.0]
+
+    last_dates = data_preprocessing.load_commodities_data.get_last_dates(tmp_path, "sample.csv")
+    assert last_dates[new_file.name] == pd.Timestamp('2009-01-06')
+
 if __name__ == "__main__":
     pytest.main()
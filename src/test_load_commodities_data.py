@@ -58,5 +58,73 @@ def test_load_commodities_data_completedness():
     # Test if the unique number of commodities is greater than or equal to 30
     assert df['Commodity'].nunique() >= 25
 
+def _write_sample_csv(data_dir, prices):
+    """
+    Writes a small commodities CSV in the raw schema to <data_dir>/manual and returns its name.
+    """
+
+    (data_dir / "manual").mkdir(parents=True, exist_ok=True)
+    sample_df = pd.DataFrame({'Commodity': ['Corn', 'Corn', 'Gold'],
+                              'Contract': [1, 2, 1],
+                              'Date': ['2009-01-02', '2009-01-02', '2009-01-05'],
+                              'PX_LAST': prices})
+    sample_df.to_csv(data_dir / "manual" / "sample.csv", index=False)
+    return "sample.csv"
+
+def test_load_commodities_data_cache(tmp_path):
+    """
+    Tests the columnar cache maintained by the `load_data` function.
+
+    This function checks:
+    - If the first load builds the Parquet sidecar and applies the fixed schema.
+    - If a repeat load is served from the sidecar with identical content.
+    - If the sidecar is rebuilt when the source CSV changes.
+    """
+
+    input_file = _write_sample_csv(tmp_path, [1.0, 2.0, 3.0])
+    parquet_path, meta_path = load_commodities_data.get_cache_paths(tmp_path, input_file)
+
+    df = load_commodities_data.load_data(data_dir=tmp_path, input_file=input_file)
+    assert parquet_path.is_file() and meta_path.is_file()
+    assert isinstance(df['Commodity'].dtype, pd.CategoricalDtype)
+    assert df['Contract'].dtype == 'int8'
+    assert df['Date'].dtype == '<M8[ns]'
+    assert df['PX_LAST'].dtype == float
+
+    # Test if a repeat load reads the sidecar and returns the same data
+    cached_df = load_commodities_data.load_data(data_dir=tmp_path, input_file=input_file)
+    pd.testing.assert_frame_equal(df, cached_df)
+
+    # Test if the sidecar is invalidated when the source CSV changes
+    _write_sample_csv(tmp_path, [10.0, 20.0, 30.0])
+    refreshed_df = load_commodities_data.load_data(data_dir=tmp_path, input_file=input_file)
+    assert refreshed_df['PX_LAST'].tolist() == [10.0, 20.0, 30.0]
+
+def test_ingest_new_data(tmp_path):
+    """
+    Tests the incremental ingestion of rows appended to an input file.
+
+    This function checks:
+    - If the first call only records the high-water marks and returns no rows.
+    - If only appended rows dated after the high-water mark of their commodity and contract are returned.
+    - If the columnar sidecar is extended with the appended rows.
+    """
+
+    input_file = _write_sample_csv(tmp_path, [1.0, 2.0, 3.0])
+    assert load_commodities_data.ingest_new_data(data_dir=tmp_path, input_file=input_file).empty
+
+    appended_df = pd.DataFrame({'Commodity': ['Corn', 'Gold', 'Gold'],
+                                'Contract': [1, 1, 1],
+                                'Date': ['2009-01-06', '2009-01-06', '2009-01-02'],
+                                'PX_LAST': [4.0, 5.0, 6.0]})
+    appended_df.to_csv(tmp_path / "manual" / input_file, mode='a', header=False, index=False)
+
+    new_rows = load_commodities_data.ingest_new_data(data_dir=tmp_path, input_file=input_file)
+    assert new_rows['PX_LAST'].tolist() == [4.0, 5.0]
+    assert load_commodities_data.ingest_new_data(data_dir=tmp_path, input_file=input_file).empty
+
+    df = load_commodities_data.load_data(data_dir=tmp_path, input_file=input_file)
+    assert len(df) == 6
+
 if __name__ == "__main__":
     pytest.main()
@@ -0,0 +1,67 @@
+"""
+This module tests the persistent metrics store of `metrics_store`: round trips of metrics frames, keys
+that depend on the input fingerprint, period and parameters, invalidation and eviction.
+"""
+
+import time
+import numpy as np
+import pandas as pd
+import pytest
+
+import metrics_store
+
+PARAMS = {'annualizing_period': 12, 'first_to_exp_ind': 1}
+
+@pytest.fixture
+def store(tmp_path):
+    return metrics_store.MetricsStore(tmp_path / "metrics_store.sqlite")
+
+def make_metrics(num_commodities = 3, seed = 0):
+    rng = np.random.default_rng(seed)
+    metrics_df = pd.DataFrame(rng.normal(size=(num_commodities, 3)), columns=['Basis', 'Ann. Volatility', 'Ann. Sharpe Ratio'],
+                              index=pd.Index([f"Commodity {i}" for i in range(num_commodities)], name='Commodity'))
+    return metrics_df
+
+def test_round_trip(store):
+    """
+    Tests that a stored frame is returned unchanged, and only for the same fingerprint, period and parameters.
+    """
+
+    metrics_df = make_metrics()
+    assert store.get('abc', '1970-01-01', '2008-12-31', PARAMS) is None
+    store.put('abc', '1970-01-01', '2008-12-31', PARAMS, metrics_df)
+
+    pd.testing.assert_frame_equal(store.get('abc', '1970-01-01', '2008-12-31', PARAMS), metrics_df)
+    assert store.get('abd', '1970-01-01', '2008-12-31', PARAMS) is None
+    assert store.get('abc', '2009-01-01', '2024-12-31', PARAMS) is None
+    assert store.get('abc', '1970-01-01', '2008-12-31', dict(PARAMS, annualizing_period=4)) is None
+
+def test_invalidate(store):
+    """
+    Tests that invalidation deletes the entries of one period, or all entries.
+    """
+
+    for start_date, end_date in [('1970-01-01', '2008-12-31'), ('2009-01-01', '2024-12-31')]:
+        store.put('abc', start_date, end_date, PARAMS, make_metrics())
+    assert store.invalidate('1970-01-01', '2008-12-31') == 1
+    assert store.get('abc', '1970-01-01', '2008-12-31', PARAMS) is None
+    assert store.get('abc', '2009-01-01', '2024-12-31', PARAMS) is not None
+    assert store.invalidate() == 1
+    assert store.entries().empty
+
+def test_evict(store):
+    """
+    Tests that eviction keeps the most recently used entries within the size limit and drops old entries.
+    """
+
+    for i in range(3):
+        store.put(f"fingerprint {i}", '1970-01-01', '2008-12-31', PARAMS, make_metrics(seed=i))
+        time.sleep(0.01)
+    sizes = store.entries()['size']
+    assert store.evict(max_age_days=None, max_bytes=int(sizes.iloc[0] + sizes.iloc[1])) == 1
+    assert store.get('fingerprint 0', '1970-01-01', '2008-12-31', PARAMS) is None
+    assert store.evict(max_age_days=0, max_bytes=None) == 2
+    assert store.entries().empty
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,60 @@
+"""
+This module tests the out-of-core mode of the out_of_core module. It checks that streaming the raw file
+in small partitions, by date or by commodity, gives the same Table 1 metrics as the in-memory pipeline.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+import config
+
+import out_of_core
+import replicate_results
+import data_preprocessing
+
+DATA_DIR = config.DATA_DIR
+INPUTFILE = config.INPUTFILE
+
+STARTDATE = '2000-01-01'
+ENDDATE = '2004-12-31'
+
+@pytest.mark.parametrize('partition_by', ['date', 'commodity'])
+def test_out_of_core_matches_in_memory(partition_by):
+    """
+    Tests that the metrics computed from partitions of 50,000 raw rows equal those of the clean data.
+    """
+
+    clean_df = data_preprocessing.clean_process_data(start_date = STARTDATE, end_date = ENDDATE, data_dir = DATA_DIR, input_file = INPUTFILE)
+    expected_df = replicate_results.compute_metrics_frame(clean_df)
+    expected_df.index = expected_df.index.astype(str)
+
+    max_memory = 50_000 * out_of_core.BYTES_PER_RAW_ROW
+    metrics_df = out_of_core.compute_metrics_out_of_core(STARTDATE, ENDDATE, DATA_DIR, INPUTFILE, partition_by=partition_by,
+                                                         max_memory=max_memory)
+    metrics_df.index = metrics_df.index.astype(str)
+
+    assert sorted(metrics_df.index) == sorted(expected_df.index)
+    np.testing.assert_allclose(metrics_df.loc[expected_df.index, expected_df.columns].to_numpy(dtype=float),
+                               expected_df.to_numpy(dtype=float), rtol=1e-10)
+
+def test_spill_commodity_partitions(tmp_path):
+    """
+    Tests that the raw CSV is split into one file per commodity with the period and exclusion filters applied.
+    """
+
+    (tmp_path / "manual").mkdir()
+    raw_df = pd.DataFrame({'Commodity': ['Corn', 'Gold', 'Barley', 'Corn', 'Gold'], 'Contract': [1, 1, 1, 2, 1],
+                           'Date': ['2004-12-30', '2004-12-30', '2004-12-30', '2004-12-31', '2005-01-03'],
+                           'PX_LAST': [1.0, 2.0, 3.0, 4.0, 5.0]})
+    raw_df.to_csv(tmp_path / "manual" / "sample.csv", index=False)
+
+    partition_files = out_of_core.spill_commodity_partitions(tmp_path / "spill", tmp_path, "sample.csv", batch_rows=2,
+                                                             start_date=STARTDATE, end_date=ENDDATE, exclude_commodities=['Barley'])
+    assert list(partition_files) == ['Corn', 'Gold']
+    corn_df = pd.read_csv(tmp_path / "spill" / "manual" / partition_files['Corn'])
+    gold_df = pd.read_csv(tmp_path / "spill" / "manual" / partition_files['Gold'])
+    assert corn_df['PX_LAST'].tolist() == [1.0, 4.0]
+    assert gold_df['PX_LAST'].tolist() == [2.0]
+
+if __name__ == '__main__':
+    pytest.main()
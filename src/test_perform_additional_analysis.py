@@ -5,6 +5,7 @@ Each function is tested to ensure that it properly generates and saves the expec
 
 import os
 import pytest
+import numpy as np
 import pandas as pd
 import config
 from pathlib import Path
@@ -81,6 +82,56 @@ def test_plot_rolling_volatility():
     paa.plot_rolling_volatility(df, output_dir, rolling_window=rolling_window, contract_num=contract_num)
     assert (output_dir / f"{rolling_window}_months_rolling_volatility_{STARTDATE}.png").is_file()
 
+def test_plot_rolling_sharpe_ratio():
+    """
+    Tests the plot_rolling_sharpe_ratio function when it reads precomputed rolling statistics.
+    """
+
+    df = dp.clean_process_data(start_date=config.STARTDATE_OLD, end_date=config.ENDDATE_OLD, data_dir=DATA_DIR)
+    output_dir = Path(config.OUTPUT_DIR)
+    rolling_stats_df = paa.compute_rolling_statistics(df, windows=[60])
+    paa.plot_rolling_sharpe_ratio(df, output_dir, rolling_window=60, contract_num=2, rolling_stats_df=rolling_stats_df)
+    assert (output_dir / f"60_months_rolling_sharpe_ratio_{STARTDATE}.png").is_file()
+
+def test_compute_rolling_statistics():
+    """
+    Tests that the panel-wide rolling statistics match a rolling window over the monthly returns of a single series.
+    """
+
+    df = dp.clean_process_data(start_date=config.STARTDATE_OLD, end_date=config.ENDDATE_OLD, data_dir=DATA_DIR)
+    rolling_stats_df = paa.compute_rolling_statistics(df, windows=[36, 60])
+    assert sorted(rolling_stats_df.index.get_level_values('Window').unique()) == [36, 60]
+
+    commodity = str(df['Commodity'].iloc[0])
+    series_df = df[(df['Commodity'] == commodity) & (df['Contract'] == 2)]
+    monthly_returns = series_df['ClosePrice'].resample('M').last().ffill().pct_change().dropna()
+    expected_volatility = (monthly_returns.rolling(window=60).std() * np.sqrt(12)).dropna()
+
+    result = rolling_stats_df.xs((60, commodity, 2), level=['Window', 'Commodity', 'Contract'])
+    np.testing.assert_allclose(result['Rolling Volatility'].to_numpy(), expected_volatility.to_numpy(), rtol=1e-8)
+    np.testing.assert_allclose(result['Rolling Sharpe Ratio'].to_numpy(),
+                               (result['Rolling Mean Returns'] / result['Rolling Volatility']).to_numpy())
+
+def test_render_figures(tmp_path):
+    """
+    Tests that render_figures renders every figure of a period on a process pool and skips them when their inputs are unchanged.
+    """
+
+    df = dp.clean_process_data(start_date=config.STARTDATE_OLD, end_date=config.ENDDATE_OLD, data_dir=DATA_DIR)
+    rolling_stats_df = paa.compute_rolling_statistics(df, windows=[60])
+
+    rendered = paa.render_figures(df, tmp_path, STARTDATE, rolling_stats_df=rolling_stats_df, max_workers=2)
+    assert len(rendered) == 6
+    assert all(file_path.is_file() for file_path in rendered)
+    assert (tmp_path / f"max_contract_availability_{STARTDATE}.png") in rendered
+
+    assert paa.render_figures(df, tmp_path, STARTDATE, rolling_stats_df=rolling_stats_df) == []
+    assert len(paa.render_figures(df, tmp_path, STARTDATE, rolling_stats_df=rolling_stats_df, force=True)) == 6
+    assert paa.render_figures(df, tmp_path, STARTDATE, figures=['maximum_contract_number'], force=True) == \
+        [tmp_path / f"maximum_contract_number_{STARTDATE}.png"]
+    with pytest.raises(ValueError):
+        paa.render_figures(df, tmp_path, STARTDATE, figures=['unknown_figure'])
+
 if __name__ == '__main__':
     pytest.main()
 
@@ -0,0 +1,76 @@
+"""
+This module tests the dense price cube provided by the price_cube module. It checks that the cube
+holds the same prices as the clean long-format data, that it survives a memory-mapped storage
+round-trip, and that its month-end view matches the last observation per commodity, contract and month.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+import config
+
+import price_cube
+import load_commodities_data
+import data_preprocessing
+
+DATA_DIR = config.DATA_DIR
+INPUTFILE = config.INPUTFILE
+
+STARTDATE = '2000-01-01'
+ENDDATE = '2004-12-31'
+
+def test_price_cube_round_trip(tmp_path):
+    """
+    Tests that a cube built from the clean data converts back to the same observations
+    and that a stored cube is re-opened memory-mapped with identical values and axes.
+    """
+
+    clean_df = data_preprocessing.clean_process_data(start_date = STARTDATE, end_date = ENDDATE, data_dir = DATA_DIR, input_file = INPUTFILE)
+    cube = price_cube.PriceCube.from_frame(clean_df)
+
+    assert cube.shape[2] >= 12
+    assert cube.to_frame().shape[0] == clean_df.shape[0]
+
+    cube.save(tmp_path / "cube")
+    loaded_cube = price_cube.PriceCube.load(tmp_path / "cube")
+    assert isinstance(loaded_cube.values, np.memmap)
+    np.testing.assert_array_equal(loaded_cube.values, cube.values)
+    assert loaded_cube.dates.equals(cube.dates)
+    assert list(loaded_cube.commodities) == list(cube.commodities)
+
+def test_price_cube_month_end():
+    """
+    Tests that the month-end view holds the last observed price of each commodity and contract in each month.
+    """
+
+    clean_df = data_preprocessing.clean_process_data(start_date = STARTDATE, end_date = ENDDATE, data_dir = DATA_DIR, input_file = INPUTFILE)
+    month_end_df = price_cube.PriceCube.from_frame(clean_df).month_end().to_frame()
+    month_end_df['YearMonth'] = load_commodities_data.to_month_code(month_end_df['Date'])
+    month_end_prices = month_end_df.set_index(['Commodity', 'Contract', 'YearMonth'])['ClosePrice'].sort_index()
+
+    expected_df = clean_df.reset_index()
+    expected_df['Commodity'] = expected_df['Commodity'].astype(str)
+    expected_prices = expected_df.groupby(['Commodity', 'Contract', 'YearMonth'])['ClosePrice'].last().sort_index()
+
+    assert month_end_prices.index.equals(expected_prices.index)
+    np.testing.assert_allclose(month_end_prices.values, expected_prices.values)
+
+def test_price_cube_sel():
+    """
+    Tests that selecting by dates, commodity and contract returns the matching sub-cube.
+    """
+
+    clean_df = data_preprocessing.clean_process_data(start_date = STARTDATE, end_date = ENDDATE, data_dir = DATA_DIR, input_file = INPUTFILE)
+    cube = price_cube.PriceCube.from_frame(clean_df)
+    commodity = cube.commodities[0]
+
+    sub_cube = cube.sel('2001-01-01', '2001-06-30', commodities = [commodity], contracts = [1, 2])
+    assert sub_cube.shape == (sub_cube.dates.size, 1, 2)
+    assert sub_cube.dates.min() >= pd.Timestamp('2001-01-01')
+    assert sub_cube.dates.max() <= pd.Timestamp('2001-06-30')
+
+    with pytest.raises(KeyError):
+        cube.sel(commodities = ['Not a commodity'])
+
+if __name__ == '__main__':
+    pytest.main()
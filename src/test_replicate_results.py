@@ -10,6 +10,8 @@ import config
 from pathlib import Path
 
 import replicate_results
+import metrics_store
+import load_commodities_data
 
 DATA_DIR = config.DATA_DIR
 INPUTFILE = config.INPUTFILE
@@ -24,8 +26,7 @@ def test_compute_performance_metrics():
     Ensures that all performance metrics computed are of numerical data types.
     """
 
-    clean_data_file_path = Path(DATA_DIR) / "manual"/f"clean_{start_}_{end_}_{INPUTFILE}"
-    clean_data_df = pd.read_csv(clean_data_file_path)
+    clean_data_df = load_commodities_data.load_data(DATA_DIR, f"clean_{start_}_{end_}_{INPUTFILE}")
 
     # Test if the function computes performance metrics with numerical values
     excess_returns_df = replicate_results.compute_commodity_excess_returns(clean_data_df)
@@ -39,8 +40,7 @@ def test_compute_freq_backwardation():
     Ensures that the computed frequency of backwardation is non-negative.
     """
 
-    clean_data_file_path = Path(DATA_DIR) / "manual"/f"clean_{start_}_{end_}_{INPUTFILE}"
-    clean_data_df = pd.read_csv(clean_data_file_path)
+    clean_data_df = load_commodities_data.load_data(DATA_DIR, f"clean_{start_}_{end_}_{INPUTFILE}")
 
     # Test if the function computes frequency of backwardation with positive numerical values
     freq_backwardation = replicate_results.compute_freq_backwardation(clean_data_df)
@@ -52,8 +52,7 @@ def test_sharpe_ratio_range():
     This is to ensure that the Sharpe Ratio values are within a reasonable range and correctly computed.
     """
 
-    clean_data_file_path = Path(DATA_DIR) / f"manual/clean_{start_}_{end_}_{INPUTFILE}"
-    clean_data_df = pd.read_csv(clean_data_file_path)
+    clean_data_df = load_commodities_data.load_data(DATA_DIR, f"clean_{start_}_{end_}_{INPUTFILE}")
 
     # Compute excess returns for the clean data
     excess_returns_df = replicate_results.compute_commodity_excess_returns(clean_data_df)
@@ -64,5 +63,95 @@ def test_sharpe_ratio_range():
     # Assert that all Sharpe Ratio values are between -100 and +100
     assert all(-100 <= value <= 100 for value in performance_metrics['Ann. Sharpe Ratio']), "Sharpe Ratio values are out of the expected range (-100 to +100)."
 
+def test_month_end_observations():
+    """
+    Tests that the vectorized month-end selection picks, for every commodity, contract and month,
+    the same row as selecting the latest Date per group with groupby(...).apply(idxmax).
+    """
+
+    clean_data_df = load_commodities_data.load_data(DATA_DIR, f"clean_{start_}_{end_}_{INPUTFILE}")
+    sample_df = clean_data_df[clean_data_df['Commodity'].isin(clean_data_df['Commodity'].unique()[:3])]
+
+    month_end_df = replicate_results.get_month_end_observations(sample_df)
+
+    expected_df = sample_df.loc[sample_df.groupby(['Commodity', 'Contract', 'YearMonth'], observed=True)
+                                .apply(lambda x: x['Date'].idxmax())]
+    expected_df = expected_df.sort_values(['Commodity', 'Contract', 'YearMonth']).reset_index(drop=True)
+    pd.testing.assert_frame_equal(month_end_df, expected_df[month_end_df.columns])
+
+def test_metrics_context_memoization():
+    """
+    Tests that the shared computation context computes each intermediate once per run
+    and records the wall time of every stage.
+    """
+
+    clean_data_df = load_commodities_data.load_data(DATA_DIR, f"clean_{start_}_{end_}_{INPUTFILE}")
+    context = replicate_results.MetricsContext(clean_data_df)
+    replicate_results.combine_metrics(clean_data_df, context=context)
+
+    # Test if the intermediates are memoized and handed out as the same objects
+    assert context.basis_timeseries() is context.basis_timeseries()
+    assert context.month_end() is context.month_end()
+
+    expected_stages = ['month_end', 'expiry_legs', 'basis_timeseries', 'excess_returns', 'basis_mean', 'freq_backwardation']
+    assert all(stage in context.timings for stage in expected_stages)
+
+def test_combine_metrics_leaves_input_unchanged():
+    """
+    Tests that combine_metrics has no side effects on the caller's DataFrame, both for the clean file
+    as loaded (Date as a column) and for the output of clean_process_data (Date as the index).
+    """
+
+    clean_data_df = load_commodities_data.load_data(DATA_DIR, f"clean_{start_}_{end_}_{INPUTFILE}")
+    date_indexed_df = clean_data_df.set_index('Date')
+
+    for prep_df in [clean_data_df, date_indexed_df]:
+        expected_df = prep_df.copy()
+        replicate_results.combine_metrics(prep_df)
+        pd.testing.assert_frame_equal(prep_df, expected_df)
+
+def test_combine_metrics_parallel_matches_serial():
+    """
+    Tests that computing the metrics per commodity on a process pool gives exactly the serial result.
+    """
+
+    clean_data_df = load_commodities_data.load_data(DATA_DIR, f"clean_{start_}_{end_}_{INPUTFILE}")
+    serial_df = replicate_results.combine_metrics(clean_data_df, max_workers=1).data
+    parallel_df = replicate_results.combine_metrics(clean_data_df, max_workers=2).data
+    pd.testing.assert_frame_equal(parallel_df, serial_df, check_exact=True)
+
+def test_metrics_parallel_matches_serial_with_nan_month_end():
+    """
+    Tests that the serial and parallel paths align returns on the same dates when the last row of a
+    month of the second contract has a NaN price.
+    """
+
+    clean_data_df = load_commodities_data.load_data(DATA_DIR, f"clean_{start_}_{end_}_{INPUTFILE}")
+    month_end_df = replicate_results.get_month_end_observations(clean_data_df[clean_data_df['Contract'] == 2])
+    commodity = month_end_df['Commodity'].iloc[0]
+    nan_dates = month_end_df.loc[month_end_df['Commodity'] == commodity, 'Date'].iloc[1:4]
+    nan_rows = ((clean_data_df['Commodity'] == commodity) & (clean_data_df['Contract'] == 2)
+                & clean_data_df['Date'].isin(nan_dates))
+    clean_data_df.loc[nan_rows, 'ClosePrice'] = float('nan')
+
+    serial_df = replicate_results.compute_metrics_frame(clean_data_df)
+    parallel_df = replicate_results.compute_metrics_parallel(clean_data_df, max_workers=2)
+    pd.testing.assert_frame_equal(parallel_df, serial_df, check_exact=True)
+
+def test_load_metrics_uses_store(tmp_path):
+    """
+    Tests that load_metrics computes the metrics once and then reads them from the metrics store.
+    """
+
+    store = metrics_store.MetricsStore(tmp_path / "metrics_store.sqlite")
+    metrics_df = replicate_results.load_metrics(config.STARTDATE_OLD, config.ENDDATE_OLD, DATA_DIR, INPUTFILE, store=store)
+    clean_data_df = load_commodities_data.load_data(DATA_DIR, f"clean_{start_}_{end_}_{INPUTFILE}")
+    expected_df = replicate_results.compute_metrics_frame(clean_data_df)
+    pd.testing.assert_frame_equal(metrics_df, expected_df, check_index_type=False, check_categorical=False)
+
+    assert len(store.entries()) == 1
+    stored_df = replicate_results.load_metrics(config.STARTDATE_OLD, config.ENDDATE_OLD, DATA_DIR, INPUTFILE, store=store)
+    pd.testing.assert_frame_equal(stored_df, metrics_df)
+
 if __name__ == '__main__':
     pytest.main()
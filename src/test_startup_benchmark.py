@@ -0,0 +1,32 @@
+"""
+This module tests the cold-start guard of the pipeline entry points in `startup_benchmark`. Only the
+deterministic checks run here; the import time budgets depend on the machine and are checked by running
+`python src/startup_benchmark.py [--scale N]`.
+"""
+
+import pytest
+
+import startup_benchmark
+
+def test_parse_importtime():
+    """
+    Tests that the cumulative import time of every module is read from `python -X importtime` output.
+    """
+
+    stderr = ("import time: self [us] | cumulative | imported package\n"
+              "import time:       120 |        120 |   _json\n"
+              "import time:      2400 |       2520 | json\n")
+    assert startup_benchmark.parse_importtime(stderr) == {'_json': 120e-6, 'json': 2520e-6}
+
+@pytest.mark.parametrize('module', sorted(startup_benchmark.FORBIDDEN_IMPORTS))
+def test_no_heavy_imports_at_startup(module):
+    """
+    Tests that the entry points do not import heavy libraries when they are imported.
+    """
+
+    _, imported = startup_benchmark.measure_import(module, repeats=1)
+    assert module in imported
+    assert not set(startup_benchmark.FORBIDDEN_IMPORTS[module]) & imported
+
+if __name__ == '__main__':
+    pytest.main()
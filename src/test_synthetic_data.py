@@ -0,0 +1,43 @@
+"""
+This module tests the synthetic futures panel generator of the synthetic_data module. It checks that
+panels are deterministic, follow the schema of the raw input file and run through the cleaning step.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import synthetic_data
+import data_preprocessing
+
+def test_generate_futures_panel_is_deterministic():
+    """
+    Tests that the same parameters and seed give the same panel with the expected size and schema.
+    """
+
+    params = dict(num_commodities=3, num_contracts=4, years=2, seed=1)
+    panel_df = synthetic_data.generate_futures_panel(**params)
+    pd.testing.assert_frame_equal(panel_df, synthetic_data.generate_futures_panel(**params))
+
+    assert list(panel_df.columns) == synthetic_data.RAW_COLUMNS
+    assert panel_df['Commodity'].nunique() == 3
+    assert sorted(panel_df['Contract'].unique()) == [1, 2, 3, 4]
+    assert len(panel_df) == 3 * 4 * len(pd.bdate_range('1970-01-01', '1971-12-31'))
+    assert (panel_df['PX_LAST'] > 0).all()
+
+def test_missing_and_gap_rates(tmp_path):
+    """
+    Tests that missing observations and monthly gaps are applied and that the written file can be cleaned.
+    """
+
+    full_df = synthetic_data.generate_futures_panel(num_commodities=5, num_contracts=6, years=5, seed=2)
+    sparse_df = synthetic_data.generate_futures_panel(num_commodities=5, num_contracts=6, years=5, missing_rate=0.1,
+                                                      gap_rate=0.1, seed=2)
+    assert 0.7 < len(sparse_df) / len(full_df) < 0.9
+
+    synthetic_data.write_synthetic_data(tmp_path, 'synthetic.csv', num_commodities=2, num_contracts=3, years=1)
+    clean_df = data_preprocessing.clean_process_data('1970-01-01', '1970-12-31', tmp_path, 'synthetic.csv')
+    assert list(clean_df['Commodity'].astype(str).unique()) == ['Commodity 001', 'Commodity 002']
+
+if __name__ == '__main__':
+    pytest.main()
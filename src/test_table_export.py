@@ -0,0 +1,87 @@
+"""
+This module tests the single-pass Table 1 exporter of `table_export`: every format is written from the
+same numeric table with the declared precision.
+"""
+
+import json
+import numpy as np
+import pandas as pd
+import pytest
+
+import table_export
+
+def make_metrics():
+    commodities = ['Gold', 'Corn', 'Crude Oil', 'Wheat']
+    metrics_df = pd.DataFrame({'N': [20.4, 21.0, 19.8, 20.9],
+                               'Ann. Excess Returns': [1.2345, -0.5, 3.14159, np.nan],
+                               'Ann. Volatility': [15.111, 22.5, 30.0, 25.25],
+                               'Ann. Sharpe Ratio': [0.0817, -0.0222, 0.1047, np.nan],
+                               'Basis': [-0.01234, 0.0567, 0.0299, -0.111],
+                               'Freq. of Backwardation': [10.5, 40.25, 55.0, 20.125]},
+                              index=pd.Index(commodities, name='Commodity'))
+    return metrics_df
+
+def test_build_table1():
+    """
+    Tests that Table 1 is indexed by Sector and Commodity, with renamed columns and integer N.
+    """
+
+    table_df = table_export.build_table1(make_metrics())
+    assert list(table_df.index.names) == ['Sector', 'Commodity']
+    assert table_df.index.is_monotonic_increasing
+    assert list(table_df.columns) == ['Symbol', 'N', 'Basis', 'Freq. of bw.', 'Excess returns', 'Volatility', 'Sharpe ratio']
+    assert table_df['N'].dtype.kind == 'i'
+    assert table_df.loc[('Metals', 'Gold'), 'Symbol'] == 'GC'
+
+def test_export_table1_all_formats(tmp_path):
+    """
+    Tests that one call writes xlsx, LaTeX, CSV and JSON with the same values, rounded to the declared precision.
+    """
+
+    paths = table_export.export_table1(make_metrics(), '1970-01-01', '2008-12-31', tmp_path)
+    assert set(paths) == set(table_export.FORMATS)
+    assert paths['tex'].name == "Tex_Table1__1970_2008.tex"
+    table_df = table_export.build_table1(make_metrics())
+
+    csv_df = pd.read_csv(paths['csv'], index_col=[0, 1])
+    np.testing.assert_allclose(csv_df['Volatility'], table_df['Volatility'].round(2))
+
+    records = json.loads(paths['json'].read_text())
+    assert len(records) == len(table_df)
+    assert records[0]['Commodity'] == table_df.index[0][1]
+
+    xlsx_df = pd.read_excel(paths['xlsx'], index_col=[0, 1])
+    np.testing.assert_allclose(xlsx_df['Basis'], table_df['Basis'])
+
+    latex = paths['tex'].read_text().splitlines()
+    assert latex[0] == "\\begin{tabular}{lllrrrrrr}"
+    assert latex[-1] == "\\end{tabular}"
+    assert len(latex) == len(table_df) + 4
+    assert "Agriculture & Corn & C- & 21 & 0.06 & 40.25 & -0.50 & 22.50 & -0.02 \\\\" in latex
+    #Repeated sectors are left blank
+    assert " & Wheat & W- & 20 & -0.11 & 20.12 & nan & 25.25 & nan \\\\" in latex
+
+def test_write_xlsx_merges_sectors(tmp_path):
+    """
+    Tests that repeated sectors are written once in a merged cell, as with Styler.to_excel.
+    """
+
+    from openpyxl import load_workbook
+
+    table_df = table_export.build_table1(make_metrics())
+    table_export.write_xlsx(table_df, tmp_path / "table.xlsx")
+
+    sheet = load_workbook(tmp_path / "table.xlsx").active
+    assert [str(cell_range) for cell_range in sheet.merged_cells.ranges] == ["A2:A3"]
+    assert [sheet.cell(row=row, column=1).value for row in range(2, 6)] == ['Agriculture', None, 'Energy', 'Metals']
+
+def test_export_table_unknown_format(tmp_path):
+    """
+    Tests that an unknown format is rejected before anything is written.
+    """
+
+    with pytest.raises(ValueError):
+        table_export.export_table(table_export.build_table1(make_metrics()), {'pdf': tmp_path / "table.pdf"})
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,64 @@
+"""
+This module tests the term structure computed by the term_structure module. It checks the pair basis
+against the log prices of the clean data and that the curve fit recovers a known curve.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+import config
+
+import term_structure
+import price_cube
+import data_preprocessing
+
+DATA_DIR = config.DATA_DIR
+INPUTFILE = config.INPUTFILE
+
+STARTDATE = '2000-01-01'
+ENDDATE = '2004-12-31'
+
+def test_pair_basis_matches_clean_data():
+    """
+    Tests that every pair of contracts is covered and that the basis of a pair equals the log price
+    difference per contract step on the month-end date.
+    """
+
+    clean_df = data_preprocessing.clean_process_data(start_date = STARTDATE, end_date = ENDDATE, data_dir = DATA_DIR, input_file = INPUTFILE)
+    cube = price_cube.PriceCube.from_frame(clean_df)
+    pair_basis_df, curve_df = term_structure.compute_term_structure(cube)
+
+    num_contracts = len(cube.contracts)
+    assert len(term_structure.get_contract_pairs(cube.contracts)[0]) == num_contracts * (num_contracts - 1) // 2
+    assert (pair_basis_df['NearContract'] < pair_basis_df['FarContract']).all()
+    assert pair_basis_df['Basis'].notna().all()
+
+    row = pair_basis_df[pair_basis_df['FarContract'] == 2].iloc[-1]
+    day_df = clean_df.loc[row['Date']]
+    day_df = day_df[day_df['Commodity'] == row['Commodity']].set_index('Contract')['ClosePrice']
+    expected_basis = (np.log(day_df[row['NearContract']]) - np.log(day_df[row['FarContract']])) / (row['FarContract'] - row['NearContract'])
+    assert row['Basis'] == pytest.approx(expected_basis)
+
+    #The month-end of a commodity is its last trading day of the month
+    last_days = clean_df.index.to_series().groupby([clean_df['Commodity'].astype(str).values, clean_df.index.to_period('M')]).max()
+    assert curve_df['Date'].isin(last_days.values).all()
+
+def test_fit_curves_recovers_quadratic():
+    """
+    Tests that the curve fit recovers the level, slope and curvature of an exactly quadratic log curve.
+    """
+
+    contracts = pd.Index(np.arange(1, 13))
+    x = contracts.to_numpy(dtype=float) - contracts.to_numpy(dtype=float).mean()
+    log_curve = 4.0 - 0.02 * x + 0.003 * x ** 2
+    curves = np.exp(log_curve).reshape(1, 1, -1).repeat(2, axis=1)
+    curves[0, 1, 2:] = np.nan
+
+    curve_fit = term_structure.fit_curves(curves, contracts)
+    assert curve_fit['NumContracts'].tolist() == [[12, 2]]
+    assert curve_fit['Curvature'][0, 0] == pytest.approx(0.003)
+    assert np.isnan(curve_fit['Curvature'][0, 1])
+    assert curve_fit['Slope'][0, 1] == pytest.approx(np.log(curves[0, 1, 0]) - np.log(curves[0, 1, 1]))
+
+if __name__ == '__main__':
+    pytest.main()
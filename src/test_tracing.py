@@ -0,0 +1,91 @@
+"""
+This module tests the `tracing` module: stage records of traced functions and blocks, and their export
+to the Chrome trace format.
+"""
+
+import json
+import pandas as pd
+import pytest
+
+import tracing
+
+@pytest.fixture
+def trace_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, 'TRACE_PATH', None)
+    monkeypatch.setattr(tracing, 'ENABLED', False)
+    path = tmp_path / "trace.jsonl"
+    tracing.enable(path)
+    return path
+
+def test_traced_disabled_returns_function(monkeypatch):
+    """
+    Tests that a function decorated while tracing is off is returned unchanged.
+    """
+
+    monkeypatch.setattr(tracing, 'ENABLED', False)
+    def stage(df):
+        return df
+    assert tracing.traced(stage) is stage
+    assert tracing.traced(name='custom')(stage) is stage
+
+def test_traced_records_stages(trace_path):
+    """
+    Tests that traced functions and blocks append one record each, with row counts and nesting.
+    """
+
+    @tracing.traced
+    def outer(df):
+        with tracing.trace_stage('inner', rows_in=len(df)) as record:
+            record['rows_out'] = 1
+        return df.head(3)
+
+    df = pd.DataFrame({'x': range(10)})
+    result = outer(df)
+    assert len(result) == 3
+
+    records = tracing.read_trace(trace_path)
+    assert [record['name'] for record in records] == ['inner', f"{__name__}.test_traced_records_stages.<locals>.outer"]
+    inner, outer_record = records
+    assert inner['parent'] == outer_record['name']
+    assert outer_record['parent'] is None
+    assert (outer_record['rows_in'], outer_record['rows_out']) == (10, 3)
+    assert (inner['rows_in'], inner['rows_out']) == (10, 1)
+    for record in records:
+        assert record['wall_s'] >= 0 and record['cpu_s'] >= 0
+
+def test_nested_heap_peaks(trace_path, monkeypatch):
+    """
+    Tests that the heap peak of a stage covers the allocations made before and inside its nested stages.
+    """
+
+    monkeypatch.setattr(tracing, 'TRACE_MEMORY', True)
+    with tracing.trace_stage('outer'):
+        before = bytearray(8 * 2**20)
+        del before
+        with tracing.trace_stage('inner'):
+            inside = bytearray(4 * 2**20)
+            del inside
+        with tracing.trace_stage('second'):
+            pass
+
+    records = {record['name']: record for record in tracing.read_trace(trace_path)}
+    assert records['outer']['heap_peak_mb'] >= 8
+    assert 4 <= records['inner']['heap_peak_mb'] < 8
+    assert records['second']['heap_peak_mb'] < 4
+
+def test_export_chrome_trace(trace_path):
+    """
+    Tests that the Chrome trace has one complete event per record.
+    """
+
+    with tracing.trace_stage('stage'):
+        pass
+    output_path = tracing.export_chrome_trace(trace_path)
+
+    with open(output_path) as f:
+        events = json.load(f)['traceEvents']
+    assert len(events) == 1
+    assert events[0]['name'] == 'stage' and events[0]['ph'] == 'X'
+
+if __name__ == '__main__':
+    pytest.main()
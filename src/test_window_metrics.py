@@ -0,0 +1,61 @@
+"""
+This module tests the many-window Table 1 engine of the window_metrics module. It checks that the
+metrics answered from prefix sums match replicate_results on the corresponding slice of the data,
+and that the calendar, rolling and expanding window generators produce the expected windows.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+import config
+
+import window_metrics
+import replicate_results
+import load_commodities_data
+
+DATA_DIR = config.DATA_DIR
+INPUTFILE = config.INPUTFILE
+
+start_ = config.STARTDATE_OLD[:4]
+end_ = config.ENDDATE_OLD[:4]
+
+def test_window_metrics_match_slices():
+    """
+    Tests that the metrics of each window equal compute_metrics_frame on the data of that window.
+    """
+
+    clean_data_df = load_commodities_data.load_data(DATA_DIR, f"clean_{start_}_{end_}_{INPUTFILE}")
+    windows = [('1975-01', '1975-12'), ('1985-03', '1990-02'), (f"{start_}-01", f"{end_}-12")]
+    window_metrics_df = window_metrics.compute_window_metrics(clean_data_df, windows)
+
+    for window_start, window_end in windows:
+        start, end = pd.Period(window_start, freq='M'), pd.Period(window_end, freq='M')
+        window_df = clean_data_df[(clean_data_df['Date'] >= start.start_time) & (clean_data_df['Date'] <= end.end_time)]
+        expected_df = replicate_results.compute_metrics_frame(window_df)
+        expected_df.index = expected_df.index.astype(str)
+
+        result_df = window_metrics_df.xs((start, end), level=['Start', 'End'])
+        assert list(result_df.index) == sorted(expected_df.index)
+        np.testing.assert_allclose(result_df.to_numpy(dtype=float),
+                                   expected_df.loc[result_df.index, result_df.columns].to_numpy(dtype=float),
+                                   rtol=1e-8, atol=1e-10)
+
+def test_window_generators():
+    """
+    Tests the number and bounds of the calendar-year, rolling and expanding windows.
+    """
+
+    calendar_windows = window_metrics.get_calendar_year_windows('2000-01-01', '2004-12-31')
+    assert len(calendar_windows) == 5
+    assert calendar_windows[0] == (pd.Period('2000-01', freq='M'), pd.Period('2000-12', freq='M'))
+
+    rolling_windows = window_metrics.get_rolling_windows('2000-01-01', '2004-12-31', years=2)
+    assert len(rolling_windows) == 37
+    assert rolling_windows[-1] == (pd.Period('2003-01', freq='M'), pd.Period('2004-12', freq='M'))
+
+    expanding_windows = window_metrics.get_expanding_windows('2000-01-01', '2004-12-31')
+    assert [end for _, end in expanding_windows] == [pd.Period(f"{year}-12", freq='M') for year in range(2000, 2005)]
+    assert all(start == pd.Period('2000-01', freq='M') for start, _ in expanding_windows)
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,204 @@
+"""
+This module provides opt-in, stage-level instrumentation for the pipeline.
+
+Tracing is switched on by setting TRACE_FILE (config.py, e.g. in the .env file) to the path of a JSON lines
+file. Every traced stage then appends one record with its name, wall time, CPU time, row counts in and out
+and the resident memory high-water mark of the process so far. With TRACE_MEMORY the peak Python heap of
+the stage itself (nested stages included) is recorded as well, through tracemalloc. `export_chrome_trace`
+converts a trace to the Chrome trace format (chrome://tracing, Perfetto).
+
+When tracing is off, `traced` returns the decorated function itself and `trace_stage` is an empty context,
+so instrumented code runs exactly as before.
+"""
+
+import config
+from pathlib import Path
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import logging
+
+try:
+    import resource
+except ImportError:
+    #Not available on Windows, where the peak resident memory is not recorded
+    resource = None
+
+TRACE_FILE = config.TRACE_FILE
+TRACE_MEMORY = config.TRACE_MEMORY
+
+def _resolve_trace_path(trace_file):
+    if not trace_file:
+        return None
+    path = Path(trace_file)
+    return path if path.is_absolute() else config.BASE_DIR / path
+
+TRACE_PATH = _resolve_trace_path(TRACE_FILE)
+ENABLED = TRACE_PATH is not None
+
+_local = threading.local()
+
+def enable(trace_file):
+    """
+    Switches tracing on for this process, e.g. in tests. It applies to every `trace_stage` block and to
+    functions decorated with `traced` from now on; functions decorated while tracing was off stay untraced.
+    """
+
+    global TRACE_PATH, ENABLED
+    TRACE_PATH = _resolve_trace_path(str(trace_file))
+    ENABLED = TRACE_PATH is not None
+
+def count_rows(obj):
+    """
+    Returns the number of rows of a DataFrame, Series, Styler or array (the first element of a tuple), else None.
+    """
+
+    if isinstance(obj, tuple) and obj:
+        obj = obj[0]
+    obj = getattr(obj, 'data', obj)
+    shape = getattr(obj, 'shape', None)
+    return int(shape[0]) if shape else None
+
+def _process_peak_rss_mb():
+    if resource is None:
+        return None
+    #ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (2**20 if sys.platform == 'darwin' else 2**10)
+
+def write_record(record, trace_path = None):
+    """
+    Appends one record to the JSON lines trace file.
+    """
+
+    trace_path = trace_path or TRACE_PATH
+    trace_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(trace_path, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+
+def _fold_heap_peak(frame):
+    """
+    Raises the heap peak of a stage frame to the current tracemalloc peak, before the peak is reset.
+    """
+
+    if frame is not None and TRACE_MEMORY:
+        frame['heap_peak'] = max(frame['heap_peak'], tracemalloc.get_traced_memory()[1])
+
+@contextmanager
+def _record_stage(name, rows_in = None):
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    parent = stack[-1] if stack else None
+    if TRACE_MEMORY and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    #The peak of the parent so far is kept in its frame, as this stage resets the tracemalloc peak
+    _fold_heap_peak(parent)
+    frame = {'name': name, 'heap_start': 0, 'heap_peak': 0}
+    if TRACE_MEMORY:
+        frame['heap_start'] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+    record = {'name': name, 'pid': os.getpid(), 'tid': threading.get_ident(), 'parent': parent['name'] if parent else None,
+              'rows_in': rows_in, 'rows_out': None}
+    stack.append(frame)
+    start_ts = time.time()
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    try:
+        yield record
+    finally:
+        record['wall_s'] = time.perf_counter() - start_wall
+        record['cpu_s'] = time.process_time() - start_cpu
+        record['start_us'] = int(start_ts * 1e6)
+        #High-water mark of the whole process so far, not of this stage
+        record['process_peak_rss_mb'] = _process_peak_rss_mb()
+        if TRACE_MEMORY:
+            #Peak over the stage, its nested stages included: the peaks they reset were folded into this frame
+            _fold_heap_peak(frame)
+            record['heap_peak_mb'] = (frame['heap_peak'] - frame['heap_start']) / 2**20
+            if parent is not None:
+                parent['heap_peak'] = max(parent['heap_peak'], frame['heap_peak'])
+        stack.pop()
+        write_record(record)
+
+def trace_stage(name, rows_in = None):
+    """
+    Context manager tracing the enclosed block as stage `name`.
+
+    It yields a dict record (or None when tracing is off) in which the block may set 'rows_out'.
+
+    Example:
+        with tracing.trace_stage('to_excel', rows_in=len(df)) as record:
+            ...
+    """
+
+    if not ENABLED:
+        return nullcontext()
+    return _record_stage(name, rows_in)
+
+def traced(func = None, name = None):
+    """
+    Decorator tracing every call of a function as one stage, named module.function by default.
+
+    The rows in are counted on the first argument and the rows out on the return value (see `count_rows`).
+    When tracing is off the function is returned unchanged.
+    """
+
+    def decorate(func):
+        if not ENABLED:
+            return func
+        stage_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with _record_stage(stage_name, count_rows(args[0]) if args else None) as record:
+                result = func(*args, **kwargs)
+                record['rows_out'] = count_rows(result)
+                return result
+        return wrapper
+
+    return decorate(func) if func is not None else decorate
+
+def read_trace(trace_path = None):
+    """
+    Reads the records of a JSON lines trace file.
+    """
+
+    with open(trace_path or TRACE_PATH) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def export_chrome_trace(trace_path = None, output_path = None):
+    """
+    Converts a JSON lines trace to the Chrome trace event format.
+
+    Parameters:
+        trace_path (Path): JSON lines trace, default: config.py -> TRACE_FILE
+        output_path (Path): Output file, default: the trace path with the suffix .chrome.json
+
+    Returns:
+        Path: The path of the Chrome trace.
+    """
+
+    trace_path = Path(trace_path or TRACE_PATH)
+    output_path = Path(output_path) if output_path else trace_path.with_suffix('.chrome.json')
+    events = []
+    for record in read_trace(trace_path):
+        args = {key: value for key, value in record.items() if key not in ('name', 'pid', 'tid', 'start_us', 'wall_s')}
+        events.append({'name': record['name'], 'ph': 'X', 'ts': record['start_us'], 'dur': int(record['wall_s'] * 1e6),
+                       'pid': record['pid'], 'tid': record['tid'], 'args': args})
+    with open(output_path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+    return output_path
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if not ENABLED:
+        logging.info("Tracing is off, set TRACE_FILE to enable it.")
+    else:
+        logging.info(f"Chrome trace written to {export_chrome_trace()}")
@@ -0,0 +1,233 @@
+"""
+This module computes the Table 1 metrics (N, annualized excess return, volatility and Sharpe ratio, mean basis
+and frequency of backwardation) for many date windows at once, e.g. every calendar year, every rolling 5-year
+window or expanding windows from the start of the sample.
+
+The monthly return, basis and backwardation series are computed once for the whole sample (through a
+`replicate_results.MetricsContext`) and turned into cumulative sums of x, x^2 and counts. The metrics of a
+window then follow from differences of those prefix sums, at constant cost per window and commodity.
+Windows are whole calendar months; for such windows the result matches `replicate_results.compute_metrics_frame`
+on the corresponding slice of the data, up to floating-point summation order.
+"""
+
+import warnings
+warnings.filterwarnings("ignore")
+
+import config
+from pathlib import Path
+import pandas as pd
+import numpy as np
+import logging
+
+import load_commodities_data
+import data_preprocessing
+import replicate_results
+
+DATA_DIR = config.DATA_DIR
+INPUTFILE = config.INPUTFILE
+OUTPUT_DIR = config.OUTPUT_DIR
+PERIODS = config.PERIODS
+
+ROLLING_WINDOW_YEARS = 5
+WINDOW_LEVELS = ['Start', 'End', 'Commodity']
+METRIC_COLUMNS = ['N', 'Ann. Excess Returns', 'Ann. Volatility', 'Ann. Sharpe Ratio', 'Basis', 'Freq. of Backwardation']
+
+def _prefix_sum(values):
+    """
+    Cumulative sum along the first axis with a leading row of zeros, so that rows [a, b) sum to S[b] - S[a].
+    """
+
+    prefix = np.zeros((values.shape[0] + 1,) + values.shape[1:])
+    np.cumsum(values, axis=0, out=prefix[1:])
+    return prefix
+
+def _to_month_codes(dates):
+    """
+    Converts window bounds (anything accepted by pd.Period) to int month codes as in load_commodities_data.
+    """
+
+    periods = pd.PeriodIndex([pd.Period(date, freq='M') for date in dates])
+    return (periods.year * 12 + periods.month - 1).to_numpy(dtype=np.int64)
+
+def get_calendar_year_windows(start_date, end_date):
+    """
+    Returns one window per calendar year between start_date and end_date as a list of (start, end) months.
+    """
+
+    years = range(pd.Period(start_date, freq='M').year, pd.Period(end_date, freq='M').year + 1)
+    return [(pd.Period(f"{year}-01", freq='M'), pd.Period(f"{year}-12", freq='M')) for year in years]
+
+def get_rolling_windows(start_date, end_date, years = ROLLING_WINDOW_YEARS, step_months = 1):
+    """
+    Returns every window of `years` years that fits between start_date and end_date, moving by step_months.
+    """
+
+    first, last = pd.Period(start_date, freq='M'), pd.Period(end_date, freq='M')
+    length = years * 12
+    starts = pd.period_range(first, last - (length - 1), freq='M')[::step_months]
+    return [(start, start + (length - 1)) for start in starts]
+
+def get_expanding_windows(start_date, end_date, step_months = 12):
+    """
+    Returns windows that all start at start_date and end every step_months months until end_date.
+    The first window spans step_months months.
+    """
+
+    first, last = pd.Period(start_date, freq='M'), pd.Period(end_date, freq='M')
+    ends = pd.period_range(first + (step_months - 1), last, freq='M')[::step_months]
+    return [(first, end) for end in ends]
+
+class WindowMetricsEngine:
+    """
+    Answers Table 1 for any number of month windows from prefix sums over the full sample.
+
+    Parameters:
+        prep_df (DataFrame): Preprocessed DataFrame containing commodity data.
+        first_to_exp_ind (int): Index of the contract considered as 'first to expire'.
+        annualizing_period (int): Factor used to annualize the return metrics, default is 12 (for monthly data).
+    """
+
+    def __init__(self, prep_df, first_to_exp_ind = 1, annualizing_period = 12):
+        self.annualizing_period = annualizing_period
+        context = replicate_results.MetricsContext(prep_df, first_to_exp_ind)
+
+        cmdty_df = replicate_results.select_columns(prep_df, ['Date', 'Commodity', 'Contract', 'YearMonth'])
+        cmdty_df['Commodity'] = cmdty_df['Commodity'].astype(str)
+        self.commodities = pd.Index(np.sort(cmdty_df['Commodity'].unique()), name='Commodity')
+        self.first_month = int(cmdty_df['YearMonth'].min())
+        months = pd.RangeIndex(self.first_month, int(cmdty_df['YearMonth'].max()) + 1)
+
+        #Observations per commodity and month, for N
+        obs_counts = (cmdty_df.groupby(['YearMonth', 'Commodity'])['Date'].count()
+                      .unstack().reindex(index=months, columns=self.commodities).fillna(0).to_numpy())
+        self._obs = _prefix_sum(obs_counts)
+        self._obs_months = _prefix_sum((obs_counts > 0).astype(float))
+
+        #Months with at least two distinct contracts on some date, which makes a commodity eligible for the basis
+        distinct_cntrcts_df = cmdty_df.drop_duplicates(subset=['Commodity', 'Date', 'Contract'])
+        multi_cntrct_df = distinct_cntrcts_df[distinct_cntrcts_df.duplicated(subset=['Commodity', 'Date'])]
+        multi_cntrct = (multi_cntrct_df.groupby(['YearMonth', 'Commodity']).size()
+                        .unstack().reindex(index=months, columns=self.commodities).notna().to_numpy())
+        self._eligible_months = _prefix_sum(multi_cntrct.astype(float))
+
+        #Basis and backwardation indicator at the month-end of the first to expire contract
+        basis_df = context.basis_timeseries()[['Commodity', 'YearMonth', 'Basis']].copy()
+        basis_df['Commodity'] = basis_df['Commodity'].astype(str)
+        basis = (basis_df.set_index(['YearMonth', 'Commodity'])['Basis']
+                 .unstack().reindex(index=months, columns=self.commodities))
+        basis_rows = (basis_df.groupby(['YearMonth', 'Commodity']).size()
+                      .unstack().reindex(index=months, columns=self.commodities).fillna(0).to_numpy())
+        basis_values = basis.to_numpy()
+        basis_valid = ~np.isnan(basis_values)
+        self._basis_rows = _prefix_sum(basis_rows)
+        self._basis_count = _prefix_sum(basis_valid.astype(float))
+        self._basis_sum = _prefix_sum(np.where(basis_valid, basis_values, 0.0))
+        self._basis_positive = _prefix_sum((basis_values > 0).astype(float))
+
+        #Monthly returns on the month-end dates of all commodities, as in compute_commodity_excess_returns
+        returns_df = context.excess_returns().rename(columns=str)
+        returns = returns_df.reindex(columns=self.commodities).to_numpy()
+        self.return_months = load_commodities_data.to_month_code(returns_df.index).astype(np.int64)
+        returns_valid = np.isfinite(returns)
+        self._ret_count = _prefix_sum(returns_valid.astype(float))
+        self._ret_sum = _prefix_sum(np.where(returns_valid, returns, 0.0))
+        self._ret_sum_sq = _prefix_sum(np.where(returns_valid, returns, 0.0) ** 2)
+
+        #A window's first observed price has no return within the window. next_price[i] is the first row
+        #at or after i with an observed price (len(rows) if none), so returns are summed from next_price[a] + 1
+        month_end_df = context.month_end()
+        month_end_df = month_end_df[month_end_df['Contract'] == 2]
+        prices = (month_end_df.pivot_table(index='Date', columns='Commodity', values='ClosePrice', observed=True)
+                  .rename(columns=str).reindex(index=returns_df.index, columns=self.commodities).to_numpy())
+        num_rows = len(returns_df.index)
+        rows = np.where(np.isnan(prices), num_rows, np.arange(num_rows).reshape(-1, 1))
+        self._next_price = np.vstack([np.minimum.accumulate(rows[::-1], axis=0)[::-1],
+                                      np.full((1, len(self.commodities)), num_rows)])
+
+    def compute(self, windows):
+        """
+        Computes the Table 1 metrics of every commodity in every window.
+
+        Parameters:
+            windows (list): (start, end) pairs, each bound a month in any format accepted by pd.Period
+                (e.g. '1970-01', '1974-12-31'); both months are included.
+
+        Returns:
+            DataFrame: Long-format metrics indexed by (Start, End, Commodity), with one row for every commodity
+            observed in the window and the columns of `replicate_results.compute_metrics_frame`.
+        """
+
+        if len(windows) == 0:
+            return pd.DataFrame(columns=METRIC_COLUMNS, index=pd.MultiIndex.from_tuples([], names=WINDOW_LEVELS))
+        starts, ends = zip(*windows)
+        start_months, end_months = _to_month_codes(starts), _to_month_codes(ends)
+
+        #Month rows [m0, m1) of the N and basis prefix sums
+        num_months = self._obs.shape[0] - 1
+        m0 = np.clip(start_months - self.first_month, 0, num_months)
+        m1 = np.clip(end_months - self.first_month + 1, m0, num_months)
+        def month_total(prefix):
+            return prefix[m1] - prefix[m0]
+
+        num_obs = month_total(self._obs)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            N = num_obs / month_total(self._obs_months)
+
+            eligible = month_total(self._eligible_months) > 0
+            basis_rows = np.where(eligible, month_total(self._basis_rows), 0.0)
+            basis_mean = np.where(eligible, month_total(self._basis_sum) / month_total(self._basis_count), np.nan)
+            freq_backwardation = np.where(basis_rows > 0, month_total(self._basis_positive) / basis_rows * 100, np.nan)
+
+            #Return rows [r0, r1), starting after the first observed price of each commodity in the window
+            r0 = self.return_months.searchsorted(start_months, side='left')
+            r1 = self.return_months.searchsorted(end_months, side='right')
+            first_ret = np.minimum(self._next_price[r0] + 1, r1.reshape(-1, 1))
+            columns = np.arange(len(self.commodities))
+            def return_total(prefix):
+                return prefix[r1] - prefix[first_ret, columns]
+
+            count = return_total(self._ret_count)
+            mean = return_total(self._ret_sum) / count
+            variance = (return_total(self._ret_sum_sq) - count * mean ** 2) / (count - 1)
+            mean = np.where(count > 0, mean, np.nan)
+            std = np.where(count > 1, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+
+            avg_excess_returns = mean * self.annualizing_period * 100
+            std_excess_returns = std * np.sqrt(self.annualizing_period) * 100
+            sharpe_ratio = avg_excess_returns / std_excess_returns
+
+        index = pd.MultiIndex.from_product([pd.RangeIndex(len(windows)), self.commodities])
+        metrics_df = pd.DataFrame({'N': N.ravel(),
+                                   'Ann. Excess Returns': avg_excess_returns.ravel(),
+                                   'Ann. Volatility': std_excess_returns.ravel(),
+                                   'Ann. Sharpe Ratio': sharpe_ratio.ravel(),
+                                   'Basis': basis_mean.ravel(),
+                                   'Freq. of Backwardation': freq_backwardation.ravel()}, index=index)
+        metrics_df = metrics_df[num_obs.ravel() > 0]
+
+        window_pos = metrics_df.index.get_level_values(0)
+        metrics_df.index = pd.MultiIndex.from_arrays([pd.PeriodIndex([pd.Period(s, freq='M') for s in starts])[window_pos],
+                                                      pd.PeriodIndex([pd.Period(e, freq='M') for e in ends])[window_pos],
+                                                      metrics_df.index.get_level_values(1)], names=WINDOW_LEVELS)
+        return metrics_df
+
+def compute_window_metrics(prep_df, windows, first_to_exp_ind = 1, annualizing_period = 12):
+    """
+    Computes Table 1 for every window in one pass, see `WindowMetricsEngine.compute`.
+    """
+
+    return WindowMetricsEngine(prep_df, first_to_exp_ind, annualizing_period).compute(windows)
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    for start_, end_ in PERIODS:
+        try:
+            clean_data_df = load_commodities_data.load_data(DATA_DIR, data_preprocessing.get_clean_file_name(start_, end_, INPUTFILE))
+            windows = (get_calendar_year_windows(start_, end_) + get_rolling_windows(start_, end_)
+                       + get_expanding_windows(start_, end_))
+            window_metrics_df = compute_window_metrics(clean_data_df, windows)
+            output_file = Path(OUTPUT_DIR) / f"Table1_windows_{start_[:4]}_{end_[:4]}.csv"
+            window_metrics_df.to_csv(output_file)
+            logging.info(f"{output_file.name} Stored Successfully! ({len(windows)} windows)")
+        except Exception as e:
+            logging.error(f"An error occurred while computing the window metrics for {start_} to {end_}: {e}")